@@ -1,77 +1,141 @@
-import os
-import datetime
+from django.core.cache import cache
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from api.models import Routine, Reminder, MoodLog
-from api.serializers import SmartPromptSerializer
+from api.models import SmartPromptState
+from api.prompt_rules import default_engine, HABIT
 
 User = get_user_model()
 
+PROMPT_CACHE_KEY = 'smart_prompts:{user_id}'
+PROMPT_CACHE_TIMEOUT = 60 * 60  # Safety net; entries are normally invalidated by change events
+REFRESH_BATCH_SIZE = 500
+
+
 class SmartPromptEngine:
     """
     Background AI task monitor for user activity and smart prompts.
+    Rules are declared in api.prompt_rules and evaluated as compiled batch queries.
     """
-    def __init__(self, user):
+    def __init__(self, user, rules=None):
         self.user = user
+        self.rules = rules or default_engine
 
-    def get_prompts(self):
-        prompts = []
-        now = timezone.now()
-        # Example: Missed routines
-        missed = Routine.objects.filter(user=self.user, completed=False, time__lt=now.time())
-        for routine in missed:
-            prompts.append({
-                'message': f"You missed your routine: {routine.title}",
-                'action_type': None,
-                'action_data': None,
-                'timestamp': now,
-            })
-        # Example: Missed reminders
-        reminders = Reminder.objects.filter(user=self.user, completed=False, time__lt=now.time())
-        for reminder in reminders:
-            prompts.append({
-                'message': f"Reminder: {reminder.title}",
-                'action_type': None,
-                'action_data': None,
-                'timestamp': now,
-            })
-        # Example: Suggest a walk if inactive
-        last_mood = MoodLog.objects.filter(user=self.user).order_by('-timestamp').first()
-        if last_mood and (now - last_mood.timestamp).total_seconds() > 2*60*60:
-            prompts.append({
-                'message': "Take a short walk — you've been inactive for 2 hours.",
-                'action_type': 'walk',
-                'action_data': None,
-                'timestamp': now,
-            })
-        # Example: WhatsApp Bible study
-        # (Assume user has a routine with 'bible study' in title and a contact field)
-        bible_study = Routine.objects.filter(user=self.user, title__icontains='bible study').first()
-        if bible_study and bible_study.time.weekday() == now.weekday():
-            prompts.append({
-                'message': "It's time for your Bible study — open WhatsApp?",
-                'action_type': 'whatsapp',
-                'action_data': bible_study.contact if hasattr(bible_study, 'contact') else None,
-                'timestamp': now,
-            })
+    def get_prompts(self, now=None):
+        prompts, _ = self.evaluate(now)
         return prompts
 
+    def evaluate(self, now=None):
+        """Compute the user's prompts and the next time a time-based rule can change them."""
+        now = now or timezone.now()
+        return self.rules.evaluate([self.user.id], now)[self.user.id]
+
     def suggest_new_habits(self):
-        # Example: If user misses a routine 3+ times, suggest a new time
-        missed = Routine.objects.filter(user=self.user, completed=False)
-        for routine in missed:
-            if routine.missed_count >= 3:
-                yield {
-                    'message': f"You often miss {routine.title}. Try a different time?",
-                    'action_type': None,
-                    'action_data': None,
-                    'timestamp': timezone.now(),
-                }
+        prompts, _ = self.rules.evaluate([self.user.id], timezone.now(), category=HABIT)[self.user.id]
+        yield from prompts
+
+
+def _cache_key(user_id):
+    return PROMPT_CACHE_KEY.format(user_id=user_id)
+
+
+def _cache_timeout(next_refresh_at, now):
+    """Expire the cached entry when the next time-based rule fires."""
+    if next_refresh_at is None:
+        return PROMPT_CACHE_TIMEOUT
+    seconds = int((next_refresh_at - now).total_seconds()) + 1
+    return max(1, min(seconds, PROMPT_CACHE_TIMEOUT))
+
+
+def invalidate_user_prompts(user_id):
+    """Drop a user's cached prompts after a change event on their data."""
+    # Mark the row first, so a concurrent read cannot re-cache it after the delete
+    SmartPromptState.objects.filter(user_id=user_id, is_stale=False).update(is_stale=True)
+    cache.delete(_cache_key(user_id))
+
+
+def refresh_prompts_for_users(users, now=None, rules=None):
+    """Recompute prompts for a batch of users with one query per rule, then store and cache them."""
+    now = now or timezone.now()
+    rules = rules or default_engine
+    users = list(users)
+    results = rules.evaluate([user.id for user in users], now)
+    states = [
+        SmartPromptState(
+            user=user,
+            prompts=results[user.id][0],
+            is_stale=False,
+            computed_at=now,
+            next_refresh_at=results[user.id][1],
+        )
+        for user in users
+    ]
+    SmartPromptState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['prompts', 'is_stale', 'computed_at', 'next_refresh_at'],
+    )
+    for state in states:
+        _cache_state(state, now)
+    return states
+
+
+def refresh_user_prompts(user, now=None):
+    """Recompute a single user's prompts."""
+    return refresh_prompts_for_users([user], now)[0]
+
+
+def _cache_state(state, now):
+    cache.set(_cache_key(state.user_id), state.prompts, _cache_timeout(state.next_refresh_at, now))
+
+
+def get_cached_prompts(user, now=None):
+    """Return the user's prompts, recomputing only when a change event or timer invalidated them.
+
+    A cache hit costs no query. Change events delete the entry (invalidate_user_prompts, via
+    api.signals) and timers bound its lifetime, so hits are current as long as every worker
+    shares the cache: set REDIS_URL when running more than one process.
+    """
+    cached = cache.get(_cache_key(user.id))
+    if cached is not None:
+        return cached
+
+    now = now or timezone.now()
+    state = SmartPromptState.objects.filter(user=user).first()
+    if state and not state.is_stale and (state.next_refresh_at is None or state.next_refresh_at > now):
+        _cache_state(state, now)
+        return state.prompts
+    return refresh_user_prompts(user, now).prompts
+
+
+def due_prompt_users(now=None):
+    """Users whose prompts were invalidated or whose next timer has elapsed."""
+    now = now or timezone.now()
+    return User.objects.filter(is_active=True).filter(
+        Q(smart_prompt_state__isnull=True)
+        | Q(smart_prompt_state__is_stale=True)
+        | Q(smart_prompt_state__next_refresh_at__lte=now)
+    )
+
 
 # Usage: (to be run as a periodic task or management command)
-def run_smart_prompt_engine():
-    for user in User.objects.all():
-        engine = SmartPromptEngine(user)
-        prompts = engine.get_prompts()
-        # Save or send prompts to user (e.g., via API, notification, or DB)
-        # ...
+def run_smart_prompt_engine(now=None):
+    """Refresh only users with pending changes or elapsed timers, in batches.
+
+    Returns a mapping of user to prompts that were not present in their previous snapshot.
+    """
+    now = now or timezone.now()
+    new_prompts = {}
+    users = list(due_prompt_users(now).select_related('smart_prompt_state'))
+    for offset in range(0, len(users), REFRESH_BATCH_SIZE):
+        batch = users[offset:offset + REFRESH_BATCH_SIZE]
+        seen = {}
+        for user in batch:
+            previous = getattr(user, 'smart_prompt_state', None)
+            seen[user.id] = {p['message'] for p in previous.prompts} if previous else set()
+        for user, state in zip(batch, refresh_prompts_for_users(batch, now)):
+            fresh = [p for p in state.prompts if p['message'] not in seen[user.id]]
+            if fresh:
+                new_prompts[user] = fresh
+    return new_prompts
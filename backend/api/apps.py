@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.conf import settings
+        from . import signals  # noqa: F401
+        from .providers import providers
+
+        if settings.WARM_PROVIDERS:
+            providers.warm_up(settings.WARM_PROVIDERS)
@@ -0,0 +1,104 @@
+"""
+Ingest-time deduplication of conversation memories.
+
+Chat and voice flows repeat themselves ("ok thanks", the same reminder re-acknowledged),
+so many new memories are near-copies of recent ones. A new memory counts as a duplicate
+of one of the user's recent memories with the same role when:
+
+* their 64-bit SimHash fingerprints (over word unigrams and bigrams) are within
+  MEMORY_DEDUP_MAX_DISTANCE bits, and
+* when both carry embeddings, their cosine similarity is at least MEMORY_DEDUP_MIN_COSINE.
+
+Duplicates are not inserted. The existing row is reinforced instead: its relevance_score
+goes up by MEMORY_DEDUP_RELEVANCE_BUMP (capped at 1.0, keeping scores within [0, 1]) and
+its timestamp moves to now, so it ranks as fresh.
+
+Words are Unicode word runs, so Cyrillic or CJK text is fingerprinted like English. Text
+with no words at all (emoji, punctuation) has no fingerprint and is never deduplicated.
+"""
+import hashlib
+import math
+import re
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Memory
+
+SIMHASH_BITS = 64
+_WORD = re.compile(r"\w+(?:'\w+)*")
+
+
+def _features(text):
+    words = _WORD.findall(text.lower())
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+def simhash(text):
+    """64-bit SimHash; near-identical texts differ in few bits."""
+    weights = [0] * SIMHASH_BITS
+    for feature in _features(text):
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def reinforce(memory, bump=None):
+    """Merge a duplicate into `memory`: raise its relevance and refresh its timestamp."""
+    bump = settings.MEMORY_DEDUP_RELEVANCE_BUMP if bump is None else bump
+    memory.relevance_score = min(1.0, max(0.0, memory.relevance_score + bump))
+    memory.timestamp = timezone.now()
+    memory.save(update_fields=['relevance_score', 'timestamp'])
+    return memory
+
+
+class RecentMemories:
+    """A user's most recent memories with fingerprints, extended as a batch is ingested."""
+
+    def __init__(self, user, window=None):
+        window = settings.MEMORY_DEDUP_WINDOW if window is None else window
+        recent = Memory.objects.filter(user=user).only(
+            'id', 'user', 'message', 'role', 'vector_embedding', 'relevance_score', 'timestamp'
+        )[:window] if window else []
+        self.entries = [(self._fingerprint(m.message), m) for m in recent]
+        self.checked = 0
+        self.merged = 0
+
+    def add(self, memory):
+        self.entries.insert(0, (self._fingerprint(memory.message), memory))
+
+    @staticmethod
+    def _fingerprint(message):
+        return simhash(message) if _features(message) else None
+
+    def find(self, message, role, embedding=None):
+        """The most recent near-duplicate of (message, role, embedding), if any."""
+        self.checked += 1
+        fingerprint = self._fingerprint(message)
+        if fingerprint is None:
+            return None
+        for candidate_hash, memory in self.entries:
+            if memory.role != role or candidate_hash is None or \
+                    hamming(fingerprint, candidate_hash) > settings.MEMORY_DEDUP_MAX_DISTANCE:
+                continue
+            if embedding and memory.vector_embedding and \
+                    cosine(embedding, memory.vector_embedding) < settings.MEMORY_DEDUP_MIN_COSINE:
+                continue
+            self.merged += 1
+            return memory
+        return None
+
+    @property
+    def percent(self):
+        return round(100.0 * self.merged / self.checked, 1) if self.checked else 0.0
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:02
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_memory_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmartPromptState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompts', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('is_stale', models.BooleanField(default=True)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('next_refresh_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='smart_prompt_state', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_stale'], name='api_smartpr_is_stal_3bde31_idx'), models.Index(fields=['next_refresh_at'], name='api_smartpr_next_re_26720d_idx')],
+            },
+        ),
+    ]
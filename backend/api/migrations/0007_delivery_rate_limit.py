@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_delivery_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryschedule',
+            name='tokens',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deliveryschedule',
+            name='tokens_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delivery_rate_limit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoryChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField()),
+                ('memory_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+    ]
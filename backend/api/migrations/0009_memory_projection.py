@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_memory_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='projection_version',
+            field=models.CharField(blank=True, db_default='', default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='reduced_embedding',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
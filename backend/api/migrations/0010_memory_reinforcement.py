@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_memory_projection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='access_count',
+            field=models.PositiveIntegerField(db_default=0, default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='reinforced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='reinforcement',
+            field=models.FloatField(db_default=0.0, default=0.0),
+        ),
+    ]
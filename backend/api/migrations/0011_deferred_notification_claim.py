@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_memory_reinforcement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deferrednotification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -115,7 +116,15 @@ class Memory(models.Model):
     ])
     context = models.JSONField(default=dict)  # Stores emotion, task context, etc.
     vector_embedding = models.JSONField(null=True, blank=True)  # For semantic search
+    # Reduced-dimension copy of vector_embedding written by the realtime service's projection
+    # job; db_default so its direct SQL inserts need not know about these columns
+    reduced_embedding = models.JSONField(null=True, blank=True)
+    projection_version = models.CharField(max_length=32, blank=True, default='', db_default='')
     relevance_score = models.FloatField(default=1.0)  # For memory importance/decay
+    # Retrieval boost included in relevance_score, decaying from reinforced_at (see api.reinforcement)
+    reinforcement = models.FloatField(default=0.0, db_default=0.0)
+    reinforced_at = models.DateTimeField(null=True, blank=True)
+    access_count = models.PositiveIntegerField(default=0, db_default=0)
     timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
@@ -128,3 +137,103 @@ class Memory(models.Model):
 
     def __str__(self):
         return f"{self.role} message from {self.user.username} at {self.timestamp}"
+
+
+class MemoryChange(models.Model):
+    """
+    Append-only journal of Memory inserts, updates and deletes, written by signals.
+    `seq` only increases, so consumers such as the realtime service's in-memory search
+    indexes tail it with `seq > cursor` instead of re-reading users' histories.
+    Rows outlive the memory (and user) they describe, so ids are plain integers.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    seq = models.BigAutoField(primary_key=True)
+    user_id = models.BigIntegerField()
+    memory_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=[(UPSERT, _('Upsert')), (DELETE, _('Delete'))])
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} memory {self.memory_id}"
+
+
+class SmartPromptState(models.Model):
+    """
+    Per-user smart prompt snapshot, kept current by change events on the user's data.
+    Time-based rules (e.g. the inactivity nudge) are tracked as a single next-refresh timer.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='smart_prompt_state'
+    )
+    prompts = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    is_stale = models.BooleanField(default=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    next_refresh_at = models.DateTimeField(null=True, blank=True)  # Earliest time-based rule timer
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_stale']),
+            models.Index(fields=['next_refresh_at']),
+        ]
+
+    def __str__(self):
+        return f"Smart prompts for {self.user.username}"
+
+
+class DeliverySchedule(models.Model):
+    """
+    Precomputed notification window for a user, in UTC.
+    Derived from the user's timezone and quiet hours so dispatchers never parse preferences.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='delivery_schedule'
+    )
+    window_start = models.DateTimeField()  # Current or next allowed send window
+    window_end = models.DateTimeField(null=True, blank=True)  # Null when the user has no quiet hours
+    timezone = models.CharField(max_length=50, default='UTC')
+    quiet_hours_start = models.TimeField(null=True, blank=True)
+    quiet_hours_end = models.TimeField(null=True, blank=True)
+    tokens = models.FloatField(null=True, blank=True)  # Rate-limit token bucket; null means full
+    tokens_updated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['window_start', 'window_end']),
+            models.Index(fields=['window_end']),
+        ]
+
+    def __str__(self):
+        return f"Delivery window for {self.user.username} from {self.window_start}"
+
+
+class DeferredNotification(models.Model):
+    """
+    A notification waiting in the per-user outbox.
+    Held while it coalesces with others, during quiet hours, or while the user is rate limited.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Set by the dispatcher that is sending this row, so overlapping runs skip it
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Deferred notification for {self.user.username}: {self.title}"
@@ -0,0 +1,285 @@
+"""
+Notification delivery windows, coalescing and rate shaping.
+
+Each user's timezone and quiet hours are folded into a DeliverySchedule row holding the
+current or next allowed send window in UTC. Dispatchers check eligibility with an indexed
+range query instead of loading and parsing every user's preferences.
+
+Jobs queue notifications into a per-user outbox. The dispatcher waits out a short
+coalescing window, merges everything queued for a user into one push with a collapse key,
+and spends one token from the user's bucket per push, so bursts become a single message.
+
+Dispatchers may overlap (cron overlap, several workers). Each run locks the ready rows with
+SELECT ... FOR UPDATE SKIP LOCKED and marks the ones it will send as claimed before calling
+the push provider, so a notification is pushed by one run only.
+"""
+import datetime
+from collections import defaultdict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DeliverySchedule, DeferredNotification
+
+User = get_user_model()
+
+
+def _parse_time(value):
+    if isinstance(value, datetime.time):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.time.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def quiet_hours(user):
+    """Return the user's (start, end) quiet hours as times, or (None, None)."""
+    prefs = user.preferences if isinstance(user.preferences, dict) else {}
+    notification_prefs = prefs.get('notifications', {})
+    if not isinstance(notification_prefs, dict):
+        return None, None
+    start = _parse_time(notification_prefs.get('quiet_hours_start'))
+    end = _parse_time(notification_prefs.get('quiet_hours_end'))
+    if start is None or end is None or start == end:
+        return None, None
+    return start, end
+
+
+def _next_local(local_now, at, tz):
+    """The first local occurrence of wall-clock time `at` strictly after local_now."""
+    candidate = datetime.datetime.combine(local_now.date(), at, tzinfo=tz)
+    if candidate <= local_now:
+        candidate = datetime.datetime.combine(local_now.date() + datetime.timedelta(days=1), at, tzinfo=tz)
+    return candidate
+
+
+def compute_delivery_window(tz_name, quiet_start, quiet_end, now):
+    """Return the (start, end) UTC window in which notifications may be sent.
+
+    When `now` falls inside quiet hours the window starts when they end; otherwise it is
+    already open and closes when quiet hours next begin. `end` is None without quiet hours.
+    """
+    if quiet_start is None or quiet_end is None:
+        return now, None
+
+    tz = _zone(tz_name)
+    local_now = now.astimezone(tz)
+    t = local_now.time().replace(tzinfo=None)
+    if quiet_start < quiet_end:
+        in_quiet = quiet_start <= t < quiet_end
+    else:  # Quiet hours span midnight, e.g. 22:00-07:00
+        in_quiet = t >= quiet_start or t < quiet_end
+
+    if in_quiet:
+        start = _next_local(local_now, quiet_end, tz)
+        end = _next_local(start, quiet_start, tz)
+    else:
+        start = local_now
+        end = _next_local(local_now, quiet_start, tz)
+    return start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
+
+
+def refresh_delivery_schedule(user, now=None):
+    """Recompute and store a user's delivery window."""
+    now = now or timezone.now()
+    quiet_start, quiet_end = quiet_hours(user)
+    window_start, window_end = compute_delivery_window(user.timezone, quiet_start, quiet_end, now)
+    schedule, _ = DeliverySchedule.objects.update_or_create(
+        user=user,
+        defaults={
+            'window_start': window_start,
+            'window_end': window_end,
+            'timezone': user.timezone,
+            'quiet_hours_start': quiet_start,
+            'quiet_hours_end': quiet_end,
+        }
+    )
+    return schedule
+
+
+def sync_delivery_schedule(user, now=None):
+    """Refresh the schedule only if the user's timezone or quiet hours changed."""
+    quiet_start, quiet_end = quiet_hours(user)
+    schedule = DeliverySchedule.objects.filter(user=user).first()
+    if (schedule and schedule.timezone == user.timezone
+            and schedule.quiet_hours_start == quiet_start
+            and schedule.quiet_hours_end == quiet_end):
+        return schedule
+    return refresh_delivery_schedule(user, now)
+
+
+def refresh_expired_schedules(now=None):
+    """Roll closed windows forward and create schedules for users that have none."""
+    now = now or timezone.now()
+    users = User.objects.filter(
+        Q(delivery_schedule__isnull=True) | Q(delivery_schedule__window_end__lte=now)
+    )
+    count = 0
+    for user in users:
+        refresh_delivery_schedule(user, now)
+        count += 1
+    return count
+
+
+def open_window_filter(now, prefix=''):
+    """Q matching schedules whose window contains `now`; served by the (window_start, window_end) index."""
+    return (
+        Q(**{f'{prefix}window_start__lte': now})
+        & (Q(**{f'{prefix}window_end__gt': now}) | Q(**{f'{prefix}window_end__isnull': True}))
+    )
+
+
+def eligible_user_ids(now=None):
+    """IDs of users whose delivery window is open right now, in one indexed range query."""
+    now = now or timezone.now()
+    return DeliverySchedule.objects.filter(open_window_filter(now)).values_list('user_id', flat=True)
+
+
+def is_deliverable(user_id, now=None):
+    """True when the user's window is open; users without a schedule yet are not held back."""
+    now = now or timezone.now()
+    schedule = DeliverySchedule.objects.filter(user_id=user_id).values('window_start', 'window_end').first()
+    if schedule is None:
+        return True
+    return schedule['window_start'] <= now and (schedule['window_end'] is None or schedule['window_end'] > now)
+
+
+def queue_notification(user_id, title, body, data=None):
+    """Add a notification to the user's outbox; the dispatcher merges and rate-limits delivery."""
+    return DeferredNotification.objects.create(user_id=user_id, title=title, body=body, data=data or {})
+
+
+def collapse_key(notifications):
+    """Collapse key shared by pushes of the same kind, so devices keep only the newest."""
+    kinds = {n.data.get('type') for n in notifications if isinstance(n.data, dict)}
+    if len(kinds) == 1 and None not in kinds:
+        return f"chaos-{kinds.pop()}"
+    return 'chaos-digest'
+
+
+def build_digest(notifications):
+    """Coalesce several notifications into a single (title, body, data) message."""
+    if len(notifications) == 1:
+        only = notifications[0]
+        return only.title, only.body, only.data
+    body = '\n'.join(f"• {n.body}" for n in notifications)
+    kinds = sorted({str(n.data.get('type')) for n in notifications if isinstance(n.data, dict) and n.data.get('type')})
+    return (
+        f"{len(notifications)} new updates",
+        body,
+        {'type': 'digest', 'count': str(len(notifications)), 'types': ','.join(kinds)},
+    )
+
+
+class TokenBucket:
+    """Per-user send budget persisted on DeliverySchedule: `burst` tokens, one refilled every `refill_seconds`."""
+
+    def __init__(self, burst=None, refill_seconds=None):
+        self.burst = burst if burst is not None else settings.NOTIFICATION_RATE_BURST
+        self.refill_seconds = (refill_seconds if refill_seconds is not None
+                               else settings.NOTIFICATION_RATE_REFILL_SECONDS)
+
+    def available(self, schedule, now):
+        if schedule.tokens is None or schedule.tokens_updated_at is None:
+            return float(self.burst)
+        elapsed = max(0.0, (now - schedule.tokens_updated_at).total_seconds())
+        refill = elapsed / self.refill_seconds if self.refill_seconds else float(self.burst)
+        return min(float(self.burst), schedule.tokens + refill)
+
+    def take(self, schedule, now):
+        """Consume a token if one is available; updates the schedule in memory only."""
+        tokens = self.available(schedule, now)
+        schedule.tokens = tokens - 1 if tokens >= 1 else tokens
+        schedule.tokens_updated_at = now
+        return tokens >= 1
+
+
+def _claim_ready(now, coalesce_seconds, bucket, stats):
+    """Lock the ready outbox rows, claim the ones to send now; returns [(user, notifications)]."""
+    buffer_until = now - datetime.timedelta(seconds=coalesce_seconds)
+    stale_claim = now - datetime.timedelta(seconds=settings.NOTIFICATION_CLAIM_SECONDS)
+    with transaction.atomic():
+        pending = (DeferredNotification.objects
+                   .filter(open_window_filter(now, prefix='user__delivery_schedule__'))
+                   .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale_claim))
+                   .select_related('user', 'user__delivery_schedule')
+                   .select_for_update(skip_locked=True, of=('self',)))
+        by_user = defaultdict(list)
+        for notification in pending:
+            by_user[notification.user].append(notification)
+
+        claimed, spent = [], []
+        for user, notifications in by_user.items():
+            stats['queued'] += len(notifications)
+            if coalesce_seconds and notifications[0].created_at > buffer_until:
+                stats['buffering'] += 1
+                continue
+            if not user.fcm_token:
+                stats['no_token'] += 1
+                continue
+            schedule = user.delivery_schedule
+            spent.append(schedule)
+            if not bucket.take(schedule, now):
+                stats['throttled'] += 1
+                continue
+            claimed.append((user, notifications))
+
+        DeferredNotification.objects.filter(
+            pk__in=[n.pk for _, notifications in claimed for n in notifications]
+        ).update(claimed_at=now)
+        if spent:
+            DeliverySchedule.objects.bulk_update(spent, ['tokens', 'tokens_updated_at'])
+    return claimed
+
+
+def dispatch_notifications(send, now=None, coalesce_seconds=None, bucket=None):
+    """Deliver one merged push per user whose outbox is ready.
+
+    A user's outbox is ready once their delivery window is open and the oldest queued
+    notification has waited out the coalescing window. Users without a device token, and
+    users whose push fails, are left queued, so later notifications merge into the same push.
+    `send(user, title, body, data, collapse_key)` performs the actual push and returns
+    whether it was delivered; it runs after the claim is committed, outside any transaction.
+    """
+    now = now or timezone.now()
+    coalesce_seconds = settings.NOTIFICATION_COALESCE_SECONDS if coalesce_seconds is None else coalesce_seconds
+    bucket = bucket or TokenBucket()
+
+    stats = {'queued': 0, 'sent': 0, 'buffering': 0, 'throttled': 0, 'no_token': 0, 'failed': 0}
+    for user, notifications in _claim_ready(now, coalesce_seconds, bucket, stats):
+        rows = DeferredNotification.objects.filter(pk__in=[n.pk for n in notifications])
+        title, body, data = build_digest(notifications)
+        try:
+            delivered = send(user, title, body, data, collapse_key(notifications))
+        except Exception:
+            rows.update(claimed_at=None)
+            raise
+        if not delivered:
+            stats['failed'] += 1
+            rows.update(claimed_at=None)  # Back in the queue for the next run
+            continue
+        stats['sent'] += 1
+        rows.delete()
+    return stats
+
+
+def flush_deferred_notifications(send, now=None):
+    """Deliver everything whose window is open immediately, without coalescing delay.
+
+    Returns the number of merged pushes sent.
+    """
+    return dispatch_notifications(send, now, coalesce_seconds=0)['sent']
@@ -0,0 +1,247 @@
+"""
+Declarative smart-prompt rules.
+
+Each rule names a source model, static ORM conditions, a time field with an optional
+window/lead, and a threshold. Rules are compiled once into grouped aggregate queries that
+evaluate a whole batch of users at a time, plus an in-memory predicate over each aggregated
+row. Evaluation therefore costs one query per rule per batch, regardless of batch size.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Count, Max, Min, Q, TextField, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Task, Reminder, MoodLog
+
+DUE = 'due'        # Rows whose time has arrived (within window/lead) count towards the threshold
+IDLE = 'idle'      # Fires when the newest row is older than the window
+RECENT = 'recent'  # Rows inside the trailing window count towards the threshold
+
+PROMPT = 'prompt'
+HABIT = 'habit'
+
+
+@dataclass(frozen=True)
+class PromptRule:
+    name: str
+    model: type
+    message: str
+    time_field: str
+    mode: str = DUE
+    category: str = PROMPT
+    user_field: str = 'user'
+    conditions: Q = field(default_factory=Q)
+    annotations: dict = field(default_factory=dict)
+    window: Optional[timedelta] = None
+    lead: timedelta = timedelta(0)
+    threshold: int = 1
+    group_by: tuple = ()  # One prompt per group, e.g. per routine
+    action_type: Optional[str] = None
+    action_data: Optional[str] = None  # Name of a group_by field to pass through
+
+
+@dataclass
+class RuleStats:
+    evaluations: int = 0
+    queries: int = 0
+    rows: int = 0
+    fired: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def as_dict(self):
+        return {
+            'evaluations': self.evaluations,
+            'queries': self.queries,
+            'rows': self.rows,
+            'fired': self.fired,
+            'total_ms': round(self.total_seconds * 1000, 3),
+            'max_ms': round(self.max_seconds * 1000, 3),
+            'avg_ms': round(self.total_seconds * 1000 / self.evaluations, 3) if self.evaluations else 0.0,
+        }
+
+
+class CompiledRule:
+    """A rule lowered to a grouped aggregate query and an in-memory predicate."""
+
+    def __init__(self, rule):
+        if rule.mode not in (DUE, IDLE, RECENT):
+            raise ValueError(f"Unknown rule mode: {rule.mode}")
+        if rule.mode in (IDLE, RECENT) and rule.window is None:
+            raise ValueError(f"Rule {rule.name} needs a window for mode {rule.mode}")
+        self.rule = rule
+        self.stats = RuleStats()
+        self._user_in = f'{rule.user_field}__in'
+        self._values = (rule.user_field, *rule.group_by)
+        self._base = rule.model.objects.filter(rule.conditions)
+        if rule.annotations:
+            self._base = self._base.annotate(**rule.annotations)
+
+    def _aggregates(self, now):
+        rule, t = self.rule, self.rule.time_field
+        if rule.mode == IDLE:
+            return {'latest': Max(t)}
+        if rule.mode == RECENT:
+            in_window = Q(**{f'{t}__gte': now - rule.window, f'{t}__lte': now})
+            return {'hits': Count('pk', filter=in_window), 'oldest_hit': Min(t, filter=in_window)}
+        horizon = now + rule.lead
+        in_window = Q(**{f'{t}__lte': horizon})
+        if rule.window is not None:
+            in_window &= Q(**{f'{t}__gte': now - rule.window})
+        return {
+            'hits': Count('pk', filter=in_window),
+            'oldest_hit': Min(t, filter=in_window),
+            'next_at': Min(t, filter=Q(**{f'{t}__gt': horizon})),
+        }
+
+    def queryset(self, user_ids, now):
+        return (self._base.filter(**{self._user_in: user_ids})
+                .values(*self._values)
+                .annotate(**self._aggregates(now))
+                .order_by())
+
+    def predicate(self, row, now):
+        """Return (fires, timer) for one aggregated row; timer is when the outcome can next change."""
+        rule = self.rule
+        if rule.mode == IDLE:
+            expires_at = row['latest'] + rule.window
+            if now > expires_at:
+                return True, None
+            return False, expires_at
+
+        timers = []
+        if rule.window is not None and row['oldest_hit'] is not None:
+            timers.append(row['oldest_hit'] + rule.window)
+        if rule.mode == DUE and row['next_at'] is not None:
+            timers.append(row['next_at'] - rule.lead)
+        return row['hits'] >= rule.threshold, min(timers) if timers else None
+
+    def render(self, row, timestamp):
+        rule = self.rule
+        fields = dict(row)
+        fields['count'] = row.get('hits')
+        return {
+            'message': rule.message.format(**fields),
+            'action_type': rule.action_type,
+            'action_data': row.get(rule.action_data) if rule.action_data else None,
+            'timestamp': timestamp,
+        }
+
+
+class RuleEngine:
+    """Evaluates a compiled rule set for batches of users with per-rule cost accounting."""
+
+    def __init__(self, rules):
+        self.rules = [CompiledRule(rule) for rule in rules]
+
+    def evaluate(self, user_ids, now, category=PROMPT):
+        """Return {user_id: (prompts, next_refresh_at)} for every user in user_ids."""
+        user_ids = list(user_ids)
+        timestamp = DjangoJSONEncoder().default(now)
+        results = {user_id: ([], []) for user_id in user_ids}
+        if not user_ids:
+            return {}
+
+        for compiled in self.rules:
+            if compiled.rule.category != category:
+                continue
+            query_count = [0]
+
+            def count_queries(execute, sql, params, many, context):
+                query_count[0] += 1
+                return execute(sql, params, many, context)
+
+            started = time.perf_counter()
+            with connection.execute_wrapper(count_queries):
+                rows = list(compiled.queryset(user_ids, now))
+            fired = 0
+            for row in rows:
+                prompts, timers = results[row[compiled.rule.user_field]]
+                fires, timer = compiled.predicate(row, now)
+                if fires:
+                    prompts.append(compiled.render(row, timestamp))
+                    fired += 1
+                if timer is not None:
+                    timers.append(timer)
+            elapsed = time.perf_counter() - started
+
+            stats = compiled.stats
+            stats.evaluations += 1
+            stats.queries += query_count[0]
+            stats.rows += len(rows)
+            stats.fired += fired
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+
+        return {
+            user_id: (prompts, min(timers) if timers else None)
+            for user_id, (prompts, timers) in results.items()
+        }
+
+    def stats(self):
+        return {compiled.rule.name: compiled.stats.as_dict() for compiled in self.rules}
+
+    def reset_stats(self):
+        for compiled in self.rules:
+            compiled.stats = RuleStats()
+
+
+DEFAULT_RULES = [
+    PromptRule(
+        name='missed_routine',
+        model=Task,
+        conditions=Q(routine__isnull=False, status=Task.Status.PENDING),
+        time_field='start_time',
+        window=timedelta(hours=12),  # Older misses are left to reschedule_missed_routine
+        group_by=('routine', 'routine__name'),  # One prompt per routine, however many tasks it missed
+        message="You missed your routine: {routine__name}",
+    ),
+    PromptRule(
+        name='missed_reminder',
+        model=Reminder,
+        user_field='task__user',
+        conditions=Q(is_sent=False),
+        annotations={'label': Coalesce(NullIf('message', Value('')), 'task__title', output_field=TextField())},
+        time_field='trigger_time',
+        group_by=('id', 'label'),
+        message="Reminder: {label}",
+    ),
+    PromptRule(
+        name='inactivity_walk',
+        model=MoodLog,
+        mode=IDLE,
+        time_field='timestamp',
+        window=timedelta(hours=2),
+        message="Take a short walk — you've been inactive for 2 hours.",
+        action_type='walk',
+    ),
+    PromptRule(
+        name='bible_study_whatsapp',
+        model=Task,
+        conditions=Q(routine__name__icontains='bible study', status=Task.Status.PENDING),
+        time_field='start_time',
+        window=timedelta(hours=1),
+        lead=timedelta(hours=1),
+        message="It's time for your Bible study — open WhatsApp?",
+        action_type='whatsapp',
+    ),
+    PromptRule(
+        name='reschedule_missed_routine',
+        model=Task,
+        category=HABIT,
+        mode=RECENT,
+        conditions=Q(routine__isnull=False, status=Task.Status.SKIPPED),
+        time_field='updated_at',
+        window=timedelta(days=30),
+        threshold=3,
+        group_by=('routine__name',),
+        message="You often miss {routine__name}. Try a different time?",
+    ),
+]
+
+default_engine = RuleEngine(DEFAULT_RULES)
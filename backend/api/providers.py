@@ -0,0 +1,79 @@
+"""
+Lazily initialised third-party clients.
+
+Firebase Admin and the OpenAI SDK are expensive to import and configure, and most
+processes (migrations, web workers that never push, one-off commands) never touch them.
+Clients register a factory here and are built on first use; `warm_up` lets a process that
+knows it needs them pay the cost up front instead of on its first request.
+"""
+import threading
+
+from django.conf import settings
+
+
+class ProviderRegistry:
+    """Thread-safe registry of named clients built on first access."""
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No provider registered as '{name}'")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def warm_up(self, names=None):
+        """Initialise the given (or all) providers now; returns {name: error} for failures."""
+        errors = {}
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                errors[name] = e
+        return errors
+
+    def reset(self, name=None):
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+def _firebase_messaging():
+    import firebase_admin
+    from firebase_admin import credentials, messaging
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(settings.FIREBASE_ADMIN_CREDENTIALS)
+        firebase_admin.initialize_app(cred)
+    return messaging
+
+
+def _openai():
+    import openai
+
+    openai.api_key = settings.OPENAI_API_KEY
+    return openai
+
+
+providers = ProviderRegistry()
+providers.register('firebase_messaging', _firebase_messaging)
+providers.register('openai', _openai)
@@ -0,0 +1,82 @@
+"""
+Retrieval reinforcement of memory relevance.
+
+The realtime service buffers how often each memory is retrieved and flushes the totals
+here in batches. relevance_score is kept as base + reinforcement:
+
+* base is what ingest and dedup set;
+* reinforcement is the retrieval boost. It decays with a half-life of
+  MEMORY_REINFORCE_HALF_LIFE_DAYS, measured from reinforced_at, the time its value was
+  last materialized.
+
+A flush first decays the stored reinforcement to now and then adds the batch delta. The
+service pre-decays that delta from each access time, so a late flush gives the same
+result as immediate writes. The sum is capped so relevance_score stays within [0, 1],
+which search's early-termination bound relies on. decay_memory_reinforcement
+materializes decay for memories nobody retrieves any more.
+"""
+import math
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Memory, MemoryChange
+
+FIELDS = ['relevance_score', 'reinforcement', 'reinforced_at', 'access_count']
+
+
+def decayed(memory, now, half_life_days):
+    if not memory.reinforcement or memory.reinforced_at is None:
+        return 0.0
+    days = max(0.0, (now - memory.reinforced_at).total_seconds() / 86400.0)
+    return memory.reinforcement * math.exp(-math.log(2) * days / half_life_days)
+
+
+def apply(memory, now, half_life_days, accesses=0, delta=0.0):
+    """Decay `memory`'s reinforcement to `now`, add `delta`, and keep relevance_score = base + reinforcement."""
+    base = memory.relevance_score - memory.reinforcement
+    relevance = min(1.0, max(0.0, base + decayed(memory, now, half_life_days) + delta))
+    memory.relevance_score = relevance
+    memory.reinforcement = relevance - base
+    memory.reinforced_at = now
+    memory.access_count += accesses
+    return memory
+
+
+def save(memories):
+    """One bulk UPDATE plus journal entries, so resident search indexes pick up new scores."""
+    Memory.objects.bulk_update(memories, FIELDS, batch_size=500)
+    MemoryChange.objects.bulk_create(
+        [MemoryChange(user_id=m.user_id, memory_id=m.id, op=MemoryChange.UPSERT) for m in memories],
+        batch_size=500
+    )
+
+
+def reinforce_batch(rows, half_life_days=None):
+    """Apply [{'id', 'count', 'delta'}, ...]; returns the updated memories."""
+    half_life_days = float(half_life_days or settings.MEMORY_REINFORCE_HALF_LIFE_DAYS)
+    by_id = {row['id']: row for row in rows}
+    now = timezone.now()
+    memories = [
+        apply(memory, now, half_life_days, int(by_id[memory.id]['count']), float(by_id[memory.id]['delta']))
+        for memory in Memory.objects.filter(id__in=by_id).only('id', 'user_id', *FIELDS)
+    ]
+    save(memories)
+    return memories
+
+
+def decay_all(min_reinforcement=1e-3, batch_size=1000):
+    """Materialize decay for every reinforced memory; returns how many were updated."""
+    now = timezone.now()
+    half_life_days = settings.MEMORY_REINFORCE_HALF_LIFE_DAYS
+    queryset = Memory.objects.filter(reinforcement__gt=min_reinforcement).only('id', 'user_id', *FIELDS)
+    batch, updated = [], 0
+    for memory in queryset.iterator(chunk_size=batch_size):
+        batch.append(apply(memory, now, half_life_days))
+        if len(batch) == batch_size:
+            save(batch)
+            updated, batch = updated + len(batch), []
+    if batch:
+        save(batch)
+        updated += len(batch)
+    return updated
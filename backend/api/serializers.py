@@ -51,7 +51,10 @@ class MemorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Memory
         fields = '__all__'
-        read_only_fields = ('id', 'timestamp', 'vector_embedding')
+        read_only_fields = ('id', 'timestamp', 'vector_embedding', 'reduced_embedding', 'projection_version',
+                            'reinforcement', 'reinforced_at', 'access_count')
+        # Search's early-termination bound assumes relevance within [0, 1]
+        extra_kwargs = {'relevance_score': {'min_value': 0.0, 'max_value': 1.0}}
 
 
 class SmartPromptSerializer(serializers.Serializer):
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Task, Routine, Reminder, MoodLog, Memory, MemoryChange
+from .ai_smart_prompt import invalidate_user_prompts
+from .notifications import sync_delivery_schedule
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=Routine)
+@receiver([post_save, post_delete], sender=MoodLog)
+def invalidate_prompts_for_owner(sender, instance, **kwargs):
+    """Mark the owner's smart prompts stale when their activity data changes."""
+    invalidate_user_prompts(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Reminder)
+def invalidate_prompts_for_reminder(sender, instance, **kwargs):
+    """Reminders are owned through their task; a cascaded delete is covered by the task's own event."""
+    user_id = Task.objects.filter(pk=instance.task_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_user_prompts(user_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_delivery_schedule_on_preferences(sender, instance, update_fields=None, **kwargs):
+    """Keep the precomputed delivery window in step with timezone and quiet-hour changes."""
+    if update_fields is not None and not {'preferences', 'timezone'} & set(update_fields):
+        return
+    sync_delivery_schedule(instance)
+
+
+@receiver(post_save, sender=Memory)
+def journal_memory_save(sender, instance, raw=False, **kwargs):
+    """Append to the memory change feed; loaddata (raw) saves are not journaled."""
+    if not raw:
+        MemoryChange.objects.create(user_id=instance.user_id, memory_id=instance.pk, op=MemoryChange.UPSERT)
+
+
+@receiver(post_delete, sender=Memory)
+def journal_memory_delete(sender, instance, **kwargs):
+    MemoryChange.objects.create(user_id=instance.user_id, memory_id=instance.pk, op=MemoryChange.DELETE)
@@ -1,21 +1,21 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
+from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
-from api.models import Routine, Reminder
-from users.models import User
+from api import notifications
+from api.models import Task, Reminder, MemoryChange
+from api.notifications import queue_notification, refresh_expired_schedules
+from api.providers import providers
+from api.reinforcement import decay_all
+from api.ai_smart_prompt import invalidate_user_prompts
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate(settings.FIREBASE_ADMIN_CREDENTIALS)
-firebase_admin.initialize_app(cred)
-
-def send_notification(user_id, title, body, data=None):
-    """Send FCM notification to a specific user."""
+def _push(user, title, body, data=None, collapse_key=None):
+    """Send an FCM message to the user's device."""
     try:
-        user = User.objects.get(id=user_id)
         if not user.fcm_token:
             return False
 
+        # Firebase Admin SDK is initialized on first use
+        messaging = providers.get('firebase_messaging')
         message = messaging.Message(
             notification=messaging.Notification(
                 title=title,
@@ -23,6 +23,8 @@ def send_notification(user_id, title, body, data=None):
             ),
             data=data or {},
             token=user.fcm_token,
+            android=messaging.AndroidConfig(collapse_key=collapse_key) if collapse_key else None,
+            apns=messaging.APNSConfig(headers={'apns-collapse-id': collapse_key}) if collapse_key else None,
         )
         
         messaging.send(message)
@@ -31,25 +33,40 @@ def send_notification(user_id, title, body, data=None):
         print(f"Failed to send notification: {e}")
         return False
 
+def send_notification(user_id, title, body, data=None):
+    """Queue an FCM notification for a specific user.
+
+    Delivery happens in dispatch_notifications, which merges a user's queued
+    notifications into one push and honours quiet hours and rate limits.
+    """
+    queue_notification(user_id, title, body, data)
+    return True
+
+def dispatch_notifications():
+    """Roll delivery windows forward and send one merged push per ready user."""
+    refresh_expired_schedules()
+    return notifications.dispatch_notifications(_push)
+
 def check_and_notify_routines():
     """Check for upcoming routines and send notifications."""
     now = timezone.now()
-    # Get routines due in the next 5 minutes
+    # Get routine tasks starting in the next 5 minutes
     soon = now + timezone.timedelta(minutes=5)
-    routines = Routine.objects.filter(
-        time__gte=now.time(),
-        time__lt=soon.time(),
-        active=True
-    )
+    tasks = Task.objects.filter(
+        routine__isnull=False,
+        start_time__gte=now,
+        start_time__lt=soon,
+        status=Task.Status.PENDING
+    ).select_related('routine')
 
-    for routine in routines:
+    for task in tasks:
         send_notification(
-            user_id=routine.user_id,
+            user_id=task.user_id,
             title="Routine Reminder",
-            body=f"Time for: {routine.title}",
+            body=f"Time for: {task.routine.name}",
             data={
                 "type": "routine",
-                "id": str(routine.id),
+                "id": str(task.routine_id),
             }
         )
 
@@ -59,31 +76,32 @@ def check_and_notify_reminders():
     # Get reminders due in the next 5 minutes
     soon = now + timezone.timedelta(minutes=5)
     reminders = Reminder.objects.filter(
-        time__gte=now,
-        time__lt=soon,
-        completed=False
-    )
+        trigger_time__gte=now,
+        trigger_time__lt=soon,
+        is_sent=False
+    ).select_related('task')
 
     for reminder in reminders:
         send_notification(
             user_id=reminder.task.user_id,
             title="Task Reminder",
-            body=reminder.title or f"Reminder for: {reminder.task.title}",
+            body=reminder.message or f"Reminder for: {reminder.task.title}",
             data={
                 "type": "reminder",
                 "id": str(reminder.id),
                 "task_id": str(reminder.task.id),
             }
         )
+    # A queryset update sends no post_save, so invalidate the owners' smart prompts here
+    Reminder.objects.filter(pk__in=[r.pk for r in reminders]).update(is_sent=True)
+    for user_id in {reminder.task.user_id for reminder in reminders}:
+        invalidate_user_prompts(user_id)
 
 def check_smart_prompts():
-    """Check and notify users about smart prompts."""
-    from api.ai_smart_prompt import SmartPromptEngine
-    
-    for user in User.objects.filter(is_active=True):
-        engine = SmartPromptEngine(user)
-        prompts = engine.get_prompts()
-        
+    """Notify users about new smart prompts, refreshing only users with recent activity or due timers."""
+    from api.ai_smart_prompt import run_smart_prompt_engine
+
+    for user, prompts in run_smart_prompt_engine().items():
         for prompt in prompts:
             send_notification(
                 user_id=user.id,
@@ -94,4 +112,16 @@ def check_smart_prompts():
                     "action_type": prompt.get('action_type'),
                     "action_data": prompt.get('action_data'),
                 }
-            )
\ No newline at end of file
+            )
+
+
+def prune_memory_changes():
+    """Drop change-feed entries older than the retention window; consumers that far behind rebuild."""
+    cutoff = timezone.now() - timedelta(days=settings.MEMORY_CHANGE_RETENTION_DAYS)
+    deleted, _ = MemoryChange.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def decay_memory_reinforcement():
+    """Materialize the decay of retrieval boosts for memories that are no longer being retrieved."""
+    return decay_all()
@@ -1,13 +1,30 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from datetime import timedelta
 import numpy as np
 from unittest.mock import patch, AsyncMock, Mock
-from .models import Memory
+from .models import (
+    Memory, MemoryChange, MoodLog, Task, Routine, Reminder, SmartPromptState, DeliverySchedule,
+    DeferredNotification
+)
 from .serializers import MemorySerializer
+from .ai_smart_prompt import PROMPT_CACHE_KEY, SmartPromptEngine, get_cached_prompts, run_smart_prompt_engine
+from .prompt_rules import RuleEngine, DEFAULT_RULES, PROMPT
+from .notifications import (
+    compute_delivery_window, eligible_user_ids, is_deliverable, queue_notification,
+    flush_deferred_notifications, dispatch_notifications, refresh_expired_schedules, TokenBucket
+)
+from .providers import ProviderRegistry
+import datetime
+import os
+import subprocess
+import sys
+from pathlib import Path
 
 User = get_user_model()
 
@@ -113,6 +130,24 @@ class MemoryAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_malformed_query_params_are_rejected(self):
+        """Test that bad ids, cursors and limits return 400 instead of 500."""
+        Memory.objects.create(user=self.user, **self.memory_data)
+        for params in ({'ids': '1,x'}, {'before': 'yesterday'}, {'limit': 'ten'}, {'limit': '-1'},
+                       {'before': '2026-01-01T00:00:00+00:00', 'before_id': 'x'}, {'min_relevance': 'high'}):
+            response = self.client.get('/api/v1/memories/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+        response = self.client.get('/api/v1/memories/', {'before': '2999-01-01T00:00:00+00:00', 'before_id': 1})
+        self.assertEqual(len(response.data), 1)
+
+    def test_relevance_score_must_be_within_unit_interval(self):
+        data = {**self.memory_data, 'user': self.user.id}
+        for score in (-0.1, 1.5):
+            response = self.client.post('/api/v1/memories/', {**data, 'relevance_score': score}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/v1/memories/', {**data, 'relevance_score': 0.4}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     @patch('httpx.post')
     def test_semantic_search(self, mock_post):
         """Test semantic search functionality."""
@@ -129,7 +164,7 @@ class MemoryAPITests(APITestCase):
         mock_resp.json = Mock(return_value=[MemorySerializer(memory).data])
         mock_post.return_value = mock_resp
         
-        with self.settings(REALTIME_SERVICE_URL='http://test-service:8000'):
+        with self.settings(REALTIME_SERVICE_URL='http://test-service:8000', MEMORY_FEED_TOKEN='s3cret'):
             response = self.client.post(
                 '/api/v1/memories/semantic_search/',
                 {"query": "test search"},
@@ -137,6 +172,7 @@ class MemoryAPITests(APITestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             mock_post.assert_called_once()
+            self.assertEqual(mock_post.call_args.kwargs['headers']['X-Service-Token'], 's3cret')
 
     def test_memory_cleanup(self):
         """Test memory cleanup functionality."""
@@ -253,6 +289,25 @@ class MemoryAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)  # Should include recent and week-old memories
 
+    def test_keyset_pages_newest_first(self):
+        """Test before/before_id/limit paging used by the realtime search walk."""
+        same_time = timezone.now() - timedelta(days=1)
+        memories = [
+            Memory.objects.create(user=self.user, timestamp=same_time, **self.memory_data)
+            for _ in range(3)
+        ]
+        Memory.objects.create(user=self.user, timestamp=timezone.now(), **self.memory_data)
+
+        first = self.client.get('/api/v1/memories/', {'limit': 2})
+        self.assertEqual(len(first.data), 2)
+        last = first.data[-1]
+        self.assertEqual(last['id'], memories[2].id)
+
+        rest = self.client.get('/api/v1/memories/', {
+            'limit': 10, 'before': last['timestamp'], 'before_id': last['id']
+        })
+        self.assertEqual([m['id'] for m in rest.data], [memories[1].id, memories[0].id])
+
     def test_unauthorized_access(self):
         """Test unauthorized access to memories."""
         # Create another user and their memory
@@ -325,3 +380,587 @@ class MemoryAPITests(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(all(m["relevance_score"] == 0.5 for m in response.data))
+
+    def test_bulk_merges_near_duplicates(self):
+        """Near-duplicate memories reinforce the existing row instead of inserting."""
+        earlier = timezone.now() - timedelta(days=2)
+        existing = Memory.objects.create(
+            user=self.user, message="Remind me to call the dentist", role="user",
+            relevance_score=0.6, timestamp=earlier
+        )
+        memories_data = [
+            {**self.memory_data, "message": "remind me to call the dentist!"},
+            {**self.memory_data, "message": "Ok thanks"},
+            {**self.memory_data, "message": "ok, thanks"},
+            {**self.memory_data, "message": "Pick up groceries after work"},
+            {**self.memory_data, "message": "Remind me to call the dentist", "role": "assistant"},
+        ]
+        response = self.client.post('/api/v1/memories/bulk/', {"memories": memories_data}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response.data[0]["id"], existing.id)
+        self.assertEqual(response.data[1]["id"], response.data[2]["id"])
+        self.assertEqual(Memory.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(response['X-Deduplicated'], '2')
+        self.assertEqual(response['X-Deduplicated-Percent'], '40.0')
+
+        existing.refresh_from_db()
+        self.assertAlmostEqual(existing.relevance_score, 0.7)
+        self.assertGreater(existing.timestamp, earlier)
+
+    def test_embedding_distance_guards_text_matches(self):
+        """Matching text with distant embeddings is not a duplicate."""
+        from .dedup import RecentMemories
+
+        Memory.objects.create(user=self.user, message="Water the plants", role="user",
+                              vector_embedding=[1.0, 0.0])
+        recent = RecentMemories(self.user)
+        self.assertIsNone(recent.find("Water the plants", "user", [0.0, 1.0]))
+        self.assertIsNotNone(recent.find("Water the plants", "user", [0.99, 0.05]))
+        self.assertEqual(recent.percent, 50.0)
+
+    def test_non_latin_and_wordless_messages_are_not_merged(self):
+        memories_data = [
+            {**self.memory_data, "message": "Привет, как дела?"},
+            {**self.memory_data, "message": "Мне нужно к врачу завтра"},
+            {**self.memory_data, "message": "こんにちは"},
+            {**self.memory_data, "message": "さようなら"},
+            {**self.memory_data, "message": "🎉🎉"},
+            {**self.memory_data, "message": "🙂"},
+            {**self.memory_data, "message": "Мне нужно к врачу завтра!"},
+        ]
+        response = self.client.post('/api/v1/memories/bulk/', {"memories": memories_data}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Memory.objects.filter(user=self.user).count(), 6)
+        self.assertEqual(response.data[6]["id"], response.data[1]["id"])
+
+    def test_reinforce_rejects_bad_bumps(self):
+        memory = Memory.objects.create(user=self.user, message="Daily standup", role="user",
+                                       relevance_score=0.5)
+        for bump in ("x", -0.5, 0, 2, None):
+            response = self.client.post(f'/api/v1/memories/{memory.id}/reinforce/', {"bump": bump}, format='json')
+            if bump is None:
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            else:
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        memory.refresh_from_db()
+        self.assertAlmostEqual(memory.relevance_score, 0.5 + settings.MEMORY_DEDUP_RELEVANCE_BUMP)
+
+    def test_service_reinforces_on_behalf_of_the_owner(self):
+        memory = Memory.objects.create(user=self.user, message="Daily standup", role="user",
+                                       relevance_score=0.5)
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        url = f'/api/v1/memories/{memory.id}/reinforce/'
+        self.client.force_authenticate(user=None)
+        with self.settings(MEMORY_FEED_TOKEN='s3cret'):
+            self.assertEqual(self.client.post(url, {"bump": 0.1, "user": self.user.id}, format='json').status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+            response = self.client.post(url, {"bump": 0.1, "user": other.id}, format='json',
+                                        HTTP_X_SERVICE_TOKEN='s3cret')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            response = self.client.post(url, {"bump": 0.1, "user": self.user.id}, format='json',
+                                        HTTP_X_SERVICE_TOKEN='s3cret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(response.data["relevance_score"], 0.6)
+
+    def test_reinforce_caps_relevance(self):
+        memory = Memory.objects.create(user=self.user, message="Daily standup", role="user",
+                                       relevance_score=0.95)
+        response = self.client.post(f'/api/v1/memories/{memory.id}/reinforce/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["relevance_score"], 1.0)
+
+
+class MemoryChangeFeedTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='feeduser', email='feed@example.com', password='x')
+
+    def test_saves_and_deletes_are_journaled_in_order(self):
+        memory = Memory.objects.create(user=self.user, message="Journal me", role="user")
+        memory.relevance_score = 0.5
+        memory.save()
+        Memory.objects.filter(pk=memory.pk).delete()
+        changes = list(MemoryChange.objects.values_list('memory_id', 'op'))
+        self.assertEqual(changes, [(memory.pk, 'upsert'), (memory.pk, 'upsert'), (memory.pk, 'delete')])
+        seqs = list(MemoryChange.objects.values_list('seq', flat=True))
+        self.assertEqual(seqs, sorted(seqs))
+
+    def test_feed_requires_service_token(self):
+        Memory.objects.create(user=self.user, message="One", role="user")
+        with self.settings(MEMORY_FEED_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/api/v1/memory-changes/').status_code, 401)
+            response = self.client.get('/api/v1/memory-changes/', HTTP_X_SERVICE_TOKEN='s3cret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changes'], [])
+        self.assertEqual(response.data['latest_seq'], MemoryChange.objects.get().seq)
+
+    def test_feed_pages_after_cursor(self):
+        first = Memory.objects.create(user=self.user, message="One", role="user")
+        cursor = MemoryChange.objects.get().seq
+        second = Memory.objects.create(user=self.user, message="Two", role="user")
+        first_id = first.pk
+        first.delete()
+        with self.settings(MEMORY_FEED_TOKEN='s3cret'):
+            response = self.client.get('/api/v1/memory-changes/', {'after': cursor, 'limit': 10},
+                                       HTTP_X_SERVICE_TOKEN='s3cret')
+        self.assertEqual(
+            [(c['memory_id'], c['op']) for c in response.data['changes']],
+            [(second.pk, 'upsert'), (first_id, 'delete')]
+        )
+
+    def test_prune_drops_old_entries(self):
+        from .tasks import prune_memory_changes
+
+        Memory.objects.create(user=self.user, message="Old", role="user")
+        MemoryChange.objects.update(created_at=timezone.now() - timedelta(days=30))
+        Memory.objects.create(user=self.user, message="New", role="user")
+        self.assertEqual(prune_memory_changes(), 1)
+        self.assertEqual(MemoryChange.objects.count(), 1)
+
+
+class MemoryProjectionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='projuser', email='proj@example.com', password='x')
+        self.first = Memory.objects.create(user=self.user, message="One", role="user", vector_embedding=[1.0, 0.0])
+        self.second = Memory.objects.create(user=self.user, message="Two", role="user", vector_embedding=[0.0, 1.0])
+        Memory.objects.create(user=self.user, message="No embedding", role="user")
+
+    def test_requires_service_token(self):
+        with self.settings(MEMORY_FEED_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/api/v1/memory-projections/').status_code, 401)
+
+    def test_stale_rows_are_paged_and_updated(self):
+        with self.settings(MEMORY_FEED_TOKEN='s3cret'):
+            response = self.client.get('/api/v1/memory-projections/', {'stale_for': 'pca-v1'},
+                                       HTTP_X_SERVICE_TOKEN='s3cret')
+            self.assertEqual([row['id'] for row in response.data['rows']], [self.first.pk, self.second.pk])
+            changes = MemoryChange.objects.count()
+            response = self.client.post('/api/v1/memory-projections/', {
+                'version': 'pca-v1', 'rows': [{'id': self.first.pk, 'reduced_embedding': [1.0]}],
+            }, format='json', HTTP_X_SERVICE_TOKEN='s3cret')
+            self.assertEqual(response.data, {'updated': 1})
+            response = self.client.get('/api/v1/memory-projections/', {'stale_for': 'pca-v1'},
+                                       HTTP_X_SERVICE_TOKEN='s3cret')
+        self.assertEqual([row['id'] for row in response.data['rows']], [self.second.pk])
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.projection_version, self.first.reduced_embedding), ('pca-v1', [1.0]))
+        self.assertEqual(MemoryChange.objects.count(), changes)
+
+
+class MemoryReinforcementTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reinforce', email='reinforce@example.com', password='x')
+        self.memory = Memory.objects.create(user=self.user, message="Dentist Friday", role="user",
+                                            relevance_score=0.6)
+
+    def post(self, rows):
+        with self.settings(MEMORY_FEED_TOKEN='s3cret'):
+            return self.client.post('/api/v1/memory-reinforcements/', {'rows': rows}, format='json',
+                                    HTTP_X_SERVICE_TOKEN='s3cret')
+
+    def test_batch_adds_boost_and_journals(self):
+        changes = MemoryChange.objects.count()
+        response = self.post([{'id': self.memory.pk, 'count': 3, 'delta': 0.15}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(response.data['updated'][0]['relevance_score'], 0.75)
+        self.memory.refresh_from_db()
+        self.assertEqual(self.memory.access_count, 3)
+        self.assertAlmostEqual(self.memory.reinforcement, 0.15)
+        self.assertEqual(MemoryChange.objects.count(), changes + 1)
+
+        # Capped at 1.0, with the boost trimmed so base (0.6) is preserved
+        self.post([{'id': self.memory.pk, 'count': 10, 'delta': 0.9}])
+        self.memory.refresh_from_db()
+        self.assertAlmostEqual(self.memory.relevance_score, 1.0)
+        self.assertAlmostEqual(self.memory.relevance_score - self.memory.reinforcement, 0.6)
+
+    def test_rejects_malformed_rows(self):
+        self.assertEqual(self.post([{'id': self.memory.pk}]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_boost_decays_by_half_life(self):
+        from .tasks import decay_memory_reinforcement
+
+        Memory.objects.filter(pk=self.memory.pk).update(
+            relevance_score=0.8, reinforcement=0.2, reinforced_at=timezone.now() - timedelta(days=14)
+        )
+        with self.settings(MEMORY_REINFORCE_HALF_LIFE_DAYS=14):
+            self.assertEqual(decay_memory_reinforcement(), 1)
+        self.memory.refresh_from_db()
+        self.assertAlmostEqual(self.memory.relevance_score, 0.7, places=3)
+        self.assertAlmostEqual(self.memory.reinforcement, 0.1, places=3)
+
+
+class SmartPromptCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='promptuser',
+            email='prompt@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _log_mood(self, age):
+        mood = MoodLog.objects.create(user=self.user, mood_level=5, energy_level=5)
+        MoodLog.objects.filter(pk=mood.pk).update(timestamp=timezone.now() - age)
+        return mood
+
+    def test_view_serves_cached_prompts(self):
+        """Test that repeated reads do not recompute prompts."""
+        self._log_mood(timedelta(hours=3))
+        response = self.client.get('/api/v1/ai/smart-prompts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['action_type'], 'walk')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/v1/ai/smart-prompts/')
+        self.assertEqual(cached.data, response.data)
+
+    def test_change_event_deletes_the_cache_entry(self):
+        """Test that invalidation removes the shared cache entry, not just the state row."""
+        self._log_mood(timedelta(hours=3))
+        get_cached_prompts(self.user)
+        self.assertIsNotNone(cache.get(PROMPT_CACHE_KEY.format(user_id=self.user.id)))
+
+        MoodLog.objects.create(user=self.user, mood_level=7, energy_level=6)
+        self.assertIsNone(cache.get(PROMPT_CACHE_KEY.format(user_id=self.user.id)))
+
+    def test_change_event_invalidates_prompts(self):
+        """Test that saving activity data marks the user's prompts stale."""
+        self._log_mood(timedelta(hours=3))
+        self.assertEqual(len(get_cached_prompts(self.user)), 1)
+
+        MoodLog.objects.create(user=self.user, mood_level=7, energy_level=6)
+        self.assertTrue(SmartPromptState.objects.get(user=self.user).is_stale)
+        self.assertEqual(get_cached_prompts(self.user), [])
+
+    def test_sent_reminders_invalidate_prompts(self):
+        """Test that marking reminders sent (a queryset update) still marks prompts stale."""
+        from .tasks import check_and_notify_reminders
+
+        task = Task.objects.create(user=self.user, title='Dentist')
+        Reminder.objects.create(task=task, trigger_time=timezone.now() + timedelta(minutes=2))
+        run_smart_prompt_engine()
+        self.assertFalse(SmartPromptState.objects.get(user=self.user).is_stale)
+
+        check_and_notify_reminders()
+        self.assertTrue(Reminder.objects.get(task=task).is_sent)
+        self.assertTrue(SmartPromptState.objects.get(user=self.user).is_stale)
+
+    def test_inactivity_nudge_scheduled_as_timer(self):
+        """Test that the 2-hour inactivity rule sets a refresh timer instead of firing early."""
+        mood = self._log_mood(timedelta(hours=1))
+        mood.refresh_from_db()
+        self.assertEqual(get_cached_prompts(self.user), [])
+
+        state = SmartPromptState.objects.get(user=self.user)
+        self.assertEqual(state.next_refresh_at, mood.timestamp + timedelta(hours=2))
+
+        later = mood.timestamp + timedelta(hours=2, minutes=1)
+        refreshed = run_smart_prompt_engine(now=later)
+        self.assertEqual([p['action_type'] for p in refreshed[self.user]], ['walk'])
+
+    def test_background_refresh_skips_unchanged_users(self):
+        """Test that users without changes or due timers are not recomputed."""
+        Task.objects.create(user=self.user, title='Unscheduled')
+        run_smart_prompt_engine()
+        self.assertFalse(SmartPromptState.objects.get(user=self.user).is_stale)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(run_smart_prompt_engine(), {})
+
+
+class PromptRuleEngineTests(TestCase):
+    def setUp(self):
+        self.engine = RuleEngine(DEFAULT_RULES)
+        self.now = timezone.now()
+        self.users = [
+            User.objects.create_user(username=f'rules{i}', email=f'rules{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+
+    def test_batch_costs_one_query_per_rule(self):
+        """Test that evaluating many users does not add queries per user."""
+        for user in self.users:
+            routine = Routine.objects.create(user=user, name='Morning stretch', frequency='daily')
+            task = Task.objects.create(user=user, routine=routine, title='Stretch',
+                                       start_time=self.now - timedelta(minutes=10))
+            Reminder.objects.create(task=task, trigger_time=self.now - timedelta(minutes=5))
+
+        prompt_rules = [r for r in self.engine.rules if r.rule.category == PROMPT]
+        with self.assertNumQueries(len(prompt_rules)):
+            results = self.engine.evaluate([u.id for u in self.users], self.now)
+
+        for user in self.users:
+            messages = [p['message'] for p in results[user.id][0]]
+            self.assertIn('You missed your routine: Morning stretch', messages)
+            self.assertIn('Reminder: Stretch', messages)
+
+        stats = self.engine.stats()
+        self.assertEqual(stats['missed_routine']['queries'], 1)
+        self.assertEqual(stats['missed_routine']['fired'], 3)
+
+    def test_missed_routines_are_recent_and_once_per_routine(self):
+        """Test that only recently due tasks fire, once per routine, and long-overdue ones stop."""
+        user = self.users[0]
+        stretch = Routine.objects.create(user=user, name='Morning stretch', frequency='daily')
+        for minutes in (10, 40):
+            Task.objects.create(user=user, routine=stretch, title='Stretch',
+                                start_time=self.now - timedelta(minutes=minutes))
+        Task.objects.create(user=user, routine=stretch, title='Stretch', start_time=self.now + timedelta(hours=3))
+        journal = Routine.objects.create(user=user, name='Journaling', frequency='daily')
+        Task.objects.create(user=user, routine=journal, title='Journal', start_time=self.now - timedelta(days=2))
+
+        prompts, _ = self.engine.evaluate([user.id], self.now)[user.id]
+        self.assertEqual([p['message'] for p in prompts], ['You missed your routine: Morning stretch'])
+        prompts, _ = self.engine.evaluate([user.id], self.now + timedelta(days=1))[user.id]
+        self.assertEqual(prompts, [])
+
+    def test_bible_study_and_timers(self):
+        """Test windowed rules fire near the scheduled time and report the next timer."""
+        user = self.users[0]
+        routine = Routine.objects.create(user=user, name='Bible Study group', frequency='weekly')
+        Task.objects.create(user=user, routine=routine, title='Study', start_time=self.now + timedelta(minutes=30))
+        later = Task.objects.create(user=user, routine=routine, title='Study',
+                                    start_time=self.now + timedelta(days=7))
+
+        prompts, next_refresh_at = self.engine.evaluate([user.id], self.now)[user.id]
+        self.assertEqual([p['action_type'] for p in prompts], ['whatsapp'])
+        self.assertEqual(next_refresh_at, self.now + timedelta(minutes=30))
+
+        # Once the missed study is out of missed_routine's window, the next lead time is the timer
+        prompts, next_refresh_at = SmartPromptEngine(user, self.engine).evaluate(self.now + timedelta(hours=13))
+        self.assertEqual(next_refresh_at, later.start_time - timedelta(hours=1))
+
+    def test_habit_suggestion_threshold(self):
+        """Test that routines skipped three times produce a reschedule suggestion."""
+        user = self.users[0]
+        routine = Routine.objects.create(user=user, name='Journaling', frequency='daily')
+        for _ in range(3):
+            Task.objects.create(user=user, routine=routine, title='Journal', status=Task.Status.SKIPPED)
+
+        suggestions = list(SmartPromptEngine(user, self.engine).suggest_new_habits())
+        self.assertEqual(suggestions[0]['message'], 'You often miss Journaling. Try a different time?')
+
+
+class DeliveryScheduleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='sleeper',
+            email='sleeper@example.com',
+            password='testpass123',
+            fcm_token='device-token'
+        )
+        self.user.timezone = 'America/New_York'
+        self.user.preferences = {
+            'notifications': {'quiet_hours_start': '22:00', 'quiet_hours_end': '07:00'}
+        }
+        self.user.save()
+
+    def test_window_during_quiet_hours_opens_at_local_morning(self):
+        """Test that quiet hours spanning midnight defer the window to the local end time."""
+        now = datetime.datetime(2026, 1, 15, 4, 0, tzinfo=datetime.timezone.utc)  # 23:00 in New York
+        start, end = compute_delivery_window(
+            'America/New_York', datetime.time(22, 0), datetime.time(7, 0), now
+        )
+        self.assertEqual(start, datetime.datetime(2026, 1, 15, 12, 0, tzinfo=datetime.timezone.utc))
+        self.assertEqual(end, datetime.datetime(2026, 1, 16, 3, 0, tzinfo=datetime.timezone.utc))
+
+    def test_schedule_refreshed_when_preferences_change(self):
+        """Test that saving new quiet hours recomputes the stored window."""
+        schedule = DeliverySchedule.objects.get(user=self.user)
+        self.assertEqual(schedule.quiet_hours_start, datetime.time(22, 0))
+
+        self.user.preferences = {}
+        self.user.save()
+        schedule.refresh_from_db()
+        self.assertIsNone(schedule.window_end)
+        self.assertTrue(is_deliverable(self.user.id))
+
+    def test_eligible_users_range_query(self):
+        """Test that eligibility is answered from the schedule table alone."""
+        schedule = DeliverySchedule.objects.get(user=self.user)
+        inside = schedule.window_start + timedelta(minutes=1)
+        with self.assertNumQueries(1):
+            self.assertIn(self.user.id, list(eligible_user_ids(inside)))
+        self.assertNotIn(self.user.id, list(eligible_user_ids(schedule.window_end)))
+
+    def test_deferred_notifications_flushed_as_digest(self):
+        """Test that notifications held during quiet hours arrive as a single digest."""
+        DeliverySchedule.objects.filter(user=self.user).update(
+            window_start=timezone.now() + timedelta(hours=1), window_end=None
+        )
+        self.assertFalse(is_deliverable(self.user.id))
+        queue_notification(self.user.id, 'Task Reminder', 'Stretch')
+        queue_notification(self.user.id, 'Routine Reminder', 'Journal')
+
+        sent = []
+        send = lambda user, title, body, data, key: sent.append((user, title, body, data)) or True
+        self.assertEqual(flush_deferred_notifications(send), 0)
+
+        self.assertEqual(flush_deferred_notifications(send, now=timezone.now() + timedelta(hours=2)), 1)
+        user, title, body, data = sent[0]
+        self.assertEqual(user, self.user)
+        self.assertEqual(data['count'], '2')
+        self.assertIn('Stretch', body)
+        self.assertFalse(DeferredNotification.objects.exists())
+
+    def test_expired_windows_roll_forward(self):
+        """Test that closed windows and users without schedules are refreshed."""
+        DeliverySchedule.objects.filter(user=self.user).update(window_end=timezone.now() - timedelta(minutes=1))
+        other = User.objects.create_user(username='new', email='new@example.com', password='testpass123')
+        DeliverySchedule.objects.filter(user=other).delete()
+
+        self.assertEqual(refresh_expired_schedules(), 2)
+        self.assertGreater(DeliverySchedule.objects.get(user=self.user).window_end, timezone.now())
+
+
+class NotificationCoalescingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='busy',
+            email='busy@example.com',
+            password='testpass123',
+            fcm_token='device-token'
+        )
+        self.sent = []
+
+    def send(self, user, title, body, data, key):
+        self.sent.append({'title': title, 'body': body, 'data': data, 'collapse_key': key})
+        return True
+
+    def test_burst_merged_into_one_push(self):
+        """Test that notifications queued within the window become one push with a collapse key."""
+        now = timezone.now()
+        for i in range(3):
+            queue_notification(self.user.id, 'Task Reminder', f'Task {i}', {'type': 'reminder'})
+
+        stats = dispatch_notifications(self.send, now=now, coalesce_seconds=60)
+        self.assertEqual(stats['buffering'], 1)
+        self.assertEqual(self.sent, [])
+
+        stats = dispatch_notifications(self.send, now=now + timedelta(seconds=61), coalesce_seconds=60)
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.sent[0]['collapse_key'], 'chaos-reminder')
+        self.assertEqual(self.sent[0]['data']['count'], '3')
+        self.assertFalse(DeferredNotification.objects.exists())
+
+    def test_token_bucket_throttles_and_refills(self):
+        """Test that pushes beyond the burst wait for a refill and keep merging meanwhile."""
+        bucket = TokenBucket(burst=1, refill_seconds=600)
+        now = timezone.now()
+        queue_notification(self.user.id, 'Routine Reminder', 'Stretch', {'type': 'routine'})
+        dispatch_notifications(self.send, now=now, coalesce_seconds=0, bucket=bucket)
+
+        queue_notification(self.user.id, 'Smart Suggestion', 'Walk', {'type': 'smart_prompt'})
+        queue_notification(self.user.id, 'Task Reminder', 'Journal', {'type': 'reminder'})
+        stats = dispatch_notifications(self.send, now=now + timedelta(minutes=5), coalesce_seconds=0, bucket=bucket)
+        self.assertEqual(stats['throttled'], 1)
+        self.assertEqual(DeferredNotification.objects.count(), 2)
+
+        stats = dispatch_notifications(self.send, now=now + timedelta(minutes=11), coalesce_seconds=0, bucket=bucket)
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(self.sent[1]['collapse_key'], 'chaos-digest')
+
+    def test_failed_or_tokenless_sends_stay_queued(self):
+        """Test that nothing is dropped when a push fails or the user has no device token."""
+        now = timezone.now()
+        queue_notification(self.user.id, 'Task Reminder', 'Journal', {'type': 'reminder'})
+        stats = dispatch_notifications(lambda *args: False, now=now, coalesce_seconds=0)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(DeferredNotification.objects.count(), 1)
+
+        self.user.fcm_token = ''
+        self.user.save()
+        tokens = DeliverySchedule.objects.get(user=self.user).tokens
+        stats = dispatch_notifications(self.send, now=now, coalesce_seconds=0)
+        self.assertEqual(stats['no_token'], 1)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(DeferredNotification.objects.count(), 1)
+        self.assertEqual(DeliverySchedule.objects.get(user=self.user).tokens, tokens)
+
+        self.user.fcm_token = 'device-token'
+        self.user.save()
+        stats = dispatch_notifications(self.send, now=now, coalesce_seconds=0)
+        self.assertEqual(stats['sent'], 1)
+        self.assertFalse(DeferredNotification.objects.exists())
+
+
+    def test_overlapping_dispatchers_send_each_notification_once(self):
+        """Test that a run starting while another is mid-send skips the claimed rows."""
+        now = timezone.now()
+        queue_notification(self.user.id, 'Task Reminder', 'Journal', {'type': 'reminder'})
+        overlapping = []
+
+        def send(*args):
+            overlapping.append(dispatch_notifications(self.send, now=now, coalesce_seconds=0))
+            return self.send(*args)
+
+        stats = dispatch_notifications(send, now=now, coalesce_seconds=0)
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(overlapping[0]['queued'], 0)
+        self.assertEqual(len(self.sent), 1)
+        self.assertFalse(DeferredNotification.objects.exists())
+
+    def test_stale_claims_are_taken_over(self):
+        """Test that rows claimed by a run that died mid-send are retried after the claim timeout."""
+        now = timezone.now()
+        queue_notification(self.user.id, 'Task Reminder', 'Journal', {'type': 'reminder'})
+        DeferredNotification.objects.update(claimed_at=now)
+        self.assertEqual(dispatch_notifications(self.send, now=now, coalesce_seconds=0)['queued'], 0)
+
+        later = now + timedelta(seconds=settings.NOTIFICATION_CLAIM_SECONDS + 1)
+        self.assertEqual(dispatch_notifications(self.send, now=later, coalesce_seconds=0)['sent'], 1)
+
+
+class ProviderRegistryTests(SimpleTestCase):
+    def test_factory_runs_once_on_first_use(self):
+        """Test that providers are built lazily and cached."""
+        calls = []
+        registry = ProviderRegistry()
+        registry.register('client', lambda: calls.append(1) or object())
+        self.assertFalse(registry.is_loaded('client'))
+
+        first = registry.get('client')
+        self.assertIs(registry.get('client'), first)
+        self.assertEqual(len(calls), 1)
+
+    def test_warm_up_reports_failures(self):
+        """Test that warm-up initialises providers and collects errors instead of raising."""
+        registry = ProviderRegistry()
+        registry.register('ok', object)
+        registry.register('broken', lambda: 1 / 0)
+        errors = registry.warm_up()
+        self.assertTrue(registry.is_loaded('ok'))
+        self.assertIsInstance(errors['broken'], ZeroDivisionError)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """Import-time profile of a web/worker process, measured with `python -X importtime`."""
+
+    BUDGET_MS = 1500
+    LAZY_MODULES = ('openai', 'firebase_admin')
+
+    def test_django_startup_import_budget(self):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'chaos_api.settings', 'WARM_PROVIDERS': ''}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             'import django; django.setup(); import api.urls, api.tasks'],
+            cwd=Path(__file__).resolve().parent.parent, env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+        total_us, imported = 0, set()
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imported.add(name.strip().split('.')[0])
+            if not name.startswith('  '):  # Top-level imports only; nested ones are included in cumulative
+                total_us += int(cumulative)
+
+        for module in self.LAZY_MODULES:
+            self.assertNotIn(module, imported, f'{module} should be imported on first use, not at startup')
+        self.assertLess(total_us / 1000, self.BUDGET_MS)
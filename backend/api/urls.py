@@ -4,7 +4,8 @@ from .views import (
     TaskViewSet, RoutineViewSet, ReminderViewSet, MoodLogViewSet, 
     InsightViewSet, UserViewSet, AIGenerateScheduleView, 
     MusicProviderConnectView, MusicProviderCallbackView, SmartPromptView, set_music_mode,
-    MemoryViewSet
+    MemoryViewSet, MemoryChangeFeedView, MemoryProjectionView,
+    MemoryReinforcementView
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -30,4 +31,7 @@ urlpatterns = [
     path('music/callback/<str:provider>/', MusicProviderCallbackView.as_view(), name='music_callback'),
     path('ai/smart-prompts/', SmartPromptView.as_view(), name='smart_prompts'),
     path('music/<str:provider>/mode', set_music_mode, name='set_music_mode'),
+    path('memory-changes/', MemoryChangeFeedView.as_view(), name='memory_changes'),
+    path('memory-projections/', MemoryProjectionView.as_view(), name='memory_projections'),
+    path('memory-reinforcements/', MemoryReinforcementView.as_view(), name='memory_reinforcements'),
 ]
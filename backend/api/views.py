@@ -1,25 +1,29 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.db.models import Max, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 import httpx
-from .models import Task, Routine, Reminder, MoodLog, Insight, Memory
+from .models import Task, Routine, Reminder, MoodLog, Insight, Memory, MemoryChange
 from .serializers import (
     TaskSerializer, RoutineSerializer, ReminderSerializer, MoodLogSerializer,
     InsightSerializer, UserSerializer, MusicConnectSerializer, MemorySerializer
 )
-from .ai_smart_prompt import SmartPromptEngine
+from .ai_smart_prompt import get_cached_prompts
+from .dedup import RecentMemories, reinforce as reinforce_memory
+from .reinforcement import reinforce_batch
+from .providers import providers
 import os
-import openai
 import secrets
 from rest_framework.views import APIView
 from rest_framework import status
 
-openai.api_key = os.environ.get('OPENAI_API_KEY')
-
 
 User = get_user_model()
 
@@ -33,6 +37,21 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return hasattr(obj, 'user') and obj.user == request.user
 
 
+class IsService(permissions.BasePermission):
+    """Internal services present MEMORY_FEED_TOKEN as X-Service-Token."""
+
+    def has_permission(self, request, view):
+        token = settings.MEMORY_FEED_TOKEN
+        return bool(token) and secrets.compare_digest(request.headers.get('X-Service-Token', ''), token)
+
+
+class IsServiceOrStaff(IsService):
+    """Internal services present MEMORY_FEED_TOKEN as X-Service-Token; staff users may also read."""
+
+    def has_permission(self, request, view):
+        return super().has_permission(request, view) or bool(request.user and request.user.is_staff)
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all().order_by('-created_at')
     serializer_class = TaskSerializer
@@ -103,7 +122,7 @@ class AIGenerateScheduleView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        if not openai.api_key:
+        if not settings.OPENAI_API_KEY:
             return Response({'detail': 'OpenAI API key not configured.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
@@ -248,7 +267,7 @@ class MusicProviderCallbackView(APIView):
         prompt = f"Generate an optimized daily schedule given these tasks: {tasks} and wake_time: {wake_time}. Return JSON list of tasks with start_time and duration."
 
         try:
-            resp = openai.ChatCompletion.create(
+            resp = providers.get('openai').ChatCompletion.create(
                 model=os.environ.get('OPENAI_MODEL', 'gpt-4o-mini'),
                 messages=[{'role': 'user', 'content': prompt}],
                 temperature=0.7,
@@ -265,12 +284,12 @@ class AIChatView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        if not openai.api_key:
+        if not settings.OPENAI_API_KEY:
             return Response({'detail': 'OpenAI API key not configured.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         message = request.data.get('message', '')
         try:
-            resp = openai.ChatCompletion.create(
+            resp = providers.get('openai').ChatCompletion.create(
                 model=os.environ.get('OPENAI_MODEL', 'gpt-4o-mini'),
                 messages=[{'role': 'user', 'content': message}],
                 temperature=0.9,
@@ -326,13 +345,92 @@ class MusicCallbackView(APIView):
         return Response({'detail': 'connected'})
 
 
+class MemoryChangeFeedView(APIView):
+    """Memory change journal for index maintainers: changes with seq > `after`, oldest first.
+
+    Without `after`, only the latest sequence number is returned, so a new consumer can
+    start tailing from now.
+    """
+    permission_classes = [IsServiceOrStaff]
+
+    def get(self, request):
+        try:
+            after = request.query_params.get('after')
+            limit = min(int(request.query_params.get('limit', 500)), 5000)
+            after = int(after) if after is not None else None
+        except ValueError:
+            return Response({'error': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        latest = MemoryChange.objects.aggregate(latest=Max('seq'))['latest'] or 0
+        changes = []
+        if after is not None:
+            changes = list(
+                MemoryChange.objects.filter(seq__gt=after)
+                .values('seq', 'user_id', 'memory_id', 'op', 'created_at')[:limit]
+            )
+        return Response({'latest_seq': latest, 'changes': changes})
+
+
+class MemoryProjectionView(APIView):
+    """Rows for the realtime service's embedding re-projection job.
+
+    GET pages memories with embeddings by id; with `stale_for`, only those not yet
+    projected to that version. POST stores a batch of reduced embeddings under `version`.
+    bulk_update sends no signals, so this does not touch the change journal.
+    """
+    permission_classes = [IsServiceOrStaff]
+
+    def get(self, request):
+        try:
+            after_id = int(request.query_params.get('after_id', 0))
+            limit = min(int(request.query_params.get('limit', 500)), 5000)
+        except ValueError:
+            return Response({'error': 'after_id and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Memory.objects.filter(id__gt=after_id, vector_embedding__isnull=False)
+        stale_for = request.query_params.get('stale_for')
+        if stale_for is not None:
+            queryset = queryset.exclude(projection_version=stale_for)
+        rows = list(queryset.order_by('id').values('id', 'vector_embedding')[:limit])
+        return Response({'rows': rows})
+
+    def post(self, request):
+        version = request.data.get('version')
+        rows = request.data.get('rows')
+        if not version or not isinstance(rows, list):
+            return Response({'error': 'version and rows are required'}, status=status.HTTP_400_BAD_REQUEST)
+        reduced = {row['id']: row['reduced_embedding'] for row in rows}
+        memories = list(Memory.objects.filter(id__in=reduced))
+        for memory in memories:
+            memory.reduced_embedding = reduced[memory.id]
+            memory.projection_version = version
+        Memory.objects.bulk_update(memories, ['reduced_embedding', 'projection_version'], batch_size=500)
+        return Response({'updated': len(memories)})
+
+
+class MemoryReinforcementView(APIView):
+    """Batched retrieval reinforcement from the realtime service's write-behind buffer.
+
+    POST {"half_life_days": optional, "rows": [{"id", "count", "delta"}, ...]} updates all
+    rows in one bulk UPDATE and returns their new relevance scores.
+    """
+    permission_classes = [IsServiceOrStaff]
+
+    def post(self, request):
+        rows = request.data.get('rows')
+        if not isinstance(rows, list) or any(not {'id', 'count', 'delta'} <= set(row) for row in rows):
+            return Response({'error': 'rows of {id, count, delta} are required'}, status=status.HTTP_400_BAD_REQUEST)
+        memories = reinforce_batch(rows, request.data.get('half_life_days'))
+        return Response({'updated': [
+            {'id': m.id, 'user_id': m.user_id, 'relevance_score': m.relevance_score} for m in memories
+        ]})
+
+
 class SmartPromptView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        engine = SmartPromptEngine(request.user)
-        prompts = engine.get_prompts()
-        return Response(prompts)
+        return Response(get_cached_prompts(request.user))
 
     def post(self, request):
         message = request.data.get('message')
@@ -370,6 +468,13 @@ class MemoryViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(timestamp__lte=end_date)
 
+        # Malformed numbers or cursors are client errors, not 500s
+        try:
+            return self._filter_memories(queryset)
+        except (TypeError, ValueError):
+            raise ValidationError({'error': 'min_relevance, ids, before, before_id and limit must be well-formed'})
+
+    def _filter_memories(self, queryset):
         # Filter by minimum relevance score
         min_relevance = self.request.query_params.get('min_relevance')
         if min_relevance:
@@ -380,7 +485,33 @@ class MemoryViewSet(viewsets.ModelViewSet):
         if role:
             queryset = queryset.filter(role=role)
 
-        return queryset.order_by('-timestamp')
+        # Fetch specific memories (realtime re-ranking of search candidates)
+        ids = self.request.query_params.get('ids')
+        if ids:
+            queryset = queryset.filter(id__in=[int(i) for i in ids.split(',') if i])
+
+        queryset = queryset.order_by('-timestamp', '-id')
+
+        # Keyset pages for the realtime search walk: rows strictly older than (before, before_id)
+        if self.action == 'list':
+            before = self.request.query_params.get('before')
+            if before:
+                before = parse_datetime(before)
+                if before is None:
+                    raise ValueError('before is not a datetime')
+                older = Q(timestamp__lt=before)
+                before_id = self.request.query_params.get('before_id')
+                if before_id:
+                    older |= Q(timestamp=before, id__lt=int(before_id))
+                queryset = queryset.filter(older)
+            limit = self.request.query_params.get('limit')
+            if limit:
+                limit = int(limit)
+                if limit < 0:
+                    raise ValueError('limit must not be negative')
+                queryset = queryset[:limit]
+
+        return queryset
 
     def perform_create(self, serializer):
         """Save the memory with the current user."""
@@ -405,7 +536,7 @@ class MemoryViewSet(viewsets.ModelViewSet):
                     'query': query,
                     'limit': request.data.get('limit', 5)
                 },
-                headers={'Content-Type': 'application/json'},
+                headers={'Content-Type': 'application/json', 'X-Service-Token': settings.MEMORY_FEED_TOKEN},
                 timeout=10
             )
             memories = response.json()
@@ -437,9 +568,51 @@ class MemoryViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(data=memories, many=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # Near-duplicates of recent memories (or of earlier items in this batch) reinforce the
+        # existing row instead of inserting; the response still has one memory per input.
+        # vector_embedding is read-only here, so this path matches on SimHash alone.
+        recent = RecentMemories(request.user)
+        saved = []
+        for item in serializer.validated_data:
+            duplicate = recent.find(item['message'], item['role'])
+            if duplicate is not None:
+                saved.append(reinforce_memory(duplicate))
+            else:
+                memory = Memory.objects.create(**item)
+                recent.add(memory)
+                saved.append(memory)
+
+        response = Response(self.get_serializer(saved, many=True).data, status=status.HTTP_201_CREATED)
+        response['X-Deduplicated'] = str(recent.merged)
+        response['X-Deduplicated-Percent'] = str(recent.percent)
+        return response
+
+    @action(detail=True, methods=['post'],
+            permission_classes=[IsService | (permissions.IsAuthenticated & IsOwnerOrReadOnly)])
+    def reinforce(self, request, pk=None):
+        """Merge a duplicate into this memory: bump relevance and refresh its timestamp.
+
+        The realtime service calls this with X-Service-Token on behalf of the `user` in the body.
+        """
+        if request.user.is_authenticated:
+            memory = self.get_object()
+        else:
+            try:
+                user_id = int(request.data.get('user'))
+            except (TypeError, ValueError):
+                return Response({'error': 'user is required'}, status=status.HTTP_400_BAD_REQUEST)
+            memory = get_object_or_404(Memory, pk=pk, user_id=user_id)
+        bump = request.data.get('bump')
+        if bump is not None:
+            try:
+                bump = float(bump)
+            except (TypeError, ValueError):
+                bump = None
+            if bump is None or not 0.0 < bump <= 1.0:
+                return Response({'error': 'bump must be a number in (0, 1]'}, status=status.HTTP_400_BAD_REQUEST)
+        memory = reinforce_memory(memory, bump)
+        return Response(self.get_serializer(memory).data)
 
     @action(detail=False, methods=['patch'])
     def bulk_update(self, request):
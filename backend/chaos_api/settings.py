@@ -183,6 +183,45 @@ CORS_ALLOW_CREDENTIALS = True
 # OpenAI settings
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 
+# Firebase Admin service account (JSON key file path)
+FIREBASE_ADMIN_CREDENTIALS = os.environ.get('FIREBASE_ADMIN_CREDENTIALS', '')
+
+# Realtime (FastAPI) service, used for semantic memory search
+REALTIME_SERVICE_URL = os.environ.get('REALTIME_SERVICE_URL', 'http://localhost:9000')
+
+# Memory ingest dedup: compare against the user's last WINDOW memories (0 disables)
+MEMORY_DEDUP_WINDOW = int(os.environ.get('MEMORY_DEDUP_WINDOW', '50'))
+MEMORY_DEDUP_MAX_DISTANCE = int(os.environ.get('MEMORY_DEDUP_MAX_DISTANCE', '3'))
+MEMORY_DEDUP_MIN_COSINE = float(os.environ.get('MEMORY_DEDUP_MIN_COSINE', '0.95'))
+MEMORY_DEDUP_RELEVANCE_BUMP = float(os.environ.get('MEMORY_DEDUP_RELEVANCE_BUMP', '0.1'))
+
+# Shared secret for internal consumers of the memory change feed (/api/v1/memory-changes/)
+MEMORY_FEED_TOKEN = os.environ.get('MEMORY_FEED_TOKEN', '')
+MEMORY_CHANGE_RETENTION_DAYS = int(os.environ.get('MEMORY_CHANGE_RETENTION_DAYS', '7'))
+
+# Half-life of the relevance boost memories earn by being retrieved (see api.reinforcement)
+MEMORY_REINFORCE_HALF_LIFE_DAYS = float(os.environ.get('MEMORY_REINFORCE_HALF_LIFE_DAYS', '14'))
+
+# Third-party clients to initialise at startup instead of on first use (comma-separated, e.g. "openai,firebase_messaging")
+WARM_PROVIDERS = [name for name in os.environ.get('WARM_PROVIDERS', '').split(',') if name]
+
+# Smart prompt cache entries are invalidated by change events, so every worker must share the
+# cache; the per-process default is only correct for a single process
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
+# Notification shaping: buffer per user, then merge; at most BURST pushes, refilling one per REFILL_SECONDS
+NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', '60'))
+NOTIFICATION_RATE_BURST = int(os.environ.get('NOTIFICATION_RATE_BURST', '3'))
+NOTIFICATION_RATE_REFILL_SECONDS = int(os.environ.get('NOTIFICATION_RATE_REFILL_SECONDS', '600'))
+# A dispatcher claim older than this (a run that died mid-send) may be taken over
+NOTIFICATION_CLAIM_SECONDS = int(os.environ.get('NOTIFICATION_CLAIM_SECONDS', '300'))
+
 # API Documentation
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Chaos Contained API',
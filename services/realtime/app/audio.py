@@ -0,0 +1,108 @@
+"""Audio buffers shared by the streaming voice pipeline."""
+from typing import List, Union
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SAMPLE_DTYPE = np.dtype("<i2")  # PCM16 little-endian mono
+
+PCMData = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+def pcm_to_float(samples: np.ndarray) -> np.ndarray:
+    """Convert PCM16 samples to float32 in [-1, 1], as expected by speech models."""
+    return samples.astype(np.float32) / 32768.0
+
+
+class AudioRingBuffer:
+    """Preallocated PCM16 ring buffer addressed by absolute sample index.
+
+    Writes never allocate; reads of a range that does not wrap return views into the
+    buffer. Samples older than `capacity` are overwritten.
+    """
+
+    def __init__(self, capacity_samples: int, sample_rate: int = SAMPLE_RATE):
+        if capacity_samples < 1:
+            raise ValueError("capacity_samples must be positive")
+        self.sample_rate = sample_rate
+        self.capacity = capacity_samples
+        self.total_written = 0
+        self._origin = 0  # First valid index after a restore
+        self._data = np.zeros(capacity_samples, dtype=SAMPLE_DTYPE)
+        self._carry = b""  # Odd trailing byte from a write that split a sample
+
+    @classmethod
+    def for_seconds(cls, seconds: float, sample_rate: int = SAMPLE_RATE) -> "AudioRingBuffer":
+        return cls(int(seconds * sample_rate), sample_rate)
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    @property
+    def start(self) -> int:
+        """Absolute index of the oldest sample still held."""
+        return max(self._origin, self.total_written - self.capacity)
+
+    def __len__(self) -> int:
+        return self.total_written - self.start
+
+    def write(self, pcm: PCMData) -> int:
+        """Append PCM16 audio; returns the number of samples written."""
+        if isinstance(pcm, np.ndarray):
+            samples = pcm.astype(SAMPLE_DTYPE, copy=False).ravel()
+        else:
+            if self._carry:
+                pcm = self._carry + bytes(pcm)
+                self._carry = b""
+            if len(pcm) % 2:
+                self._carry = bytes(pcm[-1:])
+                pcm = pcm[:-1]
+            samples = np.frombuffer(pcm, dtype=SAMPLE_DTYPE)
+
+        n = len(samples)
+        if n >= self.capacity:
+            tail = samples[-self.capacity:]
+            self.total_written += n - self.capacity
+            n_tail = self.capacity
+        else:
+            tail = samples
+            n_tail = n
+        pos = self.total_written % self.capacity
+        first = min(n_tail, self.capacity - pos)
+        self._data[pos:pos + first] = tail[:first]
+        if first < n_tail:
+            self._data[:n_tail - first] = tail[first:]
+        self.total_written += n_tail
+        return n
+
+    def views(self, start: int, end: int) -> List[np.ndarray]:
+        """Zero-copy views covering absolute samples [start, end); two views if the range wraps."""
+        start = max(start, self.start)
+        end = min(end, self.total_written)
+        if end <= start:
+            return []
+        a, b = start % self.capacity, end % self.capacity
+        if a < b or b == 0:
+            return [self._data[a:b or self.capacity]]
+        return [self._data[a:], self._data[:b]]
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Samples [start, end) as one array; a view unless the range wraps."""
+        parts = self.views(start, end)
+        if not parts:
+            return self._data[:0]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def restore(self, start_index: int, pcm: PCMData) -> None:
+        """Reset the buffer to hold `pcm` at absolute samples starting from `start_index`."""
+        self.clear()
+        self.total_written = self._origin = start_index
+        self.write(pcm)
+
+    def clear(self) -> None:
+        self.total_written = 0
+        self._origin = 0
+        self._carry = b""
@@ -0,0 +1,117 @@
+"""Dynamic micro-batching for model calls.
+
+Transformer pipelines cost roughly a fixed overhead per forward pass plus a small amount
+per item, so running concurrent requests one at a time wastes most of each pass.
+`MicroBatcher` holds each request for at most `max_wait_ms`, or until `max_batch_size`
+requests are waiting. It then makes a single batched call and resolves each caller's
+future with its own result. While the model is busy, requests keep accumulating, so batch
+sizes grow with load and fall back to single items when traffic is light.
+"""
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BatchFn = Callable[[List[T]], Awaitable[List[R]]]
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent `submit` calls into batched calls of `fn`.
+
+    At most `max_concurrency` batches run at once. While they are all busy, new requests
+    queue up and go out together as soon as a slot frees. `fn` takes a list of items and
+    must return one result per item, in order. If it raises, every caller in that batch
+    receives the exception.
+    """
+
+    def __init__(
+        self,
+        fn: BatchFn,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_concurrency: int = 1
+    ):
+        if max_batch_size < 1 or max_concurrency < 1:
+            raise ValueError("max_batch_size and max_concurrency must be positive")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrency = max_concurrency
+        self.batch_sizes: Counter = Counter()
+        self.busy_seconds = 0.0
+        self._queue: Deque[Tuple[T, asyncio.Future]] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._active = 0
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future))
+        if self._active < self.max_concurrency:
+            if len(self._queue) >= self.max_batch_size or self.max_batch_size == 1 or self.max_wait <= 0:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._on_timer)
+        return await future
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        if self._active < self.max_concurrency:
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        n = min(len(self._queue), self.max_batch_size)
+        if not n:
+            return
+        batch = [self._queue.popleft() for _ in range(n)]
+        self._active += 1
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        self.batch_sizes[len(batch)] += 1
+        started = time.perf_counter()
+        try:
+            results = await self.fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():  # The caller may have been cancelled while waiting
+                    future.set_result(result)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self._active -= 1
+            # Requests that queued while every slot was busy have already waited long enough
+            if self._queue and self._timer is None:
+                self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "batches": batches,
+            "items": items,
+            "queued": len(self._queue),
+            "mean_batch_size": round(items / batches, 2) if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "busy_ms": round(self.busy_seconds * 1000, 2),
+        }
@@ -0,0 +1,132 @@
+"""Chat turns behind /ai/respond/: a token-budgeted prompt, the LLM call, and memory upkeep.
+
+The prompt carries the user's latest rolling summary, the turns since that summary (at most
+`context_window`), and top-k retrieved memories, packed into CHAT_PROMPT_BUDGET tokens.
+After the reply, both sides of the turn are stored and summary compaction is scheduled.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from .memory_search import parse_timestamp
+from .prompting import PackedPrompt, PromptPacker
+from .services import ai_service, memory_service
+from .summaries import RollingSummarizer
+
+SYSTEM_PROMPT = os.getenv(
+    "CHAT_SYSTEM_PROMPT",
+    "You are a helpful assistant for a person managing tasks, mood and daily life. Be brief and concrete."
+)
+CONTEXT_WINDOW = int(os.getenv("CHAT_CONTEXT_WINDOW", "10"))  # matches the backend's preference default
+MAX_CONTEXT_WINDOW = 50
+MEMORY_K = int(os.getenv("CHAT_MEMORY_K", "5"))
+# USD per 1k tokens; defaults are gpt-3.5-turbo list prices
+PROMPT_COST_PER_1K = float(os.getenv("CHAT_PROMPT_COST_PER_1K", "0.0005"))
+COMPLETION_COST_PER_1K = float(os.getenv("CHAT_COMPLETION_COST_PER_1K", "0.0015"))
+
+packer = PromptPacker.from_env()
+summarizer = RollingSummarizer.from_env(memory_service, ai_service.summarize)
+
+
+class ChatStats:
+    def __init__(self):
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.candidate_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+        self.cost_usd = 0.0
+
+    def record(self, prompt: PackedPrompt, usage: Dict[str, Any], latency_ms: float, cost: float) -> None:
+        self.turns += 1
+        self.prompt_tokens += usage.get("prompt_tokens", prompt.tokens)
+        self.candidate_tokens += prompt.candidate_tokens
+        self.completion_tokens += usage.get("completion_tokens", 0)
+        self.latency_ms += latency_ms
+        self.cost_usd += cost
+
+    def as_dict(self) -> Dict[str, Any]:
+        turns = max(self.turns, 1)
+        return {
+            "turns": self.turns,
+            "mean_prompt_tokens": round(self.prompt_tokens / turns, 1),
+            "mean_candidate_tokens": round(self.candidate_tokens / turns, 1),
+            "mean_completion_tokens": round(self.completion_tokens / turns, 1),
+            "mean_latency_ms": round(self.latency_ms / turns, 1),
+            "cost_usd": round(self.cost_usd, 6),
+            "summaries": summarizer.stats(),
+        }
+
+
+chat_stats = ChatStats()
+
+
+def context_window_from(context: Optional[Dict[str, Any]]) -> int:
+    window = (context or {}).get("context_window", CONTEXT_WINDOW)
+    try:
+        return max(0, min(int(window), MAX_CONTEXT_WINDOW))
+    except (TypeError, ValueError):
+        return CONTEXT_WINDOW
+
+
+async def recent_turns(user_id: int, summary: Optional[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Up to `limit` turns newer than the summary's watermark, oldest first."""
+    if limit == 0:
+        return []
+    through = (summary or {}).get("context", {}).get("through")
+    mark = (parse_timestamp(through["timestamp"]), through["id"]) if through else None
+    # Over-fetch a little: summaries and other system rows share the timeline
+    rows = await memory_service.store.fetch_block(user_id, None, limit + 5)
+    turns = [row for row in rows if row.get("role") != "system"
+             and (mark is None or (parse_timestamp(row["timestamp"]), row["id"]) > mark)]
+    return turns[:limit][::-1]
+
+
+async def build_prompt(user_id: Optional[int], text: str, context_window: int = CONTEXT_WINDOW) -> PackedPrompt:
+    if user_id is None:
+        return packer.pack(SYSTEM_PROMPT, text)
+    summary = await memory_service.store.latest_summary(user_id)
+    turns, memories = await asyncio.gather(
+        recent_turns(user_id, summary, context_window),
+        memory_service.query_relevant_memories(user_id, text, limit=MEMORY_K, mode="auto"),
+    )
+    seen = {row["id"] for row in turns}
+    retrieved = [m["message"] for m in memories if m["id"] not in seen and m.get("role") != "system"]
+    return packer.pack(
+        SYSTEM_PROMPT,
+        text,
+        summary=summary["message"] if summary else None,
+        memories=retrieved,
+        recent=[(row.get("role", "user"), row["message"]) for row in turns],
+    )
+
+
+def cost_usd(usage: Dict[str, Any]) -> float:
+    return (usage.get("prompt_tokens", 0) * PROMPT_COST_PER_1K
+            + usage.get("completion_tokens", 0) * COMPLETION_COST_PER_1K) / 1000
+
+
+async def respond(user_id: Optional[int], text: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    prompt = await build_prompt(user_id, text, context_window_from(context))
+    reply = await ai_service.respond(prompt.messages)
+    usage = reply["usage"]
+    cost = cost_usd(usage)
+    chat_stats.record(prompt, usage, reply["latency_ms"], cost)
+    return {
+        "response": reply["text"],
+        "actions": [],
+        "usage": {
+            "prompt_tokens": usage.get("prompt_tokens", prompt.tokens),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "cost_usd": round(cost, 6),
+            "latency_ms": reply["latency_ms"],
+        },
+        "prompt": prompt.report(),
+    }
+
+
+async def remember_turn(user_id: int, text: str, reply: str, context: Optional[Dict[str, Any]] = None) -> None:
+    """Store both sides of a turn, then let the summarizer catch up in the background."""
+    await memory_service.store_memory(user_id, text, "user", context or {})
+    await memory_service.store_memory(user_id, reply, "assistant", {})
+    summarizer.schedule(user_id)
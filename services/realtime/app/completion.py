@@ -0,0 +1,102 @@
+"""Voice completion: the stage graph behind /voice/complete/ and the WebSocket end of stream."""
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from .features import feature_extractor
+from .intents import FALLBACK_INTENT, IntentResult, IntentRouter, actions_for
+from .pipeline import PipelineRun, ResultCallback, Stage, StageGraph
+from .services import ai_service, emotion_service, memory_service
+from .stt import stt_engine
+
+
+def _timeout(stage: str, default: float) -> float:
+    return float(os.getenv(f"COMPLETION_TIMEOUT_{stage.upper()}", default))
+
+
+NEUTRAL_EMOTION = {"mood": "neutral", "confidence": 0.0, "indicators": {}}
+UNKNOWN_INTENT = IntentResult(FALLBACK_INTENT, 0.0, "fallback").as_dict()
+
+intent_router = IntentRouter(llm=ai_service.classify_intent)
+
+
+async def finalize_transcript(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return await stt_engine.finish(ctx["session_id"], ctx["user_id"])
+
+
+async def audio_features(ctx: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    return await asyncio.to_thread(feature_extractor.from_buffer, ctx["transcriber"].buffer)
+
+
+async def detect_emotion(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    text = ctx["transcript"]["transcript"]
+    features = ctx["features"]
+    if not text:
+        return {**NEUTRAL_EMOTION, "indicators": features or {}}
+    return await emotion_service.analyze_emotion(text, features)
+
+
+async def classify_intent(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    text = ctx["transcript"]["transcript"]
+    if not text:
+        return UNKNOWN_INTENT
+    return (await intent_router.classify(text)).as_dict()
+
+
+async def lookup_memories(ctx: Dict[str, Any]) -> list:
+    text = ctx["transcript"]["transcript"]
+    if not text or ctx.get("user_id") is None:
+        return []
+    return await memory_service.query_relevant_memories(ctx["user_id"], text, limit=3)
+
+
+async def suggest_actions(ctx: Dict[str, Any]) -> list:
+    intent = ctx["intent"]
+    return actions_for(intent["intent"], intent["slots"])
+
+
+completion_graph = StageGraph([
+    Stage("transcript", finalize_transcript, timeout=_timeout("transcript", 10.0), required=True),
+    Stage("features", audio_features, timeout=_timeout("features", 1.0)),
+    Stage("emotion", detect_emotion, deps=("transcript", "features"),
+          timeout=_timeout("emotion", 2.0), default=NEUTRAL_EMOTION),
+    Stage("intent", classify_intent, deps=("transcript",), timeout=_timeout("intent", 1.5), default=UNKNOWN_INTENT),
+    Stage("memories", lookup_memories, deps=("transcript",), timeout=_timeout("memories", 1.5), default=[]),
+    Stage("actions", suggest_actions, deps=("intent",), timeout=_timeout("actions", 1.0), default=[]),
+])
+
+
+def user_id_from(user_data: Optional[Dict[str, Any]]) -> Optional[int]:
+    if not isinstance(user_data, dict):
+        return None
+    return user_data.get("user_id", user_data.get("id"))
+
+
+async def run_completion(
+    session_id: str,
+    user_id: Optional[int] = None,
+    on_result: Optional[ResultCallback] = None
+) -> PipelineRun:
+    """Finalize a voice session, running independent analysis stages concurrently."""
+    # Hold the session's transcriber before finalization releases it from the manager
+    transcriber = stt_engine.session(session_id, user_id)
+    return await completion_graph.run(
+        {"session_id": session_id, "user_id": user_id, "transcriber": transcriber},
+        on_result=on_result,
+    )
+
+
+def completion_response(run: PipelineRun) -> Dict[str, Any]:
+    transcript = run.value("transcript")
+    return {
+        "transcript": transcript["transcript"],
+        "segments": transcript["segments"],
+        "emotion": run.value("emotion"),
+        "intent": run.value("intent")["intent"],
+        "intent_detail": run.value("intent"),
+        "memories": run.value("memories"),
+        "suggested_actions": run.value("actions"),
+        "timings": run.timings(),
+        "critical_path": completion_graph.critical_path(run),
+        "total_ms": round(run.total_ms, 2),
+    }
@@ -0,0 +1,91 @@
+"""Ingest-time deduplication for memories written by the realtime service.
+
+Same rule as the Django bulk endpoint (backend/api/dedup.py), so both ingest paths agree.
+A new memory duplicates one of the user's last `window` memories with the same role when
+their 64-bit SimHash fingerprints are within `max_distance` bits and, when both have
+embeddings, their cosine similarity is at least `min_cosine`. Duplicates reinforce the
+existing row (relevance +bump, capped at 1.0, timestamp -> now) instead of inserting.
+Text with no words (emoji, punctuation) has no fingerprint and is never deduplicated.
+"""
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SIMHASH_BITS = 64
+_WORD = re.compile(r"\w+(?:'\w+)*")
+
+
+def _features(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word unigrams and bigrams (Unicode words); None for text without words."""
+    features = _features(text)
+    if not features:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little") for f in features],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)
+    weights = (2 * bits.astype(np.int64) - 1).sum(axis=0)
+    return sum(1 << bit for bit in np.flatnonzero(weights > 0).tolist())
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class Deduplicator:
+    def __init__(self, window: int = 50, max_distance: int = 3, min_cosine: float = 0.95,
+                 relevance_bump: float = 0.1):
+        self.window = window
+        self.max_distance = max_distance
+        self.min_cosine = min_cosine
+        self.relevance_bump = relevance_bump
+        self.checked = 0
+        self.merged = 0
+
+    @classmethod
+    def from_env(cls) -> "Deduplicator":
+        return cls(
+            window=int(os.getenv("MEMORY_DEDUP_WINDOW", "50")),
+            max_distance=int(os.getenv("MEMORY_DEDUP_MAX_DISTANCE", "3")),
+            min_cosine=float(os.getenv("MEMORY_DEDUP_MIN_COSINE", "0.95")),
+            relevance_bump=float(os.getenv("MEMORY_DEDUP_RELEVANCE_BUMP", "0.1")),
+        )
+
+    def matches(self, fingerprint: int, embedding: Optional[np.ndarray], candidate: Dict[str, Any]) -> bool:
+        other_fingerprint = simhash(candidate.get("message") or "")
+        if other_fingerprint is None or hamming(fingerprint, other_fingerprint) > self.max_distance:
+            return False
+        other = candidate.get("vector_embedding")
+        if embedding is None or other is None or not len(other):
+            return True
+        other = np.asarray(other, dtype=np.float64)
+        norm = np.linalg.norm(embedding) * np.linalg.norm(other)
+        return bool(norm) and float(embedding @ other / norm) >= self.min_cosine
+
+    async def find(self, store, user_id: int, message: str, role: str,
+                   embedding: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        """The most recent near-duplicate among the user's last `window` memories, if any."""
+        if self.window <= 0:
+            return None
+        self.checked += 1
+        fingerprint = simhash(message)
+        if fingerprint is None:
+            return None
+        for candidate in await store.fetch_block(user_id, None, self.window):
+            if candidate.get("role") == role and self.matches(fingerprint, embedding, candidate):
+                self.merged += 1
+                return candidate
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        percent = round(100.0 * self.merged / self.checked, 1) if self.checked else 0.0
+        return {"checked": self.checked, "merged": self.merged, "percent": percent}
@@ -0,0 +1,170 @@
+"""Vectorized prosodic features for emotion fusion.
+
+`FeatureExtractor` summarises a stretch of PCM16 audio. It produces RMS energy,
+zero-crossing rate, autocorrelation pitch and a speaking-rate estimate, plus normalised
+`pitch`, `tempo`, `arousal` and `confidence` values that EmotionService fuses with text
+sentiment.
+
+The extractor reads the session's AudioRingBuffer views directly; the audio is never
+copied into one contiguous array. Per-frame energy and zero-crossing counts come from
+prefix sums over each view, which costs O(samples) rather than O(frames x frame length).
+Pitch is computed only on voiced frames, as strided windows fed to one batched FFT
+autocorrelation. Frames that straddle the ring's wrap point get no pitch estimate, which
+loses at most one frame per call.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .audio import SAMPLE_RATE, AudioRingBuffer
+
+PCM_SCALE = 32768.0
+
+
+@dataclass
+class FeatureExtractor:
+    sample_rate: int = SAMPLE_RATE
+    hop_ms: int = 10
+    frame_ms: int = 25
+    pitch_frame_ms: int = 40
+    min_pitch_hz: float = 60.0
+    max_pitch_hz: float = 400.0
+    voicing_threshold: float = 0.3  # Normalised autocorrelation peak for a voiced frame
+    silence_rms: float = 300.0  # PCM16 units; frames below this are treated as silence
+
+    def __post_init__(self):
+        self.hop = self.sample_rate * self.hop_ms // 1000
+        self.frame_len = self.sample_rate * self.frame_ms // 1000
+        self.pitch_len = self.sample_rate * self.pitch_frame_ms // 1000
+        self.min_lag = int(self.sample_rate / self.max_pitch_hz)
+        self.max_lag = min(int(self.sample_rate / self.min_pitch_hz), self.pitch_len - 1)
+        self.n_fft = 1 << int(np.ceil(np.log2(2 * self.pitch_len)))
+
+    def from_buffer(self, buffer: AudioRingBuffer, start: Optional[int] = None,
+                    end: Optional[int] = None) -> Optional[Dict[str, float]]:
+        """Features over absolute samples [start, end) of a ring buffer (defaults to everything held)."""
+        start = buffer.start if start is None else start
+        end = buffer.total_written if end is None else end
+        return self.extract(buffer.views(start, end))
+
+    def extract(self, views: Sequence[np.ndarray]) -> Optional[Dict[str, float]]:
+        """Features for consecutive PCM16 views, or None if there is less than one frame of audio."""
+        views = [v for v in views if len(v)]
+        n = sum(len(v) for v in views)
+        if n < self.frame_len:
+            return None
+
+        starts = np.arange(0, n - self.frame_len + 1, self.hop)
+        rms = self._frame_rms(views, starts)
+        zcr = self._frame_zcr(views, starts)
+        voiced = rms > self.silence_rms
+        n_voiced = int(voiced.sum())
+        duration = n / self.sample_rate
+        if not n_voiced:
+            return {"duration_s": round(duration, 3), "voiced_ratio": 0.0, "energy": 0.0, "zcr": 0.0,
+                    "pitch_hz": 0.0, "pitch_variability": 0.0, "speaking_rate": 0.0,
+                    "pitch": 0.0, "tempo": 0.0, "arousal": 0.0, "confidence": 0.0}
+
+        pitch_hz, strength = self._pitch(views, starts[voiced])
+        has_pitch = pitch_hz > 0
+        pitches = pitch_hz[has_pitch]
+        median_pitch = float(np.median(pitches)) if len(pitches) else 0.0
+        variability = float(np.std(pitches) / np.mean(pitches)) if len(pitches) > 1 else 0.0
+
+        voiced_seconds = n_voiced * self.hop / self.sample_rate
+        rate = self._syllable_count(rms, voiced) / voiced_seconds if voiced_seconds else 0.0
+        energy = float(np.mean(rms[voiced])) / PCM_SCALE
+
+        pitch_norm = float(np.clip((median_pitch - self.min_pitch_hz) / (self.max_pitch_hz - self.min_pitch_hz), 0, 1)) \
+            if median_pitch else 0.0
+        tempo = float(np.clip(rate / 8.0, 0, 1))
+        loudness = float(np.clip(energy * 5, 0, 1))
+        arousal = 0.4 * loudness + 0.3 * tempo + 0.3 * float(np.clip(variability * 4, 0, 1))
+        confidence = (n_voiced / len(starts)) * (float(np.mean(strength[has_pitch])) if has_pitch.any() else 0.5)
+
+        return {
+            "duration_s": round(duration, 3),
+            "voiced_ratio": round(n_voiced / len(starts), 4),
+            "energy": round(energy, 4),
+            "zcr": round(float(np.mean(zcr[voiced])), 4),
+            "pitch_hz": round(median_pitch, 1),
+            "pitch_variability": round(variability, 4),
+            "speaking_rate": round(rate, 2),
+            "pitch": round(pitch_norm, 4),
+            "tempo": round(tempo, 4),
+            "arousal": round(arousal, 4),
+            "confidence": round(float(np.clip(confidence, 0, 1)), 4),
+        }
+
+    def _prefix(self, views: Sequence[np.ndarray], per_sample) -> np.ndarray:
+        """Prefix sums of `per_sample(view)` across views, with a leading zero."""
+        parts = [np.cumsum(per_sample(v), dtype=np.float64) for v in views]
+        for i in range(1, len(parts)):
+            parts[i] += parts[i - 1][-1]
+        return np.concatenate([[0.0], *parts])
+
+    def _frame_rms(self, views: Sequence[np.ndarray], starts: np.ndarray) -> np.ndarray:
+        energy = self._prefix(views, lambda v: np.square(v, dtype=np.float32))
+        return np.sqrt((energy[starts + self.frame_len] - energy[starts]) / self.frame_len)
+
+    def _frame_zcr(self, views: Sequence[np.ndarray], starts: np.ndarray) -> np.ndarray:
+        # crossings[i] is True when samples i and i + 1 differ in sign, including across views
+        crossings = np.diff(np.concatenate([np.signbit(v) for v in views]))
+        cum = np.concatenate([[0], np.cumsum(crossings, dtype=np.int64)])
+        return (cum[starts + self.frame_len - 1] - cum[starts]) / (self.frame_len - 1)
+
+    def _pitch(self, views: Sequence[np.ndarray], starts: np.ndarray):
+        """(pitch_hz, voicing strength) per start; 0 Hz where no pitch was found."""
+        pitch = np.zeros(len(starts))
+        strength = np.zeros(len(starts))
+        offset = 0
+        for view in views:
+            if len(view) < self.pitch_len:
+                offset += len(view)
+                continue
+            windows = sliding_window_view(view, self.pitch_len)  # Strided, no copy
+            local = starts - offset
+            inside = (local >= 0) & (local + self.pitch_len <= len(view))
+            if inside.any():
+                frames = windows[local[inside]].astype(np.float32)
+                frames -= frames.mean(axis=1, keepdims=True)
+                spectrum = np.fft.rfft(frames, n=self.n_fft, axis=1)
+                ac = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=self.n_fft, axis=1)
+                energy = ac[:, 0]
+                band = ac[:, self.min_lag:self.max_lag + 1]
+                lag = np.argmax(band, axis=1)
+                peak = band[np.arange(len(lag)), lag]
+                # Parabolic interpolation around the peak for sub-sample lag resolution
+                left = band[np.arange(len(lag)), np.clip(lag - 1, 0, band.shape[1] - 1)]
+                right = band[np.arange(len(lag)), np.clip(lag + 1, 0, band.shape[1] - 1)]
+                denom = left - 2 * peak + right
+                shift = np.where(np.abs(denom) > 1e-9, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+                true_lag = lag + self.min_lag + np.clip(shift, -0.5, 0.5)
+                norm = np.where(energy > 0, peak / np.where(energy > 0, energy, 1), 0.0)
+                voiced = norm >= self.voicing_threshold
+                pitch[inside] = np.where(voiced, self.sample_rate / true_lag, 0.0)
+                strength[inside] = np.clip(norm, 0, 1)
+            offset += len(view)
+        return pitch, strength
+
+    def _syllable_count(self, rms: np.ndarray, voiced: np.ndarray) -> int:
+        """Count energy-envelope peaks (syllable nuclei) in voiced regions."""
+        if len(rms) < 3:
+            return 0
+        kernel = np.ones(5) / 5
+        envelope = np.convolve(rms, kernel, mode="same")
+        threshold = 0.5 * float(np.median(envelope[voiced])) if voiced.any() else 0.0
+        mid = envelope[1:-1]
+        peaks = (mid > envelope[:-2]) & (mid >= envelope[2:]) & (mid > threshold) & voiced[1:-1]
+        # Require a dip of at least 10% between successive nuclei so ripple is not counted twice
+        idx = np.flatnonzero(peaks) + 1
+        if len(idx) < 2:
+            return len(idx)
+        troughs = np.minimum.reduceat(envelope, idx)[:-1]  # Minimum between consecutive peaks
+        distinct = troughs < 0.9 * np.minimum(envelope[idx[:-1]], envelope[idx[1:]])
+        return 1 + int(distinct.sum())
+
+
+feature_extractor = FeatureExtractor()
@@ -0,0 +1,223 @@
+"""Process-pool executor for CPU-bound model inference.
+
+Sentiment and local Whisper inference hold the GIL for hundreds of milliseconds, which
+stalls every WebSocket served by the same event loop. The executor runs registered
+providers (see app.providers) in a pool of worker processes instead:
+
+* Models are loaded once per worker by the pool initializer. With the default ``fork``
+  start method they can be preloaded in the parent, so workers share the weights
+  copy-on-write instead of each holding a private copy.
+* Each worker is a single-process pool, so it can be pinged, health-checked and replaced
+  on its own. Requests go to the least-loaded healthy worker.
+* Callers get asyncio futures with per-call timeouts. A global in-flight limit rejects
+  new work with `InferenceSaturated` instead of letting the queue grow without bound.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence
+
+from .providers import providers
+
+
+class InferenceError(RuntimeError):
+    """Base class for executor failures."""
+
+
+class InferenceSaturated(InferenceError):
+    """Raised when the in-flight limit is reached."""
+
+
+class InferenceTimeout(InferenceError):
+    """Raised when a call does not finish within its timeout."""
+
+
+def _init_worker(model_names: Sequence[str]) -> None:
+    """Pool initializer: load each model once (a no-op for models inherited from the parent)."""
+    providers.warm_up(model_names)
+
+
+def _invoke(name: str, method: Optional[str], args: tuple, kwargs: dict) -> Any:
+    target = providers.get(name)
+    if method:
+        target = getattr(target, method)
+    return target(*args, **kwargs)
+
+
+def _ping() -> Dict[str, Any]:
+    return {"pid": os.getpid(), "loaded": [name for name in providers._factories if providers.is_loaded(name)]}
+
+
+class InferenceWorker:
+    """One worker process behind its own single-process pool."""
+
+    def __init__(self, index: int, context, model_names: Sequence[str]):
+        self.index = index
+        self.context = context
+        self.model_names = tuple(model_names)
+        self.inflight = 0
+        self.healthy = True
+        self.restarts = 0
+        self.pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=self.context,
+            initializer=_init_worker,
+            initargs=(self.model_names,),
+        )
+
+    def restart(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._new_pool()
+        self.inflight = 0
+        self.healthy = True
+        self.restarts += 1
+
+
+class InferenceExecutor:
+    """Runs provider models in worker processes behind async futures."""
+
+    def __init__(
+        self,
+        workers: int = 0,
+        models: Sequence[str] = (),
+        max_inflight: int = 64,
+        timeout: float = 30.0,
+        start_method: str = "fork",
+        preload: bool = True
+    ):
+        self.num_workers = workers
+        self.models = tuple(models)
+        self.max_inflight = max_inflight
+        self.timeout = timeout
+        self.start_method = start_method
+        self.preload = preload
+        self.workers: List[InferenceWorker] = []
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "InferenceExecutor":
+        return cls(
+            workers=int(os.getenv("INFERENCE_WORKERS", "0")),
+            models=[name for name in os.getenv("INFERENCE_MODELS", "sentiment").split(",") if name],
+            max_inflight=int(os.getenv("INFERENCE_MAX_INFLIGHT", "64")),
+            timeout=float(os.getenv("INFERENCE_TIMEOUT", "30")),
+            start_method=os.getenv("INFERENCE_START_METHOD", "fork"),
+        )
+
+    @property
+    def started(self) -> bool:
+        return bool(self.workers)
+
+    @property
+    def inflight(self) -> int:
+        return sum(worker.inflight for worker in self.workers)
+
+    def start(self) -> None:
+        if self.started or self.num_workers < 1:
+            return
+        if self.preload and self.start_method == "fork":
+            # Load once in the parent; forked workers share the pages copy-on-write
+            providers.warm_up(self.models)
+        context = multiprocessing.get_context(self.start_method)
+        self.workers = [InferenceWorker(i, context, self.models) for i in range(self.num_workers)]
+
+    def shutdown(self) -> None:
+        for worker in self.workers:
+            worker.pool.shutdown(wait=False, cancel_futures=True)
+        self.workers = []
+
+    def _dispatch(self, fn, *args) -> Future:
+        with self._lock:
+            if not self.workers:
+                raise InferenceError("Inference executor is not started")
+            if self.inflight >= self.max_inflight:
+                self.rejected += 1
+                raise InferenceSaturated(f"{self.inflight} inference requests already in flight")
+            candidates = [w for w in self.workers if w.healthy] or self.workers
+            worker = min(candidates, key=lambda w: w.inflight)
+            try:
+                future = worker.pool.submit(fn, *args)
+            except BrokenProcessPool:
+                worker.restart()
+                future = worker.pool.submit(fn, *args)
+            worker.inflight += 1
+
+        def _done(f: Future, worker=worker) -> None:
+            with self._lock:
+                worker.inflight = max(0, worker.inflight - 1)
+                if not f.cancelled() and isinstance(f.exception(), BrokenProcessPool):
+                    worker.healthy = False
+                else:
+                    self.completed += 1
+
+        future.add_done_callback(_done)
+        return future
+
+    async def run(self, name: str, *args, method: Optional[str] = None,
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run provider `name` (or its `method`) in a worker and await the result."""
+        future = self._dispatch(_invoke, name, method, args, kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise InferenceTimeout(f"{name} inference exceeded {timeout or self.timeout}s")
+
+    def call(self, name: str, *args, method: Optional[str] = None,
+             timeout: Optional[float] = None, **kwargs) -> Any:
+        """Blocking variant of `run` for code already running in a worker thread."""
+        future = self._dispatch(_invoke, name, method, args, kwargs)
+        try:
+            return future.result(timeout or self.timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            raise InferenceTimeout(f"{name} inference exceeded {timeout or self.timeout}s")
+
+    async def health_check(self, timeout: float = 5.0) -> List[Dict[str, Any]]:
+        """Ping every worker; unresponsive workers are replaced."""
+        async def check(worker: InferenceWorker) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                future = worker.pool.submit(_ping)
+                info = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+                worker.healthy = True
+            except (asyncio.TimeoutError, BrokenProcessPool, RuntimeError):
+                worker.healthy = False
+                info = {"pid": None, "loaded": []}
+            report = {
+                "worker": worker.index,
+                "healthy": worker.healthy,
+                "inflight": worker.inflight,
+                "restarts": worker.restarts,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                **info,
+            }
+            if not worker.healthy:
+                worker.restart()
+            return report
+
+        return list(await asyncio.gather(*(check(worker) for worker in self.workers)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self.workers),
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+inference_executor = InferenceExecutor.from_env()
@@ -0,0 +1,265 @@
+"""Local intent classification with an LLM fallback.
+
+Most voice commands are one of a handful of shapes: add a task, start a focus session,
+log a mood, snooze a reminder. `IntentRouter` answers those locally in microseconds:
+
+1. Compiled regex grammars match the common phrasings and extract slots (a task title,
+   minutes, a mood level). Commands are anchored to the start of the utterance, so
+   "we postponed the trip" is not a snooze and "how do I start focus mode?" starts nothing. Broad phrasings ("i need to ...") carry a
+   confidence below 1.0: they only supply slots once the centroid or the LLM agrees.
+2. A nearest-centroid model on hashed word and character n-grams catches paraphrases
+   the grammars miss.
+3. Only when neither is confident does the router ask the LLM.
+
+The router keeps hit-rate and latency statistics, so the LLM calls avoided can be measured.
+"""
+import re
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Pattern, Sequence, Tuple
+
+import numpy as np
+
+FALLBACK_INTENT = "query"
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30, "forty five": 45, "sixty": 60, "an": 1, "a": 1,
+}
+# Commands start the utterance, after an optional polite lead-in ("ok, please snooze")
+_START = r"^\s*(?:(?:please|ok(?:ay)?|hey|so|can you|could you|would you)[\s,]+)*"
+_NUMBER = r"(?P<{name}>\d+|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r")"
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    return int(value) if value.isdigit() else NUMBER_WORDS.get(value.lower())
+
+
+@dataclass(frozen=True)
+class Grammar:
+    intent: str
+    pattern: Pattern
+    confidence: float = 1.0  # Below 1.0 the match is a hint, not a decision
+
+
+def _grammar(intent: str, *patterns: str, confidence: float = 1.0) -> List[Grammar]:
+    return [Grammar(intent, re.compile(p, re.IGNORECASE), confidence) for p in patterns]
+
+
+GRAMMARS: List[Grammar] = [
+    *_grammar(
+        "snooze_reminder",
+        _START + r"(?:snooze|delay|postpone)\b(?:\s+(?:the|my|this|that))?(?:\s+reminder)?"
+        r"(?:\s+(?:for|by)\s+" + _NUMBER.format(name="minutes") + r"\s*(?P<unit>minutes?|mins?|hours?))?",
+        _START + r"remind me (?:again )?in\s+" + _NUMBER.format(name="minutes") + r"\s*(?P<unit>minutes?|mins?|hours?)",
+    ),
+    *_grammar(
+        "start_focus",
+        _START + r"(?:start|begin|enter)\s+(?:a\s+|my\s+)?(?:focus|pomodoro|deep work)(?:\s+(?:session|mode|timer))?"
+        r"(?:\s+for\s+" + _NUMBER.format(name="minutes") + r"\s*(?P<unit>minutes?|mins?|hours?))?",
+        _START + r"(?:help me|let me|i need to|time to)\s+(?:focus|concentrate)\b",
+    ),
+    *_grammar(
+        "log_mood",
+        _START + r"(?:log|record|track)\s+(?:my\s+)?mood\b(?:\s+(?:as|at)\s+" + _NUMBER.format(name="level") + r")?",
+        _START + r"i(?:'m| am)\s+feeling\s+(?P<feeling>[a-z ]+)",
+        _START + r"my mood is\s+(?:a\s+)?" + _NUMBER.format(name="level"),
+    ),
+    *_grammar(
+        "add_task",
+        _START + r"(?:add|create|make|new)\s+(?:a\s+)?(?:task|to-?do|item)(?:\s+(?:to|for|called|named))?"
+        r"\s+(?P<title>.+)",
+        _START + r"(?:remind me to|don't let me forget to|add)\s+(?P<title>.+)",
+    ),
+    # "i need to vent about work" is not a task: let the centroid or the LLM decide
+    *_grammar("add_task", _START + r"i need to\s+(?P<title>.+)", confidence=0.6),
+]
+
+EXAMPLES: Dict[str, Sequence[str]] = {
+    "add_task": (
+        "add buy milk to my list", "put call mom on my tasks", "new task water the plants",
+        "i have to pay rent tomorrow", "note that i should email the landlord", "schedule laundry for tonight",
+    ),
+    "start_focus": (
+        "start focus", "focus mode on", "block distractions for a while", "let's do a pomodoro",
+        "i want to get into deep work", "start a timer so i can concentrate",
+    ),
+    "log_mood": (
+        "i feel great today", "feeling pretty low", "i'm exhausted", "my mood is bad", "i am so happy",
+        "i'm stressed out", "feeling anxious",
+    ),
+    "snooze_reminder": (
+        "snooze", "not now remind me later", "later please", "push that back", "give me ten more minutes",
+        "ask me again later",
+    ),
+}
+
+
+def _features(text: str, dims: int) -> np.ndarray:
+    """Hashed bag of words, word bigrams and character trigrams, L2-normalised."""
+    text = text.lower()
+    words = re.findall(r"[a-z']+", text)
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vec = np.zeros(dims, dtype=np.float32)
+    for gram in grams:
+        vec[zlib.crc32(gram.encode()) % dims] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+@dataclass
+class IntentResult:
+    intent: str
+    confidence: float
+    source: str  # grammar | centroid | llm | fallback
+    slots: Dict[str, Any] = field(default_factory=dict)
+    latency_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"intent": self.intent, "confidence": round(self.confidence, 4), "source": self.source,
+                "slots": self.slots, "latency_ms": round(self.latency_ms, 3)}
+
+
+class NearestCentroid:
+    """Cosine nearest-centroid classifier over hashed n-gram features."""
+
+    def __init__(self, examples: Dict[str, Sequence[str]], dims: int = 2048):
+        self.dims = dims
+        self.labels = list(examples)
+        centroids = np.stack([
+            np.mean([_features(text, dims) for text in examples[label]], axis=0) for label in self.labels
+        ])
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    def scores(self, text: str) -> List[Tuple[str, float]]:
+        sims = self.centroids @ _features(text, self.dims)
+        order = np.argsort(-sims)
+        return [(self.labels[i], float(sims[i])) for i in order]
+
+
+LLMClassifier = Callable[[str, Sequence[str]], Awaitable[str]]
+
+
+class IntentRouter:
+    """Grammar first, then nearest centroid; the LLM only when neither is confident."""
+
+    def __init__(
+        self,
+        grammars: Sequence[Grammar] = GRAMMARS,
+        examples: Dict[str, Sequence[str]] = EXAMPLES,
+        min_similarity: float = 0.45,
+        min_margin: float = 0.08,
+        llm: Optional[LLMClassifier] = None,
+        assumed_llm_ms: float = 800.0
+    ):
+        self.grammars = list(grammars)
+        self.model = NearestCentroid(examples)
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.llm = llm
+        self.counts = {"requests": 0, "grammar": 0, "centroid": 0, "llm": 0, "fallback": 0}
+        self.local_ms = 0.0
+        self.llm_ms = 0.0
+        self.assumed_llm_ms = assumed_llm_ms
+
+    @property
+    def intents(self) -> List[str]:
+        return self.model.labels
+
+    def classify_local(self, text: str) -> Optional[IntentResult]:
+        """Synchronous local classification; None when not confident."""
+        started = time.perf_counter()
+        result = None
+        grammar, match = self._grammar_match(text)
+        if grammar is not None and grammar.confidence >= 1.0:
+            result = IntentResult(grammar.intent, 1.0, "grammar", self._slots(grammar.intent, match))
+        if result is None:
+            (best, best_sim), (_, runner_up) = self.model.scores(text)[:2]
+            if best_sim >= self.min_similarity and best_sim - runner_up >= self.min_margin:
+                slots = self._slots(best, match) if grammar is not None and grammar.intent == best else {}
+                result = IntentResult(best, best_sim, "centroid", slots)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.local_ms += elapsed
+        if result is not None:
+            result.latency_ms = elapsed
+        return result
+
+    def _grammar_match(self, text: str) -> Tuple[Optional[Grammar], Optional[re.Match]]:
+        for grammar in self.grammars:
+            match = grammar.pattern.search(text)
+            if match:
+                return grammar, match
+        return None, None
+
+    def _slots(self, intent: str, match: re.Match) -> Dict[str, Any]:
+        groups = {k: v for k, v in match.groupdict().items() if v}
+        slots: Dict[str, Any] = {}
+        if "title" in groups:
+            slots["title"] = groups["title"].strip().rstrip(".!?")
+        if "minutes" in groups:
+            minutes = _to_int(groups["minutes"])
+            if minutes is not None and groups.get("unit", "").lower().startswith("hour"):
+                minutes *= 60
+            slots["minutes"] = minutes
+        if "level" in groups:
+            slots["level"] = _to_int(groups["level"])
+        if "feeling" in groups:
+            slots["feeling"] = groups["feeling"].strip()
+        return slots
+
+    async def classify(self, text: str) -> IntentResult:
+        self.counts["requests"] += 1
+        result = self.classify_local(text)
+        if result is not None:
+            self.counts[result.source] += 1
+            return result
+        if self.llm is None:
+            self.counts["fallback"] += 1
+            return IntentResult(FALLBACK_INTENT, 0.0, "fallback")
+
+        started = time.perf_counter()
+        try:
+            label = await self.llm(text, self.intents + [FALLBACK_INTENT])
+        except Exception:
+            # An unavailable LLM is a fallback, not an LLM call: its latency stays out of mean_llm_ms
+            self.counts["fallback"] += 1
+            return IntentResult(FALLBACK_INTENT, 0.0, "fallback", latency_ms=(time.perf_counter() - started) * 1000)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.llm_ms += elapsed
+        self.counts["llm"] += 1
+        intent = label if label in self.intents else FALLBACK_INTENT
+        grammar, match = self._grammar_match(text)
+        slots = self._slots(intent, match) if grammar is not None and grammar.intent == intent else {}
+        return IntentResult(intent, 0.5, "llm", slots, latency_ms=elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.counts["requests"]
+        local_hits = self.counts["grammar"] + self.counts["centroid"]
+        llm_calls = self.counts["llm"]
+        mean_llm_ms = self.llm_ms / llm_calls if llm_calls else self.assumed_llm_ms
+        return {
+            **self.counts,
+            "hit_rate": round(local_hits / requests, 4) if requests else 0.0,
+            "mean_local_ms": round(self.local_ms / requests, 4) if requests else 0.0,
+            "mean_llm_ms": round(mean_llm_ms, 2),
+            # Each local hit is one LLM round trip not made
+            "latency_saved_ms": round(local_hits * mean_llm_ms - self.local_ms, 2),
+        }
+
+
+def actions_for(intent: str, slots: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Suggested client actions for a classified intent and its slots."""
+    if intent == "add_task":
+        return [{"action": "create_task", **({"title": slots["title"]} if "title" in slots else {})}]
+    if intent == "start_focus":
+        return [{"action": "start_focus", "minutes": slots.get("minutes") or 25}]
+    if intent == "log_mood":
+        return [{"action": "log_mood", **{k: slots[k] for k in ("level", "feeling") if k in slots}}]
+    if intent == "snooze_reminder":
+        return [{"action": "snooze_reminder", "minutes": slots.get("minutes") or 10}]
+    return []
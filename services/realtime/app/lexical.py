@@ -0,0 +1,127 @@
+"""BM25 keyword search over memory messages.
+
+Exact recalls ("the dentist reminder", a task name) don't need semantics, yet the vector
+path pays for an OpenAI embedding on every query. `BM25Index` is an incremental inverted
+index (term -> {memory id: term frequency}). Adding or removing a memory touches only its
+own terms; document frequencies and the average length are kept as running totals.
+
+`looks_like_keywords` decides when a query can skip the embedding round-trip entirely:
+short queries without question words, or quoted phrases.
+"""
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+TOKEN = re.compile(r"\w+(?:'\w+)?")  # Unicode words, as in dedup fingerprints
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its me my of on or so that the "
+    "this to was we were with you your".split()
+)
+QUESTION_WORDS = frozenset("how what when where which who why whom whose did do does should could would can".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.casefold()) if t not in STOPWORDS]
+
+
+def looks_like_keywords(query: str, max_terms: int = 4) -> bool:
+    """True for quoted phrases and short, question-free queries (names, titles, tags)."""
+    if '"' in query:
+        return True
+    words = TOKEN.findall(query.casefold())
+    return 0 < len(words) <= max_terms and not QUESTION_WORDS.intersection(words)
+
+
+class BM25Index:
+    """Okapi BM25 with incremental add/remove."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_terms: Dict[int, Counter] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.doc_terms
+
+    def add(self, doc_id: int, text: str) -> None:
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        self.doc_terms[doc_id] = terms
+        self.lengths[doc_id] = sum(terms.values())
+        self.total_length += self.lengths[doc_id]
+        for term, tf in terms.items():
+            self.postings[term][doc_id] = tf
+
+    def remove(self, doc_id: int) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_terms) - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score for every memory containing at least one query term."""
+        if not self.doc_terms:
+            return {}
+        avg_length = self.total_length / len(self.doc_terms) or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[float, int]]:
+        return sorted(((s, d) for d, s in self.scores(query).items()), reverse=True)[:k]
+
+    def extend(self, docs: Iterable[Tuple[int, str]]) -> "BM25Index":
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+        return self
+
+
+class MemoryLexicon:
+    """One user's BM25 index plus the memory rows (without embeddings) it can return."""
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.memories: Dict[int, Dict[str, Any]] = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, memories: Sequence[Dict[str, Any]]) -> "MemoryLexicon":
+        lexicon = cls()
+        for memory in memories:
+            lexicon.add(memory)
+        return lexicon
+
+    def __len__(self) -> int:
+        return len(self.memories)
+
+    def add(self, memory: Dict[str, Any]) -> None:
+        self.memories[memory["id"]] = {k: v for k, v in memory.items() if k != "vector_embedding"}
+        self.index.add(memory["id"], memory.get("message") or "")
+
+    def remove(self, memory_id: int) -> None:
+        self.memories.pop(memory_id, None)
+        self.index.remove(memory_id)
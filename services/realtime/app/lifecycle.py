@@ -0,0 +1,135 @@
+"""Model warm-up and readiness for the realtime service.
+
+A fresh replica has no models in memory, so without gating the first request after a deploy
+or scale-up waits for transformers and Whisper to load. `ModelLifecycle` loads the
+configured providers in the background during FastAPI startup. It tracks each model
+through pending -> loading -> ready | failed, with timings, and reports readiness only
+once every required model is loaded (and the inference pool, if configured, has started).
+Orchestrators should route traffic on /health/ready and restart on /health/live.
+
+Loading from a local snapshot directory (MODEL_SNAPSHOT_DIR) avoids network downloads on
+cold start. Build one with:
+
+    python -m app.lifecycle snapshot /models
+"""
+import asyncio
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from .inference import inference_executor
+from .providers import providers
+
+IMPORTED_AT = time.monotonic()
+
+
+@dataclass
+class ModelState:
+    name: str
+    status: str = "pending"  # pending | loading | ready | failed
+    load_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"status": self.status, "load_ms": self.load_ms, **({"error": self.error} if self.error else {})}
+
+
+class ModelLifecycle:
+    """Background preloading with per-model state and a readiness gate."""
+
+    def __init__(self, models: Sequence[str] = (), required: Optional[Sequence[str]] = None):
+        self.models = list(models)
+        self.required = list(self.models if required is None else required)
+        self.states: Dict[str, ModelState] = {name: ModelState(name) for name in {*self.models, *self.required}}
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "ModelLifecycle":
+        models = [name for name in os.getenv("WARM_PROVIDERS", "").split(",") if name]
+        required = os.getenv("READY_REQUIRES")
+        return cls(models, None if required is None else [name for name in required.split(",") if name])
+
+    def start(self) -> asyncio.Task:
+        """Begin loading in the background; returns the task so callers may await it."""
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self._load_all())
+        return self._task
+
+    async def _load_all(self) -> None:
+        # Sequentially, to avoid peak memory from several models initialising at once
+        for name in self.models:
+            await self.load(name)
+        # Fork inference workers only after the parent holds the weights, so they share them
+        await asyncio.to_thread(inference_executor.start)
+        self._check_ready()
+
+    async def load(self, name: str) -> ModelState:
+        state = self.states.setdefault(name, ModelState(name))
+        state.status = "loading"
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(providers.get, name)
+        except Exception as e:
+            state.status, state.error = "failed", f"{type(e).__name__}: {e}"
+        else:
+            state.status, state.error = "ready", None
+        state.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        self._check_ready()
+        return state
+
+    def _check_ready(self) -> None:
+        if self.ready_at is None and self.ready:
+            self.ready_at = time.monotonic()
+
+    @property
+    def ready(self) -> bool:
+        pool_ready = inference_executor.num_workers < 1 or inference_executor.started
+        return pool_ready and all(
+            self.states[name].status == "ready" or providers.is_loaded(name) for name in self.required
+        )
+
+    def report(self) -> Dict[str, Any]:
+        cold_start_ms = None
+        if self.ready_at is not None:
+            cold_start_ms = round((self.ready_at - IMPORTED_AT) * 1000, 1)
+        return {
+            "ready": self.ready,
+            "models": {name: state.as_dict() for name, state in self.states.items()},
+            "required": self.required,
+            "inference_pool": {"workers": inference_executor.num_workers, "started": inference_executor.started},
+            "cold_start_ms": cold_start_ms,
+            "uptime_s": round(time.monotonic() - IMPORTED_AT, 1),
+        }
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+def write_snapshots(root: str, names: Sequence[str] = ("sentiment", "whisper")) -> List[str]:
+    """Download and serialize models into `root` so replicas can load them without network access."""
+    written = []
+    if "sentiment" in names:
+        from transformers import pipeline
+
+        path = os.path.join(root, "sentiment")
+        pipeline("sentiment-analysis").save_pretrained(path)
+        written.append(path)
+    if "whisper" in names:
+        import whisper
+
+        path = os.path.join(root, "whisper")
+        whisper.load_model(os.getenv("WHISPER_MODEL", "base"), download_root=path)
+        written.append(path)
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "snapshot":
+        sys.exit("usage: python -m app.lifecycle snapshot <directory> [model ...]")
+    for path in write_snapshots(sys.argv[2], sys.argv[3:] or ("sentiment", "whisper")):
+        print(f"wrote {path}")
@@ -1,17 +1,97 @@
-from fastapi import FastAPI, WebSocket, HTTPException, Depends, Header
+from fastapi import (
+    BackgroundTasks, FastAPI, WebSocket, WebSocketDisconnect, WebSocketException, HTTPException, Depends, Header,
+    Request, Response, status
+)
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from contextlib import asynccontextmanager
 import httpx
 import json
 import asyncio
+import base64
 import os
+import secrets
 from datetime import datetime
+from .inference import InferenceSaturated, InferenceTimeout, inference_executor
+from .lifecycle import ModelLifecycle
+from .voice_protocol import FrameQueue, VoiceFrame, ProtocolError, parse_frame, CODEC_PCM16
+from .stt import stt_engine
+from .sessions import SessionLimitError, SessionOwnerError
+from .services import memory_service
+from .memory_feed import ChangeFeedTailer
+from .projection import Reprojector
+from .reinforcement import ReinforcementBuffer
+from .sharded import shard_pool
+from . import chat
+from .completion import completion_response, intent_router, run_completion, user_id_from
+from .pipeline import StageResult
+from uuid import uuid4
+
+# Per-session receive queue depth (frames) and how often to acknowledge progress
+WS_QUEUE_FRAMES = int(os.getenv("WS_QUEUE_FRAMES", "64"))
+WS_ACK_INTERVAL = int(os.getenv("WS_ACK_INTERVAL", "25"))
+# How often idle voice sessions are snapshotted and released (seconds)
+SESSION_SWEEP_INTERVAL = float(os.getenv("VOICE_SESSION_SWEEP_INTERVAL", "10"))
+
+
+# Models/SDKs to load at startup instead of on first request (WARM_PROVIDERS, e.g. "sentiment,whisper")
+model_lifecycle = ModelLifecycle.from_env()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load WARM_PROVIDERS in the background, then start the inference pool (INFERENCE_WORKERS > 0);
+    # /health/ready stays 503 until both are done
+    model_lifecycle.start()
+    sweeper = asyncio.create_task(_sweep_sessions())
+    # Worker processes for "sharded" memory search (MEMORY_SHARD_WORKERS > 0)
+    shard_pool.start()
+    # Tail Django's memory change journal so resident search indexes stay current
+    feed_task = None
+    if os.getenv("MEMORY_CHANGE_FEED", "0") == "1":
+        memory_service.change_feed = ChangeFeedTailer.from_env(memory_service)
+        feed_task = asyncio.create_task(memory_service.change_feed.run())
+    # Backfill reduced embeddings for the active projection version
+    reproject_task = None
+    if os.getenv("MEMORY_REPROJECT", "0") == "1" and memory_service.projection is not None:
+        memory_service.reprojector = Reprojector(memory_service.store, memory_service.projection)
+        reproject_task = asyncio.create_task(memory_service.reprojector.run())
+    # Buffer retrievals and write relevance reinforcement back in batches
+    reinforce_task = None
+    if os.getenv("MEMORY_REINFORCE", "0") == "1":
+        memory_service.reinforcement = ReinforcementBuffer.from_env(memory_service)
+        reinforce_task = asyncio.create_task(memory_service.reinforcement.run())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        if feed_task is not None:
+            feed_task.cancel()
+            memory_service.change_feed = None
+        if reproject_task is not None:
+            reproject_task.cancel()
+        if reinforce_task is not None:
+            # Cancelling runs a final flush; let it finish before the store closes
+            reinforce_task.cancel()
+            await asyncio.gather(reinforce_task, return_exceptions=True)
+            memory_service.reinforcement = None
+        await model_lifecycle.stop()
+        inference_executor.shutdown()
+        memory_service.release_matrices()
+        shard_pool.shutdown()
+        await memory_service.store.close()
+
+async def _sweep_sessions():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        stt_engine.sessions.sweep()
 
 app = FastAPI(
     title="Chaos Contained Realtime Service",
     description="FastAPI microservice for voice, emotion, and realtime AI interactions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -23,6 +103,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(InferenceSaturated)
+async def inference_saturated_handler(request: Request, exc: InferenceSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(InferenceTimeout)
+async def inference_timeout_handler(request: Request, exc: InferenceTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+@app.exception_handler(SessionLimitError)
+async def session_limit_handler(request: Request, exc: SessionLimitError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+@app.exception_handler(SessionOwnerError)
+async def session_owner_handler(request: Request, exc: SessionOwnerError):
+    return JSONResponse(status_code=403, content={"detail": str(exc)})
+
+@app.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    report = model_lifecycle.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@app.get("/metrics/sessions")
+async def session_metrics():
+    return stt_engine.sessions.metrics()
+
+@app.get("/metrics/intents")
+async def intent_metrics():
+    return intent_router.stats()
+
+@app.get("/metrics/memory")
+async def memory_metrics():
+    return memory_service.stats()
+
+@app.get("/metrics/chat")
+async def chat_metrics():
+    return chat.chat_stats.as_dict()
+
+@app.get("/health/inference")
+async def inference_health():
+    workers = await inference_executor.health_check()
+    return {"healthy": all(w["healthy"] for w in workers), "workers": workers, **inference_executor.stats()}
+
 # Models
 class VoiceStreamRequest(BaseModel):
     audio_chunk: str  # base64 encoded audio
@@ -36,7 +162,14 @@ class VoiceCompleteRequest(BaseModel):
 class AIResponseRequest(BaseModel):
     text: str
     context: Optional[Dict[str, Any]] = None
-    user_id: str
+    user_id: Optional[str] = None  # Ignored: identity comes from the bearer token only
+
+class MemorySearchRequest(BaseModel):
+    user_id: int
+    query: str
+    limit: int = 5
+    mode: Optional[str] = None  # "early" | "exhaustive" | "quantized" | "sharded" | "lexical" | "hybrid" | "auto"; defaults to MEMORY_SEARCH_MODE
+    precision: Optional[str] = None  # "full" | "reduced" | "rerank" with a projection; defaults to MEMORY_SEARCH_PRECISION
 
 class EmotionResponse(BaseModel):
     mood: str
@@ -61,6 +194,20 @@ async def verify_token(authorization: str = Header(None)):
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+async def verify_websocket_token(websocket: WebSocket, token: Optional[str] = None):
+    """Browsers cannot set headers on a WebSocket, so the token may also come as ?token=."""
+    authorization = websocket.headers.get("authorization") or (f"Bearer {token}" if token else None)
+    try:
+        return await verify_token(authorization)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+async def verify_service_token(x_service_token: str = Header(None)):
+    """Internal callers (the Django API) present MEMORY_FEED_TOKEN as X-Service-Token."""
+    token = os.getenv("MEMORY_FEED_TOKEN", "")
+    if not token or not x_service_token or not secrets.compare_digest(x_service_token, token):
+        raise HTTPException(status_code=401, detail="Invalid service token")
+
 # Routes
 @app.post("/voice/stream/")
 async def stream_voice(
@@ -68,11 +215,19 @@ async def stream_voice(
     user_data: dict = Depends(verify_token)
 ):
     """Handle streaming voice input, returns incremental transcriptions."""
-    # TODO: Implement STT processing
+    session_id = request.session_id or uuid4().hex
+    try:
+        audio = base64.b64decode(request.audio_chunk)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="audio_chunk must be base64-encoded PCM16")
+    events = await stt_engine.feed(session_id, audio, user_id_from(user_data))
+    latest = events[-1] if events else None
     return {
-        "session_id": request.session_id or "new_session_id",
-        "transcript": "Partial transcript...",
-        "is_final": False
+        "session_id": session_id,
+        "transcript": latest["text"] if latest else "",
+        "stable": latest.get("stable", latest["text"]) if latest else "",
+        "is_final": bool(latest and latest["type"] == "final"),
+        "events": events
     }
 
 @app.post("/voice/complete/")
@@ -80,30 +235,43 @@ async def complete_voice(
     request: VoiceCompleteRequest,
     user_data: dict = Depends(verify_token)
 ):
-    """Finalize a voice recording, return full analysis."""
-    # TODO: Implement full processing pipeline
-    return {
-        "transcript": "Full transcript",
-        "emotion": {
-            "mood": "neutral",
-            "confidence": 0.85,
-            "indicators": {"pitch": 0.5, "tempo": 0.5}
-        },
-        "intent": "query",
-        "suggested_actions": []
-    }
+    """Finalize a voice recording, return full analysis (403 for another user's session)."""
+    user_id = user_id_from(user_data)
+    if request.final_chunk:
+        try:
+            await stt_engine.feed(request.session_id, base64.b64decode(request.final_chunk), user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="final_chunk must be base64-encoded PCM16")
+    run = await run_completion(request.session_id, user_id)
+    return completion_response(run)
 
 @app.post("/ai/respond/")
 async def ai_respond(
     request: AIResponseRequest,
+    background_tasks: BackgroundTasks,
     user_data: dict = Depends(verify_token)
 ):
-    """Get quick AI response optimized for low latency."""
-    # TODO: Implement AI response generation
-    return {
-        "response": "I understand you want to...",
-        "actions": []
-    }
+    """Chat turn with a token-budgeted prompt (rolling summary, recent turns, retrieved memories).
+
+    Memory is read and written only for the user named by the token; without one the turn
+    runs with no memory access.
+    """
+    user_id = user_id_from(user_data)
+    result = await chat.respond(user_id, request.text, request.context)
+    if user_id is not None:
+        background_tasks.add_task(chat.remember_turn, user_id, request.text, result["response"], request.context)
+    return result
+
+@app.post("/memory/search", dependencies=[Depends(verify_service_token)])
+async def search_memory(request: MemorySearchRequest, response: Response):
+    """Semantic memory search for the Django API (service-to-service, X-Service-Token)."""
+    memories, stats = await memory_service.search_memories(
+        request.user_id, request.query, request.limit, request.mode, request.precision
+    )
+    response.headers["X-Memory-Scanned"] = str(stats.scanned)
+    response.headers["X-Memory-Early-Exit"] = str(stats.terminated_early).lower()
+    # Embeddings stay server-side; callers only need the memories themselves
+    return [{k: v for k, v in memory.items() if k != "vector_embedding"} for memory in memories]
 
 @app.post("/wake/")
 async def handle_wake(
@@ -113,17 +281,152 @@ async def handle_wake(
     """Handle wake word detection events."""
     return {"status": "acknowledged"}
 
+class VoiceChannel:
+    """Serialises sends on a voice WebSocket shared by the receive loop and the consumer."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self._send_lock = asyncio.Lock()
+
+    async def send_json(self, message: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def flush_signals(self, queue: FrameQueue) -> None:
+        for signal in queue.pending_signals():
+            await self.send_json(signal)
+
+
+async def _process_voice_frame(
+    session_id: str,
+    frame: VoiceFrame,
+    user_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Handle one audio frame; returns messages for the client."""
+    if frame.codec != CODEC_PCM16:
+        return [{"type": "error", "detail": "Only PCM16 frames can be transcribed", "seq": frame.seq}]
+    return await stt_engine.feed(session_id, frame.payload, user_id)
+
+
+async def _consume_voice_frames(
+    channel: VoiceChannel,
+    session_id: str,
+    queue: FrameQueue,
+    ended: asyncio.Event,
+    user_id: Optional[int] = None
+) -> None:
+    try:
+        while True:
+            frame = await queue.get()
+            if frame is None:
+                break
+            for response in await _process_voice_frame(session_id, frame, user_id):
+                await channel.send_json(response)
+            if queue.stats.frames_out % WS_ACK_INTERVAL == 0:
+                await channel.send_json({"type": "ack", "seq": frame.seq, "queued": len(queue)})
+            await channel.flush_signals(queue)
+    finally:
+        if not ended.is_set():
+            # Connection dropped mid-stream: keep the session so a reconnect can resume it
+            stt_engine.suspend(session_id)
+    if not ended.is_set():
+        return
+
+    async def send_stage(result: StageResult) -> None:
+        # Each stage goes out as soon as it lands, rather than after the slowest one
+        if result.name == "transcript" and result.ok:
+            for event in result.value["events"]:
+                await channel.send_json(event)
+            await channel.send_json({"type": "transcript", "text": result.value["transcript"], "is_final": True})
+        else:
+            await channel.send_json({"type": "stage", **result.as_dict()})
+
+    await run_completion(session_id, user_id, on_result=send_stage)
+
+
+def _legacy_text_frame(message: Any, seq: int) -> Optional[VoiceFrame]:
+    """Accept the older JSON message shape ({"audio_chunk": <base64>}) on the same socket."""
+    try:
+        audio = base64.b64decode(message["audio_chunk"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    return VoiceFrame(seq=seq, timestamp_ms=int(message.get("timestamp") or 0), payload=memoryview(audio))
+
+
 @app.websocket("/ws/voice/{session_id}")
-async def voice_websocket(websocket: WebSocket, session_id: str):
-    """WebSocket endpoint for real-time voice communication."""
+async def voice_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    user_data: dict = Depends(verify_websocket_token)
+):
+    """WebSocket endpoint for real-time voice communication.
+
+    Binary messages carry audio frames (see app.voice_protocol); text messages carry JSON control.
+    Only the user who opened a session can resume it.
+    """
     await websocket.accept()
+    channel = VoiceChannel(websocket)
+    user_id = user_id_from(user_data)
     try:
-        while True:
-            data = await websocket.receive_text()
-            # Process voice data
-            response = {"type": "transcript", "text": "Processing..."}
-            await websocket.send_json(response)
+        session = stt_engine.sessions.get(session_id, user_id)
+    except SessionOwnerError as e:
+        await channel.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except SessionLimitError as e:
+        await channel.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1013)  # Try again later
+        return
+    if session.resumed:
+        transcriber = session.state
+        await channel.send_json({
+            "type": "resumed",
+            "transcript": transcriber.transcript,
+            "segments": len(transcriber.finals),
+            "audio_ms": transcriber.buffer.total_written * 1000 // transcriber.sample_rate,
+        })
+    queue = FrameQueue(maxsize=WS_QUEUE_FRAMES)
+    ended = asyncio.Event()
+    consumer = asyncio.create_task(_consume_voice_frames(channel, session_id, queue, ended, user_id))
+    try:
+        while not queue.closed:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                try:
+                    frame = parse_frame(message["bytes"])
+                except ProtocolError as e:
+                    await channel.send_json({"type": "error", "detail": str(e)})
+                    continue
+                queue.offer(frame)
+                if frame.end_of_stream:
+                    ended.set()
+                    queue.close()
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = None
+                if isinstance(control, dict) and control.get("type") == "end":
+                    ended.set()
+                    queue.close()
+                    continue
+                frame = _legacy_text_frame(control, queue.stats.frames_in)
+                if frame is None:
+                    await channel.send_json({"type": "error", "detail": "Unrecognised message"})
+                    continue
+                queue.offer(frame)
+            await channel.flush_signals(queue)
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        await websocket.close()
\ No newline at end of file
+        queue.close()
+        try:
+            await consumer
+            await channel.send_json({"type": "stats", **queue.stats.as_dict()})
+            await websocket.close()
+        except Exception:
+            pass  # Client already gone
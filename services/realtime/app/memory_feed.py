@@ -0,0 +1,114 @@
+"""Keep resident memory indexes fresh by tailing Django's MemoryChange journal.
+
+The quantized and BM25 indexes in MemoryService are built from a user's full history.
+Without a feed they can only be rebuilt on a TTL, which both re-downloads everything and
+leaves them stale in between. `ChangeFeedTailer` polls the journal for `seq > cursor`
+and, for users whose indexes are resident, re-reads just the changed rows by id. Upserts
+are applied as add (replace) and deletes as remove. Users without resident indexes are
+skipped; they build fresh on first use.
+
+Sequence numbers are allocated before commit, so a lower seq can become visible after a
+higher one. A hole in the sequence is held open for `gap_timeout_s` and the cursor stays
+below it, so a late commit is still picked up. Re-applying a change is harmless, and
+holes left by rolled-back transactions expire. While the feed is healthy,
+MemoryService skips TTL rebuilds.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .memory_search import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeedTailer:
+    def __init__(self, service, interval_s: float = 1.0, batch_size: int = 500, gap_timeout_s: float = 10.0,
+                 clock=time.monotonic):
+        self.service = service
+        self.interval_s = interval_s
+        self.batch_size = batch_size
+        self.gap_timeout_s = gap_timeout_s
+        self.clock = clock
+        self.cursor: Optional[int] = None
+        self.gaps: Dict[int, float] = {}  # missing seq -> when first noticed
+        self.applied = 0
+        self.last_ok_at: Optional[float] = None
+        self.lag_s: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, service) -> "ChangeFeedTailer":
+        return cls(
+            service,
+            interval_s=float(os.getenv("MEMORY_FEED_INTERVAL", "1")),
+            batch_size=int(os.getenv("MEMORY_FEED_BATCH", "500")),
+            gap_timeout_s=float(os.getenv("MEMORY_FEED_GAP_TIMEOUT", "10")),
+        )
+
+    @property
+    def healthy(self) -> bool:
+        return self.last_ok_at is not None and self.clock() - self.last_ok_at < 3 * self.interval_s + 5
+
+    async def poll_once(self) -> int:
+        """Fetch and apply one batch; returns the number of journal entries applied."""
+        store = self.service.store
+        if self.cursor is None:
+            # Indexes are built from current rows, so history before now never needs replaying
+            self.cursor, _ = await store.fetch_changes(None)
+            self.last_ok_at = self.clock()
+            return 0
+        _, changes = await store.fetch_changes(self.cursor, self.batch_size)
+        now = self.clock()
+        expected = self.cursor + 1
+        for change in changes:
+            for missing in range(expected, change["seq"]):
+                self.gaps.setdefault(missing, now)
+            self.gaps.pop(change["seq"], None)
+            expected = change["seq"] + 1
+        if changes:
+            await self.apply(changes)
+            newest = parse_timestamp(changes[-1]["created_at"])
+            self.lag_s = round((datetime.now(timezone.utc) - newest).total_seconds(), 3)
+        self.gaps = {seq: seen for seq, seen in self.gaps.items() if now - seen < self.gap_timeout_s}
+        high = changes[-1]["seq"] if changes else self.cursor
+        self.cursor = min(min(self.gaps) - 1, high) if self.gaps else high
+        self.applied += len(changes)
+        self.last_ok_at = now
+        return len(changes)
+
+    async def apply(self, changes: List[Dict[str, Any]]) -> None:
+        latest: Dict[int, Dict[int, str]] = {}
+        for change in changes:
+            latest.setdefault(change["user_id"], {})[change["memory_id"]] = change["op"]
+        for user_id, ops in latest.items():
+            if not self.service.has_resident_indexes(user_id):
+                continue
+            upserts = [memory_id for memory_id, op in ops.items() if op == "upsert"]
+            rows = {row["id"]: row for row in await self.service.store.fetch_by_ids(user_id, upserts)} if upserts else {}
+            for memory_id in ops:
+                # A row that vanished between journal and fetch was deleted meanwhile
+                self.service.apply_change(user_id, memory_id, rows.get(memory_id))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                applied = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("memory change feed poll failed")
+                applied = 0
+            if applied < self.batch_size:
+                await asyncio.sleep(self.interval_s)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cursor": self.cursor,
+            "applied": self.applied,
+            "open_gaps": len(self.gaps),
+            "lag_s": self.lag_s,
+            "healthy": self.healthy,
+        }
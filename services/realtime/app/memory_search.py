@@ -0,0 +1,139 @@
+"""Time-decayed top-k search over a user's memories.
+
+A memory scores cosine(query, embedding) x relevance_score x exp(-decay x age_days).
+Cosine is at most 1 and relevance is bounded by the user's maximum, so a memory of age a
+can never score above `max_relevance x exp(-decay x a)`. That bound only shrinks with age.
+
+`search_time_decay` walks memories newest-first in blocks, using keyset pagination on the
+(user, -timestamp) index, and keeps a running top-k. Every memory not yet fetched is older
+than the last one seen, so once the k-th best score reaches the bound at the cursor, no
+remaining memory can enter the top k and the walk stops. The results are the same as a
+full scan's (`exhaustive_search`); typical queries touch only a recent window.
+"""
+import heapq
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+Timestamp = Union[str, datetime]
+SEARCH_MODES = ("early", "exhaustive", "quantized", "sharded", "lexical", "hybrid", "auto")
+
+
+def parse_timestamp(value: Timestamp) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def age_days(timestamps: Sequence[Timestamp], now: datetime) -> np.ndarray:
+    return np.array([(now - parse_timestamp(t)).total_seconds() for t in timestamps]) / 86400.0
+
+
+def cosine_scores(query: np.ndarray, memories: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, List[int]]:
+    """Cosine similarity for the memories that have embeddings, and their positions."""
+    keep = [i for i, m in enumerate(memories)
+            if m.get("vector_embedding") is not None and len(m["vector_embedding"])]
+    if not keep:
+        return np.zeros(0), keep
+    vectors = np.asarray([memories[i]["vector_embedding"] for i in keep], dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    return np.divide(vectors @ query, norms, out=np.zeros(len(keep)), where=norms > 0), keep
+
+
+def score_block(query: np.ndarray, memories: Sequence[Dict[str, Any]], decay_rate: float,
+                now: datetime) -> Tuple[np.ndarray, List[int]]:
+    """Scores for the memories in a block that have embeddings, and their positions."""
+    cosine, keep = cosine_scores(query, memories)
+    if not keep:
+        return cosine, keep
+    relevance = np.array([memories[i]["relevance_score"] for i in keep], dtype=np.float64)
+    ages = age_days([memories[i]["timestamp"] for i in keep], now)
+    return cosine * relevance * np.exp(-decay_rate * ages), keep
+
+
+class TopK:
+    """Running top-k; ties keep the earlier (newer) memory, matching a stable sort."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []  # (score, -order, memory)
+        self._order = 0
+
+    def push(self, score: float, memory: Dict[str, Any]) -> None:
+        entry = (score, -self._order, memory)
+        self._order += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    @property
+    def full(self) -> bool:
+        return len(self._heap) >= self.k
+
+    @property
+    def threshold(self) -> float:
+        return self._heap[0][0] if self.full else -math.inf
+
+    def results(self) -> List[Tuple[float, Dict[str, Any]]]:
+        return [(score, memory) for score, _, memory in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+@dataclass
+class SearchStats:
+    scanned: int = 0
+    blocks: int = 0
+    terminated_early: bool = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+async def search_time_decay(
+    store,
+    user_id: int,
+    query: np.ndarray,
+    k: int,
+    decay_rate: float,
+    block_size: int = 64,
+    now: Optional[datetime] = None,
+    relevance_bound: Optional[float] = None
+) -> Tuple[List[Tuple[float, Dict[str, Any]]], SearchStats]:
+    """Top-k (score, memory) pairs by walking newest-first and stopping on the decay bound."""
+    now = now or datetime.now(timezone.utc)
+    if relevance_bound is None:
+        relevance_bound = await store.max_relevance(user_id)
+    top, stats, cursor = TopK(k), SearchStats(), None
+    while True:
+        block = await store.fetch_block(user_id, cursor, block_size)
+        stats.blocks += 1
+        stats.scanned += len(block)
+        scores, keep = score_block(query, block, decay_rate, now)
+        for score, i in zip(scores, keep):
+            top.push(float(score), block[i])
+        if len(block) < block_size:
+            break
+        last = block[-1]
+        cursor = (last["timestamp"], last["id"])
+        oldest_age = age_days([last["timestamp"]], now)[0]
+        if top.full and top.threshold >= relevance_bound * math.exp(-decay_rate * max(0.0, oldest_age)):
+            stats.terminated_early = True
+            break
+    return top.results(), stats
+
+
+def exhaustive_search(
+    memories: Sequence[Dict[str, Any]],
+    query: np.ndarray,
+    k: int,
+    decay_rate: float,
+    now: Optional[datetime] = None
+) -> List[Tuple[float, Dict[str, Any]]]:
+    """Reference full scan: score every memory and take the k best."""
+    now = now or datetime.now(timezone.utc)
+    scores, keep = score_block(query, memories, decay_rate, now)
+    ranked = sorted(zip(scores.tolist(), keep), key=lambda pair: pair[0], reverse=True)
+    return [(score, memories[i]) for score, i in ranked[:k]]
@@ -0,0 +1,444 @@
+"""Data access for conversation memories.
+
+MemoryService reads and writes the Django-owned `api_memory` table through a store:
+
+* `HttpMemoryStore` (default) goes through the Django REST API.
+* `PostgresMemoryStore` talks to the same table directly through an asyncpg connection
+  pool. It skips DRF serialization and the JSON round trip on both sides. Queries have
+  fixed text, so asyncpg prepares each one once per connection and reuses it. Searches
+  select only the columns scoring needs. Embeddings are read as jsonb text and parsed
+  straight into float32 arrays.
+
+Writes through the Postgres backend append to Django's MemoryChange journal in the same
+statement, since model signals never see them.
+
+Select the backend with MEMORY_BACKEND=http|postgres. asyncpg is imported only when
+the Postgres backend is used.
+"""
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import httpx
+import numpy as np
+
+TABLE = "api_memory"
+JOURNAL = "api_memorychange"  # Django's MemoryChange feed; direct writes must append to it too
+
+
+def parse_vector(text: Optional[str]) -> Optional[np.ndarray]:
+    """Parse a jsonb array literal ("[0.1, 0.2, ...]") into float32 without building a list."""
+    if not text or text == "null":
+        return None
+    return np.fromstring(text.strip()[1:-1], sep=",", dtype=np.float32)
+
+
+class MemoryStore(Protocol):
+    async def insert(self, user_id: int, message: str, role: str, context: Dict[str, Any],
+                     embedding: List[float], relevance_score: float = 1.0,
+                     reduced_embedding: Optional[List[float]] = None, projection_version: str = "") -> Dict[str, Any]:
+        ...
+
+    async def fetch_for_search(self, user_id: int) -> List[Dict[str, Any]]:
+        ...
+
+    async def fetch_block(self, user_id: int, before: Optional[Tuple[Any, int]], limit: int,
+                          projection_version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Up to `limit` memories strictly older than the (timestamp, id) cursor, newest first.
+
+        With `projection_version`, rows also carry `reduced_embedding` and `projection_version`
+        (a backend may then omit the full vector of rows projected with that version).
+        """
+        ...
+
+    async def max_relevance(self, user_id: int) -> float:
+        ...
+
+    async def fetch_by_ids(self, user_id: int, ids: List[int]) -> List[Dict[str, Any]]:
+        ...
+
+    async def touch(self, user_id: int, memory_id: int, relevance_bump: float) -> Dict[str, Any]:
+        """Reinforce a memory: raise relevance_score (capped at 1.0) and set its timestamp to now."""
+        ...
+
+    async def latest_summary(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """The newest rolling summary memory (role "system", context kind "summary"), if any."""
+        ...
+
+    async def fetch_unprojected(self, version: Optional[str], after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """{id, vector_embedding} of memories (all users) with id > after_id not projected with `version`; None means any."""
+        ...
+
+    async def set_reduced(self, version: str, rows: List[Tuple[int, List[float]]]) -> int:
+        ...
+
+    async def reinforce_many(self, rows: List[Dict[str, Any]], half_life_days: float) -> List[Dict[str, Any]]:
+        """Apply buffered retrievals [{id, count, delta}]; returns [{id, user_id, relevance_score}].
+
+        Stored reinforcement decays (with `half_life_days`) to now before `delta` is added,
+        and relevance_score stays within [0, 1] (see api.reinforcement in the Django app).
+        """
+        ...
+
+    async def fetch_changes(self, after: Optional[int], limit: int = 500) -> Tuple[int, List[Dict[str, Any]]]:
+        """(latest seq, journal entries with seq > after, oldest first); after=None returns no entries."""
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class HttpMemoryStore:
+    """Memories via the Django REST API."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    async def insert(self, user_id, message, role, context, embedding, relevance_score=1.0,
+                     reduced_embedding=None, projection_version=""):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.base_url}/api/v1/memories/",
+                json={
+                    "user": user_id,
+                    "message": message,
+                    "role": role,
+                    "context": context,
+                    "vector_embedding": embedding,
+                    "relevance_score": relevance_score,
+                    "reduced_embedding": reduced_embedding,
+                    "projection_version": projection_version
+                }
+            )
+            return response.json()
+
+    async def fetch_for_search(self, user_id):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{self.base_url}/api/v1/memories/", params={"user": user_id})
+            return response.json()
+
+    async def fetch_block(self, user_id, before, limit, projection_version=None):
+        # The API always returns both embeddings and the projection version
+        params = {"user": user_id, "limit": limit}
+        if before is not None:
+            timestamp, memory_id = before
+            params.update(before=str(timestamp), before_id=memory_id)
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{self.base_url}/api/v1/memories/", params=params)
+            return response.json()
+
+    async def max_relevance(self, user_id):
+        # The API has no aggregate; MemorySerializer and every writer keep relevance_score within [0, 1]
+        return 1.0
+
+    async def fetch_by_ids(self, user_id, ids):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{self.base_url}/api/v1/memories/",
+                params={"user": user_id, "ids": ",".join(map(str, ids))}
+            )
+            return response.json()
+
+    async def touch(self, user_id, memory_id, relevance_bump):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.base_url}/api/v1/memories/{memory_id}/reinforce/",
+                json={"bump": relevance_bump, "user": user_id},
+                headers={"X-Service-Token": os.getenv("MEMORY_FEED_TOKEN", "")}
+            )
+            response.raise_for_status()
+            return response.json()
+
+    async def latest_summary(self, user_id):
+        # Summaries are the only system memories in practice; filter the kind client-side
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{self.base_url}/api/v1/memories/", params={"user": user_id, "role": "system", "limit": 20}
+            )
+            rows = response.json()
+        summaries = [row for row in rows if (row.get("context") or {}).get("kind") == "summary"]
+        return max(summaries, key=lambda row: row["id"], default=None)
+
+    async def fetch_unprojected(self, version, after_id, limit):
+        params = {"after_id": after_id, "limit": limit}
+        if version is not None:
+            params["stale_for"] = version
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{self.base_url}/api/v1/memory-projections/",
+                params=params,
+                headers={"X-Service-Token": os.getenv("MEMORY_FEED_TOKEN", "")}
+            )
+            response.raise_for_status()
+            return response.json()["rows"]
+
+    async def set_reduced(self, version, rows):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.base_url}/api/v1/memory-projections/",
+                json={"version": version, "rows": [{"id": i, "reduced_embedding": v} for i, v in rows]},
+                headers={"X-Service-Token": os.getenv("MEMORY_FEED_TOKEN", "")}
+            )
+            response.raise_for_status()
+            return response.json()["updated"]
+
+    async def reinforce_many(self, rows, half_life_days):
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.base_url}/api/v1/memory-reinforcements/",
+                json={"half_life_days": half_life_days, "rows": rows},
+                headers={"X-Service-Token": os.getenv("MEMORY_FEED_TOKEN", "")}
+            )
+            response.raise_for_status()
+            return response.json()["updated"]
+
+    async def fetch_changes(self, after, limit=500):
+        params = {"limit": limit} if after is None else {"after": after, "limit": limit}
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{self.base_url}/api/v1/memory-changes/",
+                params=params,
+                headers={"X-Service-Token": os.getenv("MEMORY_FEED_TOKEN", "")}
+            )
+            response.raise_for_status()
+            body = response.json()
+            return body["latest_seq"], body["changes"]
+
+    async def close(self):
+        pass
+
+
+class PostgresMemoryStore:
+    """Memories straight from Postgres through a lazily created asyncpg pool."""
+
+    # Writes journal themselves in the same statement, since Django's signals never see them
+    INSERT = (
+        f"WITH m AS (INSERT INTO {TABLE} (user_id, message, role, context, vector_embedding, relevance_score, "
+        "reduced_embedding, projection_version, timestamp) "
+        "VALUES ($1, $2, $3, $4::jsonb, $5::jsonb, $6, $7::jsonb, $8, now()) RETURNING id, user_id, timestamp), "
+        f"j AS (INSERT INTO {JOURNAL} (user_id, memory_id, op, created_at) SELECT user_id, id, 'upsert', now() FROM m) "
+        "SELECT id, timestamp FROM m"
+    )
+    SEARCH = (
+        "SELECT id, message, role, vector_embedding::text AS vector_embedding, relevance_score, timestamp "
+        f"FROM {TABLE} WHERE user_id = $1 AND vector_embedding IS NOT NULL ORDER BY timestamp DESC"
+    )
+    # Keyset pages over the (user_id, timestamp DESC) index; id breaks timestamp ties
+    BLOCK = (
+        "SELECT id, message, role, vector_embedding::text AS vector_embedding, relevance_score, timestamp "
+        f"FROM {TABLE} WHERE user_id = $1 AND vector_embedding IS NOT NULL "
+        "ORDER BY timestamp DESC, id DESC LIMIT $2"
+    )
+    BLOCK_AFTER = (
+        "SELECT id, message, role, vector_embedding::text AS vector_embedding, relevance_score, timestamp "
+        f"FROM {TABLE} WHERE user_id = $1 AND vector_embedding IS NOT NULL AND (timestamp, id) < ($2, $3) "
+        "ORDER BY timestamp DESC, id DESC LIMIT $4"
+    )
+    # Reduced reads ship one vector per row: the stored reduced one when it was made with
+    # the requested version ($N), otherwise the full one for the service to project
+    BLOCK_REDUCED = (
+        "SELECT id, message, role, relevance_score, timestamp, projection_version, "
+        "CASE WHEN projection_version = $3 THEN reduced_embedding::text END AS reduced_embedding, "
+        "CASE WHEN projection_version <> $3 THEN vector_embedding::text END AS vector_embedding "
+        f"FROM {TABLE} WHERE user_id = $1 AND vector_embedding IS NOT NULL "
+        "ORDER BY timestamp DESC, id DESC LIMIT $2"
+    )
+    BLOCK_REDUCED_AFTER = (
+        "SELECT id, message, role, relevance_score, timestamp, projection_version, "
+        "CASE WHEN projection_version = $5 THEN reduced_embedding::text END AS reduced_embedding, "
+        "CASE WHEN projection_version <> $5 THEN vector_embedding::text END AS vector_embedding "
+        f"FROM {TABLE} WHERE user_id = $1 AND vector_embedding IS NOT NULL AND (timestamp, id) < ($2, $3) "
+        "ORDER BY timestamp DESC, id DESC LIMIT $4"
+    )
+    BY_IDS = (
+        "SELECT id, message, role, vector_embedding::text AS vector_embedding, relevance_score, timestamp "
+        f"FROM {TABLE} WHERE user_id = $1 AND id = ANY($2::bigint[])"
+    )
+    TOUCH = (
+        f"WITH m AS (UPDATE {TABLE} SET relevance_score = LEAST(1.0, relevance_score + $3), timestamp = now() "
+        "WHERE user_id = $1 AND id = $2 RETURNING id, user_id, relevance_score, timestamp), "
+        f"j AS (INSERT INTO {JOURNAL} (user_id, memory_id, op, created_at) SELECT user_id, id, 'upsert', now() FROM m) "
+        "SELECT id, relevance_score, timestamp FROM m"
+    )
+    # Reinforcement moves timestamps, so the newest summary is the highest id
+    LATEST_SUMMARY = (
+        "SELECT id, message, role, context, relevance_score, timestamp "
+        f"FROM {TABLE} WHERE user_id = $1 AND role = 'system' AND context->>'kind' = 'summary' "
+        "ORDER BY id DESC LIMIT 1"
+    )
+    UNPROJECTED = (
+        f"SELECT id, vector_embedding::text AS vector_embedding FROM {TABLE} "
+        "WHERE id > $1 AND vector_embedding IS NOT NULL AND projection_version <> $2 ORDER BY id LIMIT $3"
+    )
+    ALL_EMBEDDINGS = (
+        f"SELECT id, vector_embedding::text AS vector_embedding FROM {TABLE} "
+        "WHERE id > $1 AND vector_embedding IS NOT NULL ORDER BY id LIMIT $2"
+    )
+    # Derived data only: not journaled, resident indexes never read reduced embeddings
+    SET_REDUCED = (
+        f"UPDATE {TABLE} AS m SET reduced_embedding = u.reduced::jsonb, projection_version = $1 "
+        "FROM unnest($2::bigint[], $3::text[]) AS u(id, reduced) WHERE m.id = u.id"
+    )
+    # Same arithmetic as api.reinforcement.apply: relevance_score = base + decaying reinforcement
+    REINFORCE = (
+        "WITH s AS (SELECT m.id, u.n, m.relevance_score - m.reinforcement AS base, "
+        "LEAST(1.0, GREATEST(0.0, m.relevance_score - m.reinforcement + u.delta + CASE WHEN m.reinforced_at IS NULL "
+        "THEN 0.0 ELSE m.reinforcement * exp(-$4 * GREATEST(0.0, extract(epoch FROM now() - m.reinforced_at)::float8)"
+        " / 86400.0) END)) AS relevance "
+        f"FROM {TABLE} AS m JOIN unnest($1::bigint[], $2::int[], $3::float8[]) AS u(id, n, delta) ON m.id = u.id), "
+        f"m AS (UPDATE {TABLE} AS t SET relevance_score = s.relevance, reinforcement = s.relevance - s.base, "
+        "reinforced_at = now(), access_count = t.access_count + s.n FROM s WHERE t.id = s.id "
+        "RETURNING t.id, t.user_id, t.relevance_score), "
+        f"j AS (INSERT INTO {JOURNAL} (user_id, memory_id, op, created_at) SELECT user_id, id, 'upsert', now() FROM m) "
+        "SELECT id, user_id, relevance_score FROM m"
+    )
+    CHANGES = (
+        f"SELECT seq, user_id, memory_id, op, created_at FROM {JOURNAL} WHERE seq > $1 ORDER BY seq LIMIT $2"
+    )
+    LATEST_CHANGE = f"SELECT coalesce(max(seq), 0) FROM {JOURNAL}"
+    MAX_RELEVANCE = f"SELECT coalesce(max(relevance_score), 0) FROM {TABLE} WHERE user_id = $1"
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    @classmethod
+    def from_env(cls) -> "PostgresMemoryStore":
+        dsn = os.getenv("MEMORY_DATABASE_URL") or "postgresql://{user}:{password}@{host}:{port}/{db}".format(
+            user=os.getenv("POSTGRES_USER", "postgres"),
+            password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+            host=os.getenv("POSTGRES_HOST", "localhost"),
+            port=os.getenv("POSTGRES_PORT", "5432"),
+            db=os.getenv("POSTGRES_DB", "chaos_contained"),
+        )
+        return cls(dsn, int(os.getenv("MEMORY_POOL_MIN", "1")), int(os.getenv("MEMORY_POOL_MAX", "10")))
+
+    async def pool(self):
+        if self._pool is None:
+            try:
+                import asyncpg
+            except ImportError as e:
+                raise RuntimeError("MEMORY_BACKEND=postgres requires the asyncpg package") from e
+            self._pool = await asyncpg.create_pool(
+                self.dsn, min_size=self.min_size, max_size=self.max_size, init=self._init_connection
+            )
+        return self._pool
+
+    @staticmethod
+    async def _init_connection(conn) -> None:
+        await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+    async def insert(self, user_id, message, role, context, embedding, relevance_score=1.0,
+                     reduced_embedding=None, projection_version=""):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(self.INSERT, user_id, message, role, context, embedding, relevance_score,
+                                      reduced_embedding, projection_version)
+        return {
+            "id": row["id"],
+            "user": user_id,
+            "message": message,
+            "role": role,
+            "context": context,
+            "vector_embedding": embedding,
+            "relevance_score": relevance_score,
+            "reduced_embedding": reduced_embedding,
+            "projection_version": projection_version,
+            "timestamp": row["timestamp"].isoformat(),
+        }
+
+    async def fetch_for_search(self, user_id):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(self.SEARCH, user_id)
+        return [{**dict(row), "vector_embedding": parse_vector(row["vector_embedding"])} for row in rows]
+
+    async def fetch_block(self, user_id, before, limit, projection_version=None):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            if projection_version is not None:
+                if before is None:
+                    rows = await conn.fetch(self.BLOCK_REDUCED, user_id, limit, projection_version)
+                else:
+                    rows = await conn.fetch(self.BLOCK_REDUCED_AFTER, user_id, before[0], before[1], limit,
+                                            projection_version)
+                return [{**dict(row), "vector_embedding": parse_vector(row["vector_embedding"]),
+                         "reduced_embedding": parse_vector(row["reduced_embedding"])} for row in rows]
+            if before is None:
+                rows = await conn.fetch(self.BLOCK, user_id, limit)
+            else:
+                rows = await conn.fetch(self.BLOCK_AFTER, user_id, before[0], before[1], limit)
+        return [{**dict(row), "vector_embedding": parse_vector(row["vector_embedding"])} for row in rows]
+
+    async def max_relevance(self, user_id):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            return float(await conn.fetchval(self.MAX_RELEVANCE, user_id))
+
+    async def fetch_by_ids(self, user_id, ids):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(self.BY_IDS, user_id, ids)
+        return [{**dict(row), "vector_embedding": parse_vector(row["vector_embedding"])} for row in rows]
+
+    async def touch(self, user_id, memory_id, relevance_bump):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(self.TOUCH, user_id, memory_id, relevance_bump)
+        return {**dict(row), "timestamp": row["timestamp"].isoformat()}
+
+    async def latest_summary(self, user_id):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(self.LATEST_SUMMARY, user_id)
+        return None if row is None else {**dict(row), "timestamp": row["timestamp"].isoformat()}
+
+    async def fetch_unprojected(self, version, after_id, limit):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            if version is None:
+                rows = await conn.fetch(self.ALL_EMBEDDINGS, after_id, limit)
+            else:
+                rows = await conn.fetch(self.UNPROJECTED, after_id, version, limit)
+        return [{"id": row["id"], "vector_embedding": parse_vector(row["vector_embedding"])} for row in rows]
+
+    async def set_reduced(self, version, rows):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            status = await conn.execute(
+                self.SET_REDUCED, version, [i for i, _ in rows], [json.dumps(v) for _, v in rows]
+            )
+        return int(status.split()[-1])
+
+    async def reinforce_many(self, rows, half_life_days):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            updated = await conn.fetch(
+                self.REINFORCE, [r["id"] for r in rows], [r["count"] for r in rows], [r["delta"] for r in rows],
+                math.log(2) / half_life_days
+            )
+        return [dict(row) for row in updated]
+
+    async def fetch_changes(self, after, limit=500):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            latest = await conn.fetchval(self.LATEST_CHANGE)
+            rows = [] if after is None else await conn.fetch(self.CHANGES, after, limit)
+        return latest, [dict(row) for row in rows]
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def create_memory_store(django_api_url: str, backend: Optional[str] = None) -> MemoryStore:
+    backend = backend or os.getenv("MEMORY_BACKEND", "http")
+    if backend == "postgres":
+        return PostgresMemoryStore.from_env()
+    if backend == "http":
+        return HttpMemoryStore(django_api_url)
+    raise ValueError(f"Unknown MEMORY_BACKEND '{backend}' (expected 'http' or 'postgres')")
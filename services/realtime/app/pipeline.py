@@ -0,0 +1,164 @@
+"""Stage graph for voice completion.
+
+Completing an utterance needs several model or LLM calls: transcript finalization, audio
+features, emotion, intent, memory lookup and suggested actions. Run one after another,
+their latencies add up. `StageGraph` instead starts every stage as soon as the stages it
+depends on have finished, bounds each one with a deadline, and reports each result as it
+lands. End-to-end latency then follows the critical path, and a slow optional stage
+degrades to its default instead of holding up the response.
+
+    transcript ──┬──> emotion ─────────────┐
+    features ────┘                         │
+    transcript ──┬──> intent ──────────────┼──> actions
+                 └──> memories ────────────┘
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+ResultCallback = Callable[["StageResult"], Awaitable[None]]
+
+
+class PipelineError(RuntimeError):
+    """Raised when a required stage fails or the graph is malformed."""
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One node: `fn` receives the shared context updated with its dependencies' results."""
+
+    name: str
+    fn: StageFn
+    deps: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    default: Any = None
+    required: bool = False
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # ok | timeout | error | skipped
+    value: Any
+    started_ms: float
+    finished_ms: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "status": self.status,
+            "result": self.value,
+            "started_ms": round(self.started_ms, 2),
+            "elapsed_ms": round(self.finished_ms - self.started_ms, 2),
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+@dataclass
+class PipelineRun:
+    results: Dict[str, StageResult] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+    def value(self, name: str) -> Any:
+        return self.results[name].value
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {k: v for k, v in r.as_dict().items() if k not in ("stage", "result")}
+                for name, r in self.results.items()}
+
+
+class StageGraph:
+    """Dependency-ordered, concurrently executed stages with per-stage deadlines."""
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise PipelineError("Stage names must be unique")
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise PipelineError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise PipelineError(f"Cycle through stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def critical_path(self, run: PipelineRun) -> List[str]:
+        """The chain of stages that determined when the last one finished."""
+        if not run.results:
+            return []
+        name = max(run.results, key=lambda n: run.results[n].finished_ms)
+        path = [name]
+        while self.stages[name].deps:
+            name = max(self.stages[name].deps, key=lambda n: run.results[n].finished_ms)
+            path.append(name)
+        return list(reversed(path))
+
+    async def run(self, context: Optional[Dict[str, Any]] = None,
+                  on_result: Optional[ResultCallback] = None) -> PipelineRun:
+        context = dict(context or {})
+        run = PipelineRun()
+        origin = time.perf_counter()
+        futures: Dict[str, asyncio.Task] = {}
+
+        def elapsed_ms() -> float:
+            return (time.perf_counter() - origin) * 1000
+
+        async def execute(stage: Stage) -> StageResult:
+            deps = [await futures[dep] for dep in stage.deps]
+            started = elapsed_ms()
+            failed = [d.name for d in deps if not d.ok and self.stages[d.name].required]
+            if failed:
+                result = StageResult(stage.name, "skipped", stage.default, started, started,
+                                     error=f"required stage failed: {', '.join(failed)}")
+            else:
+                inputs = {**context, **{d.name: d.value for d in deps}}
+                try:
+                    value = await asyncio.wait_for(stage.fn(inputs), stage.timeout)
+                    result = StageResult(stage.name, "ok", value, started, elapsed_ms())
+                except asyncio.TimeoutError:
+                    result = StageResult(stage.name, "timeout", stage.default, started, elapsed_ms(),
+                                         error=f"exceeded {stage.timeout}s")
+                except Exception as e:
+                    result = StageResult(stage.name, "error", stage.default, started, elapsed_ms(), error=str(e))
+            run.results[stage.name] = result
+            if on_result is not None:
+                await on_result(result)
+            return result
+
+        for name in self.order:  # Dependencies are created first so every lookup resolves
+            futures[name] = asyncio.create_task(execute(self.stages[name]))
+        try:
+            await asyncio.gather(*futures.values())
+        finally:
+            for task in futures.values():
+                task.cancel()
+        run.total_ms = elapsed_ms()
+
+        for name, result in run.results.items():
+            if self.stages[name].required and not result.ok:
+                raise PipelineError(f"Required stage '{name}' {result.status}: {result.error}")
+        return run
@@ -0,0 +1,273 @@
+"""Optional dimensionality reduction for memory embeddings.
+
+Scoring 1536-dim ada-002 vectors dominates per-query compute and row size. A `Projection`
+maps embeddings to fewer dimensions in one of two ways:
+- "pca": a matrix fitted to a sample of this deployment's embeddings. It is uncentred
+  (the top right singular vectors), so inner products are what is preserved.
+- "truncate": keeps the leading dimensions, for Matryoshka-trained models such as the
+  text-embedding-3 family.
+
+Projections are immutable and versioned: `ProjectionRegistry` keeps one `<version>.npz`
+per version under MEMORY_PROJECTION_DIR, and MEMORY_PROJECTION names the active version.
+Memories carry `reduced_embedding` and the `projection_version` it was made with:
+- New memories are projected at ingest.
+- `Reprojector` backfills existing rows in batches after a version change.
+- Until then, `ProjectedStore` projects stale rows on the fly, so a version change never
+  drops memories from results.
+
+    python -m app.projection fit --version pca256-v1 --dims 256 --sample 20000
+    python -m app.projection truncate --version trunc512 --dims 512
+    python -m app.projection reproject
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .quantization import normalize
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_KINDS = ("pca", "truncate")
+SEARCH_PRECISIONS = ("full", "reduced", "rerank")
+
+
+class Projection:
+    def __init__(self, version: str, kind: str, dim_in: int, dim_out: int,
+                 components: Optional[np.ndarray] = None, retained: Optional[float] = None):
+        if kind not in PROJECTION_KINDS:
+            raise ValueError(f"unknown projection kind '{kind}'")
+        self.version = version
+        self.kind = kind
+        self.dim_in = dim_in
+        self.dim_out = dim_out
+        self.components = components  # (dim_out, dim_in) for pca
+        self.retained = retained  # share of the sample's energy kept, for pca
+
+    @classmethod
+    def fit_pca(cls, version: str, vectors: np.ndarray, dim_out: int) -> "Projection":
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        if dim_out >= vectors.shape[1]:
+            raise ValueError(f"cannot reduce {vectors.shape[1]} dimensions to {dim_out}")
+        _, singular, vt = np.linalg.svd(vectors, full_matrices=False)
+        energy = singular ** 2
+        return cls(version, "pca", vectors.shape[1], dim_out, vt[:dim_out].astype(np.float32),
+                   float(energy[:dim_out].sum() / energy.sum()))
+
+    @classmethod
+    def truncate(cls, version: str, dim_in: int, dim_out: int) -> "Projection":
+        return cls(version, "truncate", dim_in, dim_out)
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        """Project rows of `vectors` (or a single vector) and re-normalise."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.dim_in:
+            raise ValueError(f"projection {self.version} expects {self.dim_in} dimensions, got {vectors.shape[-1]}")
+        if self.kind == "truncate":
+            return normalize(vectors[..., :self.dim_out])
+        return normalize(normalize(vectors) @ self.components.T)
+
+    def save(self, path: str) -> None:
+        arrays = {"kind": np.array(self.kind), "dim_in": np.array(self.dim_in), "dim_out": np.array(self.dim_out)}
+        if self.components is not None:
+            arrays.update(components=self.components, retained=np.array(self.retained))
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, version: str, path: str) -> "Projection":
+        with np.load(path) as data:
+            return cls(version, str(data["kind"]), int(data["dim_in"]), int(data["dim_out"]),
+                       data["components"] if "components" in data else None,
+                       float(data["retained"]) if "retained" in data else None)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"version": self.version, "kind": self.kind, "dim_in": self.dim_in,
+                "dim_out": self.dim_out, "retained": self.retained}
+
+
+class ProjectionRegistry:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @classmethod
+    def from_env(cls) -> "ProjectionRegistry":
+        return cls(os.getenv("MEMORY_PROJECTION_DIR", "projections"))
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.directory, f"{version}.npz")
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".npz"))
+
+    def save(self, projection: Projection) -> str:
+        """Store a new version; versions are never overwritten, since stored rows reference them."""
+        path = self.path(projection.version)
+        if os.path.exists(path):
+            raise FileExistsError(f"projection version '{projection.version}' already exists")
+        os.makedirs(self.directory, exist_ok=True)
+        projection.save(path)
+        return path
+
+    def load(self, version: str) -> Projection:
+        return Projection.load(version, self.path(version))
+
+    def active(self) -> Optional[Projection]:
+        version = os.getenv("MEMORY_PROJECTION")
+        return self.load(version) if version else None
+
+
+class ProjectedStore:
+    """Store view whose rows carry reduced embeddings in `vector_embedding`.
+
+    Rows already projected with the current version use the stored reduced vector. Others
+    are projected here, so search works before the re-projection job has finished.
+    """
+
+    def __init__(self, store, projection: Projection):
+        self.store = store
+        self.projection = projection
+        self.projected_on_the_fly = 0
+
+    def reduce(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        reduced, stale = [], []
+        for row in rows:
+            if row.get("projection_version") == self.projection.version and row.get("reduced_embedding") is not None:
+                reduced.append({**row, "vector_embedding": np.asarray(row["reduced_embedding"], dtype=np.float32)})
+            elif row.get("vector_embedding") is not None and len(row["vector_embedding"]):
+                stale.append(row)
+            else:
+                # Keep unscorable rows: a short block would end the caller's keyset walk
+                reduced.append(row)
+        if stale:
+            vectors = self.projection.apply(np.stack([np.asarray(row["vector_embedding"]) for row in stale]))
+            reduced.extend({**row, "vector_embedding": vector} for row, vector in zip(stale, vectors))
+            self.projected_on_the_fly += len(stale)
+            # Keep the caller's (timestamp, id) order for keyset paging
+            order = {row["id"]: i for i, row in enumerate(rows)}
+            reduced.sort(key=lambda row: order[row["id"]])
+        return reduced
+
+    async def fetch_block(self, user_id, before, limit):
+        return self.reduce(await self.store.fetch_block(user_id, before, limit,
+                                                        projection_version=self.projection.version))
+
+    async def max_relevance(self, user_id):
+        return await self.store.max_relevance(user_id)
+
+
+class Reprojector:
+    """Backfill `reduced_embedding` for rows not yet projected with the active version."""
+
+    def __init__(self, store, projection: Projection, batch_size: int = 500, interval_s: float = 60.0):
+        self.store = store
+        self.projection = projection
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self.after_id = 0
+        self.projected = 0
+        self.finished_at: Optional[float] = None
+
+    async def run_once(self) -> int:
+        """Project one batch; returns how many rows were read (0 once caught up).
+
+        Rows without a usable embedding are read and skipped, so a batch of them still
+        advances the cursor; `projected` counts the rows actually written.
+        """
+        batch = await self.store.fetch_unprojected(self.projection.version, self.after_id, self.batch_size)
+        if not batch:
+            return 0
+        rows = [row for row in batch if row["vector_embedding"] is not None and len(row["vector_embedding"])]
+        usable = [row for row in rows if len(row["vector_embedding"]) == self.projection.dim_in]
+        if usable:
+            vectors = self.projection.apply(np.stack([np.asarray(row["vector_embedding"]) for row in usable]))
+            await self.store.set_reduced(
+                self.projection.version,
+                [(row["id"], vector.round(6).tolist()) for row, vector in zip(usable, vectors)]
+            )
+        if len(usable) < len(rows):
+            logger.warning("skipped %d memories whose embeddings are not %d-dimensional",
+                           len(rows) - len(usable), self.projection.dim_in)
+        self.after_id = max(row["id"] for row in batch)
+        self.projected += len(usable)
+        return len(batch)
+
+    async def run(self) -> None:
+        """Backfill until caught up, then pick up stragglers (e.g. rows inserted over HTTP) each interval."""
+        while True:
+            try:
+                read = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("memory re-projection batch failed")
+                read = 0
+            if read == 0:
+                self.finished_at = self.finished_at or time.time()
+                self.after_id = 0
+                await asyncio.sleep(self.interval_s)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self.projection.version, "projected": self.projected, "after_id": self.after_id,
+                "caught_up": self.finished_at is not None}
+
+
+async def _sample(store, limit: int) -> np.ndarray:
+    vectors, after_id = [], 0
+    while len(vectors) < limit:
+        rows = await store.fetch_unprojected(None, after_id, min(5000, limit - len(vectors)))
+        if not rows:
+            break
+        vectors.extend(row["vector_embedding"] for row in rows if row["vector_embedding"] is not None)
+        after_id = rows[-1]["id"]
+    return np.asarray(vectors, dtype=np.float32)
+
+
+async def _main(args) -> None:
+    from .memory_store import create_memory_store
+
+    registry = ProjectionRegistry.from_env()
+    store = create_memory_store(os.getenv("DJANGO_API_URL", "http://localhost:8000"))
+    try:
+        if args.command == "fit":
+            sample = await _sample(store, args.sample)
+            projection = Projection.fit_pca(args.version, sample, args.dims)
+            print(registry.save(projection), projection.describe())
+        elif args.command == "truncate":
+            projection = Projection.truncate(args.version, args.dim_in, args.dims)
+            print(registry.save(projection), projection.describe())
+        else:
+            projection = registry.active()
+            if projection is None:
+                raise SystemExit("set MEMORY_PROJECTION to the version to backfill")
+            job = Reprojector(store, projection, batch_size=args.batch)
+            while await job.run_once():
+                pass
+            print(job.stats())
+    finally:
+        await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    fit = commands.add_parser("fit", help="fit a PCA projection to a sample of stored embeddings")
+    fit.add_argument("--version", required=True)
+    fit.add_argument("--dims", type=int, required=True)
+    fit.add_argument("--sample", type=int, default=20000)
+    truncate = commands.add_parser("truncate", help="register a truncation (Matryoshka models)")
+    truncate.add_argument("--version", required=True)
+    truncate.add_argument("--dims", type=int, required=True)
+    truncate.add_argument("--dim-in", type=int, default=1536)
+    reproject = commands.add_parser("reproject", help="backfill the active version once, then exit")
+    reproject.add_argument("--batch", type=int, default=500)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
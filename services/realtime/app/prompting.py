@@ -0,0 +1,142 @@
+"""Token-budgeted prompt assembly for chat turns.
+
+Unbounded history makes every /ai/respond/ turn pay for dozens of past messages.
+`PromptPacker` fills a fixed token budget in priority order: the rolling summary first,
+then retrieved memories by rank, then the most recent turns, newest first. Whatever fits
+is emitted as system context, the recent turns chronologically, then the user's message.
+The system prompt and the user's message are always included.
+
+Token counts come from tiktoken when it is installed (loaded once through the provider
+registry) and are memoised per text, since the same memories and summary are counted on
+every turn. Without tiktoken a word/punctuation estimate is used.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .providers import providers
+
+MESSAGE_OVERHEAD = 4  # role and separators per chat message (OpenAI cl100k chat format)
+_ROUGH_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def _tokenizer():
+    import tiktoken
+
+    return tiktoken.get_encoding(os.getenv("TOKENIZER_ENCODING", "cl100k_base"))
+
+
+providers.register("tokenizer", _tokenizer)
+
+
+class TokenCounter:
+    def __init__(self, cache_size: int = 8192):
+        self._encoder = None
+        self._loaded = False
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if not self._loaded:
+            try:
+                self._encoder = providers.get("tokenizer")
+            except ImportError:
+                self._encoder = None
+            self._loaded = True
+        if self._encoder is not None:
+            return len(self._encoder.encode(text))
+        return len(_ROUGH_TOKEN.findall(text))
+
+    def message(self, content: str) -> int:
+        return self.count(content) + MESSAGE_OVERHEAD
+
+
+token_counter = TokenCounter()
+
+
+@dataclass
+class PackedPrompt:
+    messages: List[Dict[str, str]]
+    tokens: int
+    budget: int
+    candidate_tokens: int  # what the prompt would cost with every candidate included
+    included: Dict[str, int] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+    def report(self) -> Dict[str, object]:
+        return {"tokens": self.tokens, "budget": self.budget, "candidate_tokens": self.candidate_tokens,
+                "included": self.included, "dropped": self.dropped}
+
+
+class PromptPacker:
+    def __init__(self, budget: int = 1200, counter: TokenCounter = token_counter):
+        self.budget = budget
+        self.counter = counter
+
+    @classmethod
+    def from_env(cls) -> "PromptPacker":
+        return cls(int(os.getenv("CHAT_PROMPT_BUDGET", "1200")))
+
+    def pack(
+        self,
+        system: str,
+        user_message: str,
+        summary: Optional[str] = None,
+        memories: Sequence[str] = (),
+        recent: Sequence[Tuple[str, str]] = ()
+    ) -> PackedPrompt:
+        """`memories` best first; `recent` as (role, text) pairs, oldest first."""
+        count = self.counter.count
+        used = self.counter.message(system) + self.counter.message(user_message)
+        included = {"summary": 0, "memories": 0, "recent": 0}
+        dropped = {"summary": 0, "memories": 0, "recent": 0}
+        candidate = used
+
+        def fits(cost: int) -> bool:
+            nonlocal used
+            if used + cost > self.budget:
+                return False
+            used += cost
+            return True
+
+        summary_block = None
+        if summary:
+            text = f"Summary of earlier conversation:\n{summary}"
+            cost = self.counter.message(text)
+            candidate += cost
+            if fits(cost):
+                summary_block, included["summary"] = text, 1
+            else:
+                dropped["summary"] = 1
+
+        kept_memories: List[str] = []
+        header = "Relevant memories:"
+        header_cost = self.counter.message(header)
+        for memory in memories:
+            cost = count(f"- {memory}\n") + (0 if kept_memories else header_cost)
+            candidate += cost
+            if fits(cost):
+                kept_memories.append(memory)
+            else:
+                dropped["memories"] += 1
+        included["memories"] = len(kept_memories)
+
+        kept_recent: List[Tuple[str, str]] = []
+        for role, text in reversed(recent):
+            cost = self.counter.message(text)
+            candidate += cost
+            if fits(cost):
+                kept_recent.append((role, text))
+            else:
+                dropped["recent"] += 1
+        included["recent"] = len(kept_recent)
+
+        messages = [{"role": "system", "content": system}]
+        if summary_block:
+            messages.append({"role": "system", "content": summary_block})
+        if kept_memories:
+            messages.append({"role": "system", "content": header + "\n" + "".join(f"- {m}\n" for m in kept_memories)})
+        messages.extend({"role": role, "content": text} for role, text in reversed(kept_recent))
+        messages.append({"role": "user", "content": user_message})
+        return PackedPrompt(messages, used, self.budget, candidate, included, dropped)
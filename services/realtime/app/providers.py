@@ -0,0 +1,92 @@
+"""Lazily initialised model and SDK clients for the realtime service.
+
+The HuggingFace sentiment pipeline and local Whisper weights take seconds to import and
+load. They are registered here as factories and built on first use, so processes that
+never serve those paths never pay for them. `warm_up` loads them ahead of traffic, and
+MODEL_SNAPSHOT_DIR points factories at local copies instead of downloading.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ProviderRegistry:
+    """Thread-safe registry of named clients built on first access."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No provider registered as '{name}'")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Exception]:
+        """Initialise the given (or all) providers now; returns {name: error} for failures."""
+        errors = {}
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                errors[name] = e
+        return errors
+
+    def reset(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+def snapshot_path(name: str) -> Optional[str]:
+    """Local pre-serialized copy of a model under MODEL_SNAPSHOT_DIR, if one exists."""
+    root = os.getenv("MODEL_SNAPSHOT_DIR")
+    if not root:
+        return None
+    path = os.path.join(root, name)
+    return path if os.path.isdir(path) else None
+
+
+def _sentiment_pipeline():
+    from transformers import pipeline
+
+    path = snapshot_path("sentiment")
+    if path:
+        return pipeline("sentiment-analysis", model=path, tokenizer=path)
+    return pipeline("sentiment-analysis")
+
+
+def _openai_client():
+    import openai
+
+    return openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def _whisper_model():
+    import whisper
+
+    return whisper.load_model(os.getenv("WHISPER_MODEL", "base"), download_root=snapshot_path("whisper"))
+
+
+providers = ProviderRegistry()
+providers.register("sentiment", _sentiment_pipeline)
+providers.register("whisper", _whisper_model)
+providers.register("openai", _openai_client)
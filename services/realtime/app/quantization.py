@@ -0,0 +1,232 @@
+"""Compressed embeddings for resident per-user memory indexes.
+
+A float32 ada-002 vector is 6 KB (12 KB as the float64 arrays MemoryService builds), so
+keeping every user's embeddings in RAM does not scale. Vectors are L2-normalised, so
+inner products are cosines, and then stored compressed:
+
+* `Int8Codec`: symmetric scalar quantization with one float32 scale per vector
+  (d + 4 bytes, about 4x smaller than float32). No training needed.
+* `PQCodec`: product quantization. The vector is split into `m` subspaces, each
+  encoded as one byte indexing a trained 256-entry codebook (m bytes; 64x smaller at m=96).
+  Queries are scored by asymmetric distance: one lookup table per query, then gathers.
+
+Compressed scores are only used to pick candidates. `QuantizedIndex.search` re-ranks the
+best `rerank` candidates exactly, using full-precision rows fetched from the memory store,
+so final scores are exact and only recall depends on the codec
+(see bench/memory_quantization.py).
+"""
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .memory_search import SearchStats, TopK, parse_timestamp, score_block
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class Int8Codec:
+    name = "int8"
+    trained = True
+
+    def fit(self, vectors: np.ndarray) -> "Int8Codec":
+        return self
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def inner(self, query: np.ndarray, codes: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        values, scales = codes
+        return (values @ query.astype(np.float32)) * scales
+
+    def empty(self, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.zeros((0, dim), np.int8), np.zeros(0, np.float32)
+
+    @staticmethod
+    def concat(a, b):
+        return np.concatenate([a[0], b[0]]), np.concatenate([a[1], b[1]])
+
+    @staticmethod
+    def take(codes, mask):
+        return codes[0][mask], codes[1][mask]
+
+    @staticmethod
+    def nbytes(codes) -> int:
+        return codes[0].nbytes + codes[1].nbytes
+
+
+def kmeans(points: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points."""
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    point_sq = (points ** 2).sum(axis=1)[:, None]
+    for _ in range(iters):
+        distances = point_sq - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)
+        assign = distances.argmin(axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, points)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = points[rng.choice(len(points), int(empty.sum()))]
+    return centroids
+
+
+class PQCodec:
+    name = "pq"
+
+    def __init__(self, m: int = 96, ks: int = 256, iters: int = 15, train_size: int = 20000, seed: int = 0):
+        if ks > 256:
+            raise ValueError("PQ codes are one byte; ks must be <= 256")
+        self.m = m
+        self.ks = ks
+        self.iters = iters
+        self.train_size = train_size
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None  # (m, ks, d / m)
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def fit(self, vectors: np.ndarray) -> "PQCodec":
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f"dimension {dim} is not divisible into {self.m} subspaces")
+        rng = np.random.default_rng(self.seed)
+        if n > self.train_size:
+            vectors = vectors[rng.choice(n, self.train_size, replace=False)]
+        ks = min(self.ks, len(vectors))
+        sub = vectors.reshape(len(vectors), self.m, -1)
+        self.codebooks = np.stack([kmeans(sub[:, j], ks, self.iters, rng) for j in range(self.m)])
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub = vectors.reshape(len(vectors), self.m, -1)
+        codes = np.empty((len(vectors), self.m), np.uint8)
+        for j, book in enumerate(self.codebooks):
+            distances = -2 * sub[:, j] @ book.T + (book ** 2).sum(axis=1)
+            codes[:, j] = distances.argmin(axis=1)
+        return codes
+
+    def inner(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.astype(np.float32).reshape(self.m, -1))
+        return table[np.arange(self.m), codes].sum(axis=1)
+
+    def empty(self, dim: int) -> np.ndarray:
+        return np.zeros((0, self.m), np.uint8)
+
+    @staticmethod
+    def concat(a, b):
+        return np.concatenate([a, b])
+
+    @staticmethod
+    def take(codes, mask):
+        return codes[mask]
+
+    @staticmethod
+    def nbytes(codes) -> int:
+        return codes.nbytes
+
+
+def make_codec(kind: Optional[str] = None):
+    kind = kind or os.getenv("MEMORY_CODEC", "int8")
+    if kind == "int8":
+        return Int8Codec()
+    if kind == "pq":
+        return PQCodec(m=int(os.getenv("MEMORY_PQ_SUBSPACES", "96")))
+    raise ValueError(f"Unknown MEMORY_CODEC '{kind}' (expected 'int8' or 'pq')")
+
+
+class QuantizedIndex:
+    """One user's memories as compressed codes plus the metadata scoring needs."""
+
+    def __init__(self, codec, dim: int):
+        self.codec = codec
+        self.dim = dim
+        self.ids = np.zeros(0, np.int64)
+        self.relevance = np.zeros(0, np.float32)
+        self.epoch_s = np.zeros(0, np.float64)
+        self.codes = codec.empty(dim)
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, memories: Sequence[Dict[str, Any]], codec=None) -> "QuantizedIndex":
+        memories = [m for m in memories if m.get("vector_embedding") is not None and len(m["vector_embedding"])]
+        codec = codec or make_codec()
+        dim = len(memories[0]["vector_embedding"]) if memories else 0
+        index = cls(codec, dim)
+        if memories:
+            vectors = normalize(np.stack([np.asarray(m["vector_embedding"]) for m in memories]))
+            if not codec.trained:
+                codec.fit(vectors)
+            index._append(memories, vectors)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codec.nbytes(self.codes) + self.ids.nbytes + self.relevance.nbytes + self.epoch_s.nbytes
+
+    def _append(self, memories: Sequence[Dict[str, Any]], vectors: np.ndarray) -> None:
+        self.codes = self.codec.concat(self.codes, self.codec.encode(vectors))
+        self.ids = np.concatenate([self.ids, [m["id"] for m in memories]]).astype(np.int64)
+        self.relevance = np.concatenate([self.relevance, [m["relevance_score"] for m in memories]]).astype(np.float32)
+        self.epoch_s = np.concatenate([self.epoch_s, [parse_timestamp(m["timestamp"]).timestamp() for m in memories]])
+
+    def add(self, memory: Dict[str, Any]) -> None:
+        """Insert or replace one memory (the codec must already be trained)."""
+        self.remove(memory["id"])
+        if memory.get("vector_embedding") is not None and len(memory["vector_embedding"]):
+            self._append([memory], normalize(np.asarray(memory["vector_embedding"])[None, :]))
+
+    def remove(self, memory_id: int) -> None:
+        keep = self.ids != memory_id
+        if not keep.all():
+            self.ids, self.relevance, self.epoch_s = self.ids[keep], self.relevance[keep], self.epoch_s[keep]
+            self.codes = self.codec.take(self.codes, keep)
+
+    def set_relevance(self, memory_id: int, relevance: float) -> None:
+        self.relevance[self.ids == memory_id] = relevance
+
+    def candidates(self, query: np.ndarray, n: int, decay_rate: float, now: datetime) -> np.ndarray:
+        """Ids of the `n` best memories by approximate score, best first."""
+        if not len(self.ids):
+            return self.ids
+        ages = (now.timestamp() - self.epoch_s) / 86400.0
+        scores = self.codec.inner(normalize(query), self.codes) * self.relevance * np.exp(-decay_rate * ages)
+        n = min(n, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        return self.ids[top[np.argsort(-scores[top], kind="stable")]]
+
+    async def search(
+        self,
+        store,
+        user_id: int,
+        query: np.ndarray,
+        k: int,
+        decay_rate: float,
+        rerank: Optional[int] = None,
+        now: Optional[datetime] = None
+    ) -> Tuple[List[Tuple[float, Dict[str, Any]]], SearchStats]:
+        """Approximate candidate pass, then exact scores for the best `rerank` (default 4k)."""
+        now = now or datetime.now(timezone.utc)
+        ids = self.candidates(query, rerank or 4 * k, decay_rate, now)
+        rows = await store.fetch_by_ids(user_id, ids.tolist()) if len(ids) else []
+        order = {memory_id: i for i, memory_id in enumerate(ids.tolist())}
+        rows = sorted(rows, key=lambda row: order[row["id"]])
+        top = TopK(k)
+        scores, keep = score_block(query, rows, decay_rate, now)
+        for score, i in zip(scores, keep):
+            top.push(float(score), rows[i])
+        return top.results(), SearchStats(scanned=len(self.ids), blocks=1)
@@ -0,0 +1,119 @@
+"""Write-behind relevance reinforcement for retrieved memories.
+
+Every search result is an access. Writing each one back would add an UPDATE per result per
+query, so `ReinforcementBuffer.record` only adds it to an in-memory entry per memory (a
+dict update, no I/O). `run` flushes all entries every `interval_s`, or sooner once
+`max_pending` memories are waiting, in one batched write through the store (Django's
+/memory-reinforcements/ endpoint, or one UPDATE on Postgres).
+
+An access at rank r is worth bump / (1 + r). Boosts decay with the same half-life the
+backend applies to stored reinforcement (see api.reinforcement in the Django app). Each
+entry keeps its delta decayed to its latest access and is decayed again to flush time,
+so when a flush happens does not change the resulting scores. After a flush, the new
+scores are applied to this process's resident indexes. Other replicas pick them up
+through the change journal.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReinforcementBuffer:
+    def __init__(self, service, bump: float = 0.05, half_life_days: float = 14.0, interval_s: float = 5.0,
+                 max_pending: int = 5000, clock=time.time):
+        self.service = service
+        self.bump = bump
+        self.half_life_days = half_life_days
+        self.interval_s = interval_s
+        self.max_pending = max_pending
+        self.clock = clock
+        # (user_id, memory_id) -> [accesses, delta as of last access, last access time]
+        self.pending: Dict[Tuple[int, int], List[float]] = {}
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self._full = asyncio.Event()
+
+    @classmethod
+    def from_env(cls, service) -> "ReinforcementBuffer":
+        return cls(
+            service,
+            bump=float(os.getenv("MEMORY_REINFORCE_BUMP", "0.05")),
+            half_life_days=float(os.getenv("MEMORY_REINFORCE_HALF_LIFE_DAYS", "14")),
+            interval_s=float(os.getenv("MEMORY_REINFORCE_INTERVAL", "5")),
+            max_pending=int(os.getenv("MEMORY_REINFORCE_MAX_PENDING", "5000")),
+        )
+
+    def _decay(self, delta: float, seconds: float) -> float:
+        return delta * math.exp(-math.log(2) * max(0.0, seconds) / 86400.0 / self.half_life_days)
+
+    def record(self, user_id: int, memories: List[Dict[str, Any]]) -> None:
+        """Count one retrieval of each memory in `memories`, best first."""
+        now = self.clock()
+        for rank, memory in enumerate(memories):
+            entry = self.pending.get((user_id, memory["id"]))
+            if entry is None:
+                self.pending[(user_id, memory["id"])] = [1, self.bump / (1 + rank), now]
+            else:
+                entry[0] += 1
+                entry[1] = self._decay(entry[1], now - entry[2]) + self.bump / (1 + rank)
+                entry[2] = now
+        self.recorded += len(memories)
+        if len(self.pending) >= self.max_pending:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """Write all pending accesses in one batch; returns how many memories were updated."""
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+        self._full.clear()
+        now = self.clock()
+        rows = [{"id": memory_id, "count": int(count), "delta": self._decay(delta, now - at)}
+                for (_, memory_id), (count, delta, at) in batch.items()]
+        try:
+            updated = await self.service.store.reinforce_many(rows, self.half_life_days)
+        except Exception:
+            # Keep the accesses for the next flush (newer ones recorded meanwhile win on conflict)
+            for key, entry in batch.items():
+                current = self.pending.get(key)
+                if current is None:
+                    self.pending[key] = entry
+                else:
+                    current[0] += entry[0]
+                    current[1] += self._decay(entry[1], current[2] - entry[2])
+            self.failures += 1
+            raise
+        for row in updated:
+            self.service.apply_relevance(row["user_id"], row["id"], row["relevance_score"])
+        self.flushes += 1
+        self.flushed += len(updated)
+        return len(updated)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("memory reinforcement flush failed")
+        finally:
+            # Shutting down: make a last attempt not to lose buffered accesses
+            try:
+                await asyncio.shield(self.flush())
+            except Exception:
+                logger.exception("final memory reinforcement flush failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self.pending), "recorded": self.recorded, "flushed": self.flushed,
+                "flushes": self.flushes, "failures": self.failures}
@@ -1,26 +1,35 @@
 from fastapi import HTTPException
+import asyncio
+import base64
 import openai
 import os
+import time
 import numpy as np
-from typing import Dict, Any, Optional, List
-import httpx
-from datetime import datetime
-
-# Mock non-memory-related imports during testing
-try:
-    from transformers import pipeline
-    import whisper
-except ImportError:
-    # These are only needed for STT and Emotion services, not Memory service
-    pipeline = None
-    whisper = None
+from typing import Dict, Any, Optional, List, Tuple, Union
+from datetime import datetime, timezone
+from .providers import providers
+from .inference import InferenceError, inference_executor
+from .batching import MicroBatcher
+from .memory_store import MemoryStore, create_memory_store
+from .memory_search import SEARCH_MODES, SearchStats, age_days, cosine_scores, exhaustive_search, search_time_decay
+from .lexical import MemoryLexicon, looks_like_keywords
+from .dedup import Deduplicator
+from .quantization import QuantizedIndex
+from .projection import SEARCH_PRECISIONS, ProjectedStore, ProjectionRegistry
+from .sharded import SharedMatrix, shard_pool
+from .audio import SAMPLE_DTYPE, pcm_to_float
+from . import stt  # noqa: F401  (registers the "stt_model" provider)
 
 class STTService:
     """Speech-to-Text service with Whisper API and local fallback."""
     
     def __init__(self):
         self.whisper_api_key = os.getenv("WHISPER_API_KEY")
-        self.local_model = None  # Lazy load if needed
+
+    @property
+    def local_model(self):
+        """Local Whisper model, loaded on first use."""
+        return providers.get("whisper")
         
     async def transcribe_chunk(self, audio_chunk: str) -> Dict[str, Any]:
         """Transcribe an audio chunk (base64 encoded)."""
@@ -28,6 +37,8 @@ class STTService:
             if self.whisper_api_key:
                 return await self._transcribe_whisper_api(audio_chunk)
             return await self._transcribe_local(audio_chunk)
+        except InferenceError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"STT error: {str(e)}")
     
@@ -37,20 +48,37 @@ class STTService:
         pass
     
     async def _transcribe_local(self, audio_chunk: str) -> Dict[str, Any]:
-        """Use local Whisper model as fallback."""
-        if not self.local_model:
-            self.local_model = whisper.load_model("base")
-        
-        # Convert base64 to audio
+        """Use the local model as fallback (one-shot; streaming callers go through app.stt)."""
         audio_data = base64.b64decode(audio_chunk)
-        # TODO: Convert to proper audio format and transcribe
-        return {"text": "Local transcription placeholder"}
+        samples = np.frombuffer(audio_data[:len(audio_data) // 2 * 2], dtype=SAMPLE_DTYPE)
+        audio = pcm_to_float(samples)
+        if inference_executor.started and "stt_model" in inference_executor.models:
+            text = await inference_executor.run("stt_model", audio, method="transcribe")
+        else:
+            text = await asyncio.to_thread(providers.get("stt_model").transcribe, audio)
+        return {"text": text}
 
 class EmotionService:
     """Emotion detection from voice and text."""
-    
-    def __init__(self):
-        self.sentiment_analyzer = pipeline("sentiment-analysis")
+
+    def __init__(
+        self,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        # Concurrent requests share one batched forward pass of the sentiment pipeline
+        self.batcher = MicroBatcher(
+            self._classify_batch,
+            max_batch_size=max_batch_size or int(os.getenv("SENTIMENT_BATCH_SIZE", "16")),
+            max_wait_ms=max_wait_ms if max_wait_ms is not None else float(os.getenv("SENTIMENT_BATCH_WAIT_MS", "5")),
+            max_concurrency=max_concurrency or max(1, inference_executor.num_workers),
+        )
+
+    @property
+    def sentiment_analyzer(self):
+        """HuggingFace sentiment pipeline, built on first use."""
+        return providers.get("sentiment")
     
     async def analyze_emotion(
         self,
@@ -59,7 +87,7 @@ class EmotionService:
     ) -> Dict[str, Any]:
         """Analyze emotion from text and optional audio features."""
         # Text sentiment
-        sentiment = self.sentiment_analyzer(text)[0]
+        sentiment = await self.batcher.submit(text)
         
         # Combine with audio features if available
         if audio_features:
@@ -71,6 +99,12 @@ class EmotionService:
             "indicators": {"text_sentiment": sentiment["score"]}
         }
     
+    async def _classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """One pipeline pass over `texts`, in the inference pool or a thread when no pool is running."""
+        if inference_executor.started:
+            return await inference_executor.run("sentiment", texts)
+        return await asyncio.to_thread(self.sentiment_analyzer, texts)
+
     def _map_sentiment_to_mood(self, sentiment: str) -> str:
         """Map HuggingFace sentiment to our mood categories."""
         mapping = {
@@ -85,22 +119,38 @@ class EmotionService:
         sentiment: Dict[str, Any],
         audio_features: Dict[str, float]
     ) -> Dict[str, Any]:
-        """Combine text sentiment with audio features."""
-        # TODO: Implement more sophisticated combination logic
+        """Combine text sentiment (valence) with prosodic features from app.features (arousal)."""
+        mood = self._map_sentiment_to_mood(sentiment["label"])
+        valence = {"POSITIVE": 1.0, "NEGATIVE": -1.0}.get(sentiment["label"], 0.0) * sentiment["score"]
+        indicators = {"text_sentiment": sentiment["score"], "valence": round(valence, 4), **audio_features}
+        arousal = audio_features.get("arousal")
+        if arousal is not None:
+            # Negative text said loudly and quickly reads as stress; said flatly and slowly, as fatigue
+            if valence < 0 and arousal >= 0.65:
+                mood = "stressed"
+            elif valence < 0 and arousal <= 0.25:
+                mood = "tired"
+            indicators["energy_level"] = int(round(1 + 9 * arousal))  # Same 1-10 scale as MoodLog
         return {
-            "mood": self._map_sentiment_to_mood(sentiment["label"]),
+            "mood": mood,
             "confidence": (sentiment["score"] + audio_features.get("confidence", 0.5)) / 2,
-            "indicators": {
-                "text_sentiment": sentiment["score"],
-                **audio_features
-            }
+            "indicators": indicators
         }
 
+def _usage(response) -> Dict[str, Any]:
+    return response.usage.model_dump(exclude_none=True) if response.usage else {}
+
+
 class AIService:
     """Low-latency AI response generation."""
-    
-    def __init__(self):
-        openai.api_key = os.getenv("OPENAI_API_KEY")
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        """The openai>=1.0 async client (one per process), built on first use."""
+        return self._client or providers.get("openai")
     
     async def get_quick_response(
         self,
@@ -109,7 +159,7 @@ class AIService:
     ) -> Dict[str, Any]:
         """Generate a quick response optimized for low latency."""
         try:
-            response = await openai.ChatCompletion.acreate(
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant."},
@@ -123,20 +173,96 @@ class AIService:
             )
             return {
                 "text": response.choices[0].message.content,
-                "usage": response.usage
+                "usage": _usage(response)
             }
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"AI response error: {str(e)}")
 
+    async def classify_intent(self, text: str, labels: List[str]) -> str:
+        """Ask the LLM to pick one of `labels` for an utterance the local classifier was unsure about."""
+        response = await self.client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "Classify the user's request. Reply with exactly one of: "
+                                              + ", ".join(labels)},
+                {"role": "user", "content": text}
+            ],
+            temperature=0,
+            max_tokens=5
+        )
+        return response.choices[0].message.content.strip().lower()
+
+    async def respond(self, messages: List[Dict[str, str]], max_tokens: int = 150) -> Dict[str, Any]:
+        """Chat completion over an already-assembled prompt; returns text, usage and latency."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(
+                model=os.getenv("CHAT_MODEL", "gpt-3.5-turbo"),
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"AI response error: {str(e)}")
+        return {
+            "text": response.choices[0].message.content,
+            "usage": _usage(response),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    async def summarize(self, previous: Optional[str], lines: List[str]) -> str:
+        """Fold conversation lines into the running summary."""
+        prompt = "Conversation:\n" + "\n".join(lines)
+        if previous:
+            prompt = f"Summary so far:\n{previous}\n\n{prompt}"
+        response = await self.client.chat.completions.create(
+            model=os.getenv("CHAT_MODEL", "gpt-3.5-turbo"),
+            messages=[
+                {"role": "system", "content": "Update the summary of this user's conversation with the assistant. "
+                                              "Keep facts, commitments, preferences and open tasks; drop small talk. "
+                                              "Reply with the summary only, in under 150 words."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            max_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "220"))
+        )
+        return response.choices[0].message.content.strip()
+
 
 class MemoryService:
     """Manages conversation history and context using vector embeddings."""
     
-    def __init__(self):
+    def __init__(self, store: Optional[MemoryStore] = None):
         self.openai = openai
         self.openai.api_key = os.getenv("OPENAI_API_KEY")
         self.django_api_url = os.getenv("DJANGO_API_URL", "http://localhost:8000")
         self.memory_decay_rate = 0.1  # Rate at which memory relevance decays
+        # REST API by default; MEMORY_BACKEND=postgres reads the table directly
+        self.store = store or create_memory_store(self.django_api_url)
+        self.search_mode = os.getenv("MEMORY_SEARCH_MODE", "early")
+        self.search_block_size = int(os.getenv("MEMORY_SEARCH_BLOCK_SIZE", "64"))
+        # Resident compressed per-user indexes for the "quantized" mode, rebuilt after a TTL
+        self.indexes: Dict[int, QuantizedIndex] = {}
+        self.index_ttl_s = float(os.getenv("MEMORY_INDEX_TTL", "60"))
+        self.rerank_factor = int(os.getenv("MEMORY_RERANK_FACTOR", "4"))
+        # Per-user BM25 indexes for "lexical"/"hybrid"; weight of cosine vs BM25 when fusing
+        self.lexicons: Dict[int, MemoryLexicon] = {}
+        # Shared-memory matrices scored by worker processes in "sharded" mode (see sharded)
+        self.matrices: Dict[int, SharedMatrix] = {}
+        self.shard_pool = shard_pool
+        # Resident builds in flight by (kind, user), shared by concurrent cache misses
+        self.builds: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.hybrid_weight = float(os.getenv("MEMORY_HYBRID_WEIGHT", "0.7"))
+        self.mode_stats: Dict[str, Dict[str, float]] = {}
+        self.deduplicator = Deduplicator.from_env()
+        # Tails Django's memory change journal when running (see memory_feed); set by the app
+        self.change_feed = None
+        # Optional reduced-dimension embeddings (see projection); MEMORY_PROJECTION names the version
+        self.projection = ProjectionRegistry.from_env().active()
+        self.search_precision = os.getenv("MEMORY_SEARCH_PRECISION", "full")
+        self.reprojector = None
+        # Write-behind retrieval reinforcement (see reinforcement); set by the app when enabled
+        self.reinforcement = None
         
     async def store_memory(
         self,
@@ -150,20 +276,25 @@ class MemoryService:
             # Generate embedding for semantic search
             embedding = await self._generate_embedding(message)
             
-            # Create memory in Django backend
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.django_api_url}/api/v1/memories/",
-                    json={
-                        "user": user_id,
-                        "message": message,
-                        "role": role,
-                        "context": context,
-                        "vector_embedding": embedding.tolist(),
-                        "relevance_score": 1.0
-                    }
-                )
-                return response.json()
+            # A near-duplicate of a recent memory reinforces it instead of adding a row
+            duplicate = await self.deduplicator.find(self.store, user_id, message, role, embedding)
+            if duplicate is not None:
+                touched = await self.store.touch(user_id, duplicate["id"], self.deduplicator.relevance_bump)
+                memory = {**duplicate, **{k: touched[k] for k in ("relevance_score", "timestamp") if k in touched}}
+            elif self.projection is not None and len(embedding) == self.projection.dim_in:
+                reduced = self.projection.apply(embedding).round(6).tolist()
+                memory = await self.store.insert(user_id, message, role, context, embedding.tolist(),
+                                                 reduced_embedding=reduced,
+                                                 projection_version=self.projection.version)
+            else:
+                memory = await self.store.insert(user_id, message, role, context, embedding.tolist())
+            index = self.indexes.get(user_id)
+            if index is not None and index.codec.trained:
+                index.add(memory)
+            if user_id in self.lexicons:
+                self.lexicons[user_id].add(memory)
+            self._matrix_add(user_id, memory)
+            return memory
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Memory storage error: {str(e)}")
     
@@ -171,40 +302,310 @@ class MemoryService:
         self,
         user_id: int,
         query: str,
-        limit: int = 5
+        limit: int = 5,
+        mode: Optional[str] = None,
+        precision: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """Retrieve relevant memories using semantic search."""
+        memories, _ = await self.search_memories(user_id, query, limit, mode, precision)
+        return memories
+
+    async def search_memories(
+        self,
+        user_id: int,
+        query: str,
+        limit: int = 5,
+        mode: Optional[str] = None,
+        precision: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], SearchStats]:
+        """Top memories plus scan statistics.
+
+        "early" walks memories newest-first and stops once older ones cannot rank
+        (see memory_search); "exhaustive" scores every memory. Both return the same ranking.
+        "quantized" picks candidates from a compressed resident index and re-ranks them
+        exactly (see quantization); it trades a little recall for not scanning at all.
+        "sharded" scores a resident shared-memory copy of every embedding in worker
+        processes (see sharded); same ranking as "exhaustive", off the event loop.
+        "lexical" ranks by BM25 over messages without embedding the query; "hybrid" fuses
+        BM25 and cosine scores; "auto" goes lexical for keyword-like queries that have hits.
+
+        `precision` applies to "early" and "exhaustive" when a projection is configured:
+        "full" scores full embeddings; "reduced" scores projected ones only; "rerank" takes
+        candidates from projected ones and re-scores them at full dimension.
+        """
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown search mode '{mode}'")
+        precision = precision or self.search_precision
+        if precision not in SEARCH_PRECISIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown search precision '{precision}'")
+        if precision != "full" and self.projection is None:
+            raise HTTPException(status_code=400, detail="No embedding projection is configured (MEMORY_PROJECTION)")
+        if mode == "sharded" and not self.shard_pool.started:
+            raise HTTPException(status_code=400, detail="Sharded search needs worker processes (MEMORY_SHARD_WORKERS)")
+        started = time.perf_counter()
         try:
-            # Get query embedding
-            query_embedding = await self._generate_embedding(query)
-            
-            # Get all user memories from Django
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.django_api_url}/api/v1/memories/",
-                    params={"user": user_id}
-                )
-                memories = response.json()
-            
-            # Calculate similarity scores
-            similarities = []
-            for memory in memories:
-                if memory["vector_embedding"]:
-                    similarity = self._calculate_similarity(
-                        query_embedding,
-                        np.array(memory["vector_embedding"])
-                    )
-                    # Apply relevance decay based on age
-                    age_penalty = self._calculate_age_penalty(memory["timestamp"])
-                    adjusted_score = similarity * memory["relevance_score"] * age_penalty
-                    similarities.append((adjusted_score, memory))
-            
-            # Sort by similarity and return top matches
-            similarities.sort(key=lambda x: x[0], reverse=True)
-            return [memory for _, memory in similarities[:limit]]
+            if mode == "auto":
+                if looks_like_keywords(query):
+                    memories, stats = await self._search_lexical(user_id, query, limit)
+                    if memories:
+                        return self._record(user_id, "lexical", started, memories, stats)
+                # Not keyword-like, or no keyword hits: take the vector path
+                mode = "early"
+            if mode == "lexical":
+                memories, stats = await self._search_lexical(user_id, query, limit)
+            else:
+                # Get query embedding
+                query_embedding = await self._generate_embedding(query)
+                if mode == "hybrid":
+                    memories, stats = await self._search_hybrid(user_id, query, query_embedding, limit)
+                elif precision != "full" and mode in ("early", "exhaustive"):
+                    memories, stats = await self._search_projected(user_id, query_embedding, limit, mode, precision)
+                    mode = f"{mode}:{precision}"
+                else:
+                    memories, stats = await self._search_vector(user_id, query_embedding, limit, mode)
+            return self._record(user_id, mode, started, memories, stats)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Memory query error: {str(e)}")
-    
+
+    async def _search_vector(
+        self,
+        user_id: int,
+        query_embedding: np.ndarray,
+        limit: int,
+        mode: str
+    ) -> Tuple[List[Dict[str, Any]], SearchStats]:
+        if mode == "early" and hasattr(self.store, "fetch_block"):
+            ranked, stats = await search_time_decay(
+                self.store, user_id, query_embedding, limit, self.memory_decay_rate, self.search_block_size
+            )
+            return [memory for _, memory in ranked], stats
+
+        if mode == "sharded":
+            matrix = await self.user_matrix(user_id)
+            ranked, stats = await self.shard_pool.search(matrix, query_embedding, limit, self.memory_decay_rate)
+            return [memory for _, memory in ranked], stats
+
+        if mode == "quantized":
+            index = await self.user_index(user_id)
+            ranked, stats = await index.search(
+                self.store, user_id, query_embedding, limit, self.memory_decay_rate,
+                rerank=self.rerank_factor * limit
+            )
+            return [memory for _, memory in ranked], stats
+
+        # Get the user's memories (only the columns scoring needs, when the backend allows)
+        memories = await self.store.fetch_for_search(user_id)
+
+        # Calculate similarity scores
+        similarities = []
+        for memory in memories:
+            if memory["vector_embedding"] is not None and len(memory["vector_embedding"]):
+                similarity = self._calculate_similarity(
+                    query_embedding,
+                    np.array(memory["vector_embedding"])
+                )
+                # Apply relevance decay based on age
+                age_penalty = self._calculate_age_penalty(memory["timestamp"])
+                adjusted_score = similarity * memory["relevance_score"] * age_penalty
+                similarities.append((adjusted_score, memory))
+        
+        # Sort by similarity and return top matches
+        similarities.sort(key=lambda x: x[0], reverse=True)
+        return [memory for _, memory in similarities[:limit]], SearchStats(scanned=len(memories), blocks=1)
+
+    async def _search_projected(
+        self,
+        user_id: int,
+        query_embedding: np.ndarray,
+        limit: int,
+        mode: str,
+        precision: str
+    ) -> Tuple[List[Dict[str, Any]], SearchStats]:
+        """Time-decay search over reduced embeddings, optionally re-ranked at full dimension."""
+        store = ProjectedStore(self.store, self.projection)
+        candidates = limit if precision == "reduced" else self.rerank_factor * limit
+        ranked, stats = await search_time_decay(
+            store, user_id, self.projection.apply(query_embedding), candidates, self.memory_decay_rate,
+            self.search_block_size, relevance_bound=None if mode == "early" else float("inf")
+        )
+        if precision == "reduced":
+            return [memory for _, memory in ranked], stats
+        rows = await self.store.fetch_by_ids(user_id, [memory["id"] for _, memory in ranked])
+        return [memory for _, memory in exhaustive_search(rows, query_embedding, limit, self.memory_decay_rate)], stats
+
+    async def _search_lexical(self, user_id: int, query: str, limit: int) -> Tuple[List[Dict[str, Any]], SearchStats]:
+        """BM25 x relevance x age decay over keyword hits; no embedding call."""
+        lexicon = await self.user_lexicon(user_id)
+        scores = lexicon.index.scores(query)
+        if not scores:
+            return [], SearchStats()
+        rows = [lexicon.memories[memory_id] for memory_id in scores]
+        ages = age_days([row["timestamp"] for row in rows], datetime.now(timezone.utc))
+        relevance = np.array([row["relevance_score"] for row in rows], dtype=np.float64)
+        final = np.fromiter(scores.values(), np.float64, len(scores)) * relevance * np.exp(-self.memory_decay_rate * ages)
+        order = np.argsort(-final, kind="stable")[:limit]
+        return [rows[i] for i in order], SearchStats(scanned=len(rows), blocks=0)
+
+    async def _search_hybrid(
+        self,
+        user_id: int,
+        query: str,
+        query_embedding: np.ndarray,
+        limit: int
+    ) -> Tuple[List[Dict[str, Any]], SearchStats]:
+        """Fuse cosine and normalised BM25 over the union of both candidate lists."""
+        candidates_per_side = self.rerank_factor * limit
+        lexicon = await self.user_lexicon(user_id)
+        vector_hits, stats = await self._search_vector(user_id, query_embedding, candidates_per_side, "early")
+        candidates = {memory["id"]: memory for memory in vector_hits}
+        lexical = lexicon.index.scores(query)
+        missing = [memory_id for _, memory_id in sorted(((s, d) for d, s in lexical.items()), reverse=True)
+                   [:candidates_per_side] if memory_id not in candidates]
+        if missing:
+            for row in await self.store.fetch_by_ids(user_id, missing):
+                candidates[row["id"]] = row
+        rows = list(candidates.values())
+        cosine, keep = cosine_scores(query_embedding, rows)
+        rows = [rows[i] for i in keep]
+        if not rows:
+            return [], stats
+        best_lexical = max(lexical.values(), default=0.0) or 1.0
+        lexical_norm = np.array([lexical.get(row["id"], 0.0) for row in rows]) / best_lexical
+        fused = self.hybrid_weight * np.maximum(cosine, 0) + (1 - self.hybrid_weight) * lexical_norm
+        relevance = np.array([row["relevance_score"] for row in rows], dtype=np.float64)
+        ages = age_days([row["timestamp"] for row in rows], datetime.now(timezone.utc))
+        final = fused * relevance * np.exp(-self.memory_decay_rate * ages)
+        order = np.argsort(-final, kind="stable")[:limit]
+        stats.scanned += len(missing)
+        return [rows[i] for i in order], stats
+
+    def _record(self, user_id: int, mode: str, started: float, memories: List[Dict[str, Any]], stats: SearchStats):
+        if self.reinforcement is not None:
+            self.reinforcement.record(user_id, memories)
+        entry = self.mode_stats.setdefault(mode, {"queries": 0, "total_ms": 0.0, "results": 0})
+        entry["queries"] += 1
+        entry["total_ms"] += (time.perf_counter() - started) * 1000
+        entry["results"] += len(memories)
+        return memories, stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-mode query counts and mean latency (including the embedding call, if any), and ingest dedup."""
+        modes = {
+            mode: {
+                "queries": entry["queries"],
+                "mean_ms": round(entry["total_ms"] / entry["queries"], 2),
+                "mean_results": round(entry["results"] / entry["queries"], 2),
+            }
+            for mode, entry in self.mode_stats.items()
+        }
+        feed = self.change_feed.stats() if self.change_feed is not None else None
+        projection = None
+        if self.projection is not None:
+            projection = {**self.projection.describe(),
+                          "reprojection": self.reprojector.stats() if self.reprojector is not None else None}
+        reinforcement = self.reinforcement.stats() if self.reinforcement is not None else None
+        sharded = {**self.shard_pool.stats(), "users": len(self.matrices),
+                   "resident_bytes": sum(matrix.nbytes for matrix in self.matrices.values())}
+        return {"modes": modes, "dedup": self.deduplicator.stats(), "change_feed": feed, "projection": projection,
+                "reinforcement": reinforcement, "sharded": sharded}
+
+    def _stale(self, built_at: float) -> bool:
+        """Past the TTL, unless a healthy change feed is keeping resident indexes current."""
+        if self.change_feed is not None and self.change_feed.healthy:
+            return False
+        return time.monotonic() - built_at > self.index_ttl_s
+
+    def has_resident_indexes(self, user_id: int) -> bool:
+        return user_id in self.indexes or user_id in self.lexicons or user_id in self.matrices
+
+    def apply_change(self, user_id: int, memory_id: int, row: Optional[Dict[str, Any]]) -> None:
+        """Apply one journaled change to the user's resident indexes; row=None means deleted."""
+        index = self.indexes.get(user_id)
+        if index is not None:
+            if row is None:
+                index.remove(memory_id)
+            elif index.codec.trained:
+                index.add(row)
+            else:
+                # Built before the user had embeddings; rebuild on next use
+                del self.indexes[user_id]
+        lexicon = self.lexicons.get(user_id)
+        if lexicon is not None:
+            if row is None:
+                lexicon.remove(memory_id)
+            else:
+                lexicon.add(row)
+        if row is None:
+            matrix = self.matrices.get(user_id)
+            if matrix is not None:
+                matrix.remove(memory_id)
+        else:
+            self._matrix_add(user_id, row)
+
+    def _matrix_add(self, user_id: int, memory: Dict[str, Any]) -> None:
+        matrix = self.matrices.get(user_id)
+        if matrix is not None and not matrix.add(memory):
+            # Out of capacity (or the embedding size changed); rebuild on next use
+            del self.matrices[user_id]
+            matrix.retire()
+
+    def release_matrices(self) -> None:
+        """Unlink every shared-memory matrix (at shutdown)."""
+        for matrix in self.matrices.values():
+            matrix.retire()
+        self.matrices.clear()
+
+    def apply_relevance(self, user_id: int, memory_id: int, relevance: float) -> None:
+        """Update one memory's relevance_score in the user's resident indexes, if any."""
+        index = self.indexes.get(user_id)
+        if index is not None:
+            index.set_relevance(memory_id, relevance)
+        lexicon = self.lexicons.get(user_id)
+        if lexicon is not None and memory_id in lexicon.memories:
+            lexicon.memories[memory_id]["relevance_score"] = relevance
+        matrix = self.matrices.get(user_id)
+        if matrix is not None:
+            matrix.set_relevance(memory_id, relevance)
+
+    async def _resident(self, kind: str, cache: Dict[int, Any], user_id: int, build, retire=None):
+        """cache[user_id], built from the store on first use or once stale.
+
+        Concurrent misses for the same (kind, user) await one shared build instead of each
+        starting their own. `retire` is called with whatever the new build replaces.
+        """
+        current = cache.get(user_id)
+        if current is not None and not self._stale(current.built_at):
+            return current
+        key = (kind, user_id)
+        task = self.builds.get(key)
+        if task is None:
+            task = self.builds[key] = asyncio.ensure_future(self._build(cache, user_id, build, retire))
+            task.add_done_callback(lambda done: self.builds.pop(key) if self.builds.get(key) is done else None)
+        # Shielded: a cancelled caller must not cancel the build the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _build(self, cache: Dict[int, Any], user_id: int, build, retire):
+        memories = await self.store.fetch_for_search(user_id)
+        built = await asyncio.to_thread(build, memories)
+        # Whatever is cached now (a change may have replaced or dropped it meanwhile) is displaced
+        previous, cache[user_id] = cache.get(user_id), built
+        if previous is not None and retire is not None:
+            retire(previous)
+        return built
+
+    async def user_lexicon(self, user_id: int) -> MemoryLexicon:
+        """The user's BM25 index."""
+        return await self._resident("lexicon", self.lexicons, user_id, MemoryLexicon.build)
+
+    async def user_index(self, user_id: int) -> QuantizedIndex:
+        """The user's compressed index."""
+        return await self._resident("index", self.indexes, user_id, QuantizedIndex.build)
+
+    async def user_matrix(self, user_id: int) -> SharedMatrix:
+        """The user's shared-memory matrix; replaced matrices are unlinked."""
+        return await self._resident("matrix", self.matrices, user_id, SharedMatrix.build, SharedMatrix.retire)
+
     async def _generate_embedding(self, text: str) -> np.ndarray:
         """Generate vector embedding for text using OpenAI's embedding API."""
         response = await openai.Embedding.acreate(
@@ -217,9 +618,11 @@ class MemoryService:
         """Calculate cosine similarity between two vectors."""
         return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
     
-    def _calculate_age_penalty(self, timestamp: str) -> float:
+    def _calculate_age_penalty(self, timestamp: Union[str, datetime]) -> float:
         """Calculate memory relevance decay based on age."""
-        age = (datetime.now() - datetime.fromisoformat(timestamp.replace("Z", "+00:00")))
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        age = datetime.now(timestamp.tzinfo) - timestamp
         days_old = age.total_seconds() / (24 * 3600)
         penalty = np.exp(-self.memory_decay_rate * days_old)
         # clamp very small floating-point drift
@@ -230,4 +633,5 @@ class MemoryService:
 
 stt_service = STTService()
 emotion_service = EmotionService()
-ai_service = AIService()
\ No newline at end of file
+ai_service = AIService()
+memory_service = MemoryService()
@@ -0,0 +1,211 @@
+"""Bounded, resumable voice session state.
+
+Every live voice session holds a preallocated audio ring buffer plus its transcription
+state. `SessionManager` keeps them within a per-process byte budget. Each session gets a
+fixed buffer (`session_bytes`). When a new session would exceed the budget, the least
+recently used idle session is evicted, and sessions idle for longer than `idle_ttl_s` are
+evicted by a periodic sweep.
+
+Eviction is not loss. An evicted or disconnected session is snapshotted to a compact,
+pickled form: the transcript so far plus the audio of the open segment. Snapshots are kept
+(bounded by `snapshot_bytes` and `snapshot_ttl_s`) so a client reconnecting with the same
+session_id picks up where it left off.
+
+Sessions belong to the verified user that opened them. A session id chosen by the client
+is not a credential: `get` on a live session or snapshot owned by someone else raises
+`SessionOwnerError` instead of handing over its transcript.
+
+Session state objects implement `nbytes`, `snapshot() -> dict` and `restore(dict)`.
+"""
+import asyncio
+import os
+import pickle
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when a new session cannot fit in the process budget."""
+
+
+class SessionOwnerError(PermissionError):
+    """Raised when a session id is used by someone other than the user who opened it."""
+
+
+@dataclass
+class Session:
+    session_id: str
+    state: Any
+    created_at: float
+    last_seen: float
+    owner: Optional[int] = None
+    resumed: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def nbytes(self) -> int:
+        return self.state.nbytes
+
+
+class SessionManager:
+    """LRU/TTL-bounded registry of live sessions with snapshot-based resume."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        session_bytes: int = 640_000,
+        process_bytes: int = 64 * 1024 * 1024,
+        idle_ttl_s: float = 60.0,
+        snapshot_bytes: int = 16 * 1024 * 1024,
+        snapshot_ttl_s: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if session_bytes > process_bytes:
+            raise ValueError("session_bytes must not exceed process_bytes")
+        self.factory = factory
+        self.session_bytes = session_bytes
+        self.process_bytes = process_bytes
+        self.idle_ttl = idle_ttl_s
+        self.snapshot_budget = snapshot_bytes
+        self.snapshot_ttl = snapshot_ttl_s
+        self.clock = clock
+        self.counters = {"created": 0, "resumed": 0, "closed": 0, "evicted_lru": 0, "evicted_idle": 0,
+                         "snapshots_dropped": 0, "rejected": 0}
+        self._live: "OrderedDict[str, Session]" = OrderedDict()
+        self._snapshots: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (saved_at, pickled state, owner)
+        self._bytes_held = 0
+        self._snapshot_bytes_held = 0
+
+    @classmethod
+    def from_env(cls, factory: Callable[[], Any]) -> "SessionManager":
+        return cls(
+            factory,
+            session_bytes=int(os.getenv("VOICE_SESSION_BYTES", "640000")),
+            process_bytes=int(os.getenv("VOICE_PROCESS_BYTES", str(64 * 1024 * 1024))),
+            idle_ttl_s=float(os.getenv("VOICE_SESSION_TTL", "60")),
+            snapshot_bytes=int(os.getenv("VOICE_SNAPSHOT_BYTES", str(16 * 1024 * 1024))),
+            snapshot_ttl_s=float(os.getenv("VOICE_SNAPSHOT_TTL", "300")),
+        )
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._live
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    @property
+    def bytes_held(self) -> int:
+        return self._bytes_held
+
+    def has_snapshot(self, session_id: str) -> bool:
+        return session_id in self._snapshots
+
+    def get(self, session_id: str, owner: Optional[int] = None) -> Session:
+        """The live session, resuming it from a snapshot or creating it if needed.
+
+        Raises SessionOwnerError when the session or its snapshot belongs to another owner.
+        """
+        now = self.clock()
+        session = self._live.get(session_id)
+        if session is not None:
+            if session.owner != owner:
+                raise SessionOwnerError(f"Session '{session_id}' belongs to another user")
+            session.last_seen = now
+            self._live.move_to_end(session_id)
+            return session
+
+        snapshot = self._snapshots.get(session_id)
+        if snapshot is not None and snapshot[2] != owner:
+            raise SessionOwnerError(f"Session '{session_id}' belongs to another user")
+        self.sweep(now)
+        self._make_room(self.session_bytes)
+        state = self.factory()
+        snapshot = self._snapshots.pop(session_id, None)
+        if snapshot is not None:
+            self._snapshot_bytes_held -= len(snapshot[1])
+            state.restore(pickle.loads(snapshot[1]))
+            self.counters["resumed"] += 1
+        else:
+            self.counters["created"] += 1
+        session = Session(session_id, state, created_at=now, last_seen=now, owner=owner,
+                          resumed=snapshot is not None)
+        self._live[session_id] = session
+        self._bytes_held += session.nbytes
+        return session
+
+    def close(self, session_id: str) -> Optional[Session]:
+        """Drop a finished session and any snapshot of it."""
+        snapshot = self._snapshots.pop(session_id, None)
+        if snapshot is not None:
+            self._snapshot_bytes_held -= len(snapshot[1])
+        session = self._live.pop(session_id, None)
+        if session is not None:
+            self._bytes_held -= session.nbytes
+            self.counters["closed"] += 1
+        return session
+
+    def suspend(self, session_id: str) -> bool:
+        """Snapshot a live session and release its buffers; False if it is not live."""
+        session = self._live.pop(session_id, None)
+        if session is None:
+            return False
+        self._bytes_held -= session.nbytes
+        data = pickle.dumps(session.state.snapshot(), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.snapshot_budget:
+            self.counters["snapshots_dropped"] += 1
+            return True
+        self._snapshots[session_id] = (self.clock(), data, session.owner)
+        self._snapshot_bytes_held += len(data)
+        while self._snapshot_bytes_held > self.snapshot_budget:
+            self._drop_oldest_snapshot()
+        return True
+
+    def _drop_oldest_snapshot(self) -> None:
+        _, (_, data, _) = self._snapshots.popitem(last=False)
+        self._snapshot_bytes_held -= len(data)
+        self.counters["snapshots_dropped"] += 1
+
+    def _make_room(self, needed: int) -> None:
+        if self._bytes_held + needed <= self.process_bytes:
+            return
+        for session_id in list(self._live):
+            if self._bytes_held + needed <= self.process_bytes:
+                return
+            if not self._live[session_id].lock.locked():  # Never evict a session mid-request
+                self.suspend(session_id)
+                self.counters["evicted_lru"] += 1
+        if self._bytes_held + needed > self.process_bytes:
+            self.counters["rejected"] += 1
+            raise SessionLimitError(
+                f"Voice session budget exhausted ({self._bytes_held} of {self.process_bytes} bytes in use)"
+            )
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Evict sessions idle past the TTL and expire old snapshots; returns sessions evicted."""
+        now = self.clock() if now is None else now
+        evicted = 0
+        # Live sessions are kept in LRU order, so the idle ones are at the front
+        for session_id, session in list(self._live.items()):
+            if now - session.last_seen < self.idle_ttl:
+                break
+            if session.lock.locked():
+                continue
+            self.suspend(session_id)
+            self.counters["evicted_idle"] += 1
+            evicted += 1
+        while self._snapshots and now - next(iter(self._snapshots.values()))[0] >= self.snapshot_ttl:
+            self._drop_oldest_snapshot()
+        return evicted
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "live_sessions": len(self._live),
+            "bytes_held": self._bytes_held,
+            "process_budget_bytes": self.process_bytes,
+            "session_budget_bytes": self.session_bytes,
+            "snapshots": len(self._snapshots),
+            "snapshot_bytes": self._snapshot_bytes_held,
+            **self.counters,
+        }
@@ -0,0 +1,247 @@
+"""Multi-process sharded search over resident per-user embedding matrices.
+
+The "exhaustive" path scores every memory on one core, inside the event loop. For the
+largest users that takes hundreds of milliseconds, and every other request waits.
+"sharded" mode instead keeps each searched user's embeddings resident in a
+`multiprocessing.shared_memory` segment (`SharedMatrix`). It holds L2-normalised float32
+vectors, relevance, timestamps and ids, so scores match `memory_search.exhaustive_search`.
+
+`ShardPool` splits the matrix's rows into contiguous shards, one per worker process.
+Workers attach to the segment by name once and cache the attachment. Only the segment
+name, the row range and the query are pickled per call; vectors never are. Each worker
+returns a partial top-k of (row, score). The event loop awaits the futures and merges at
+most `k x shards` candidates, so latency falls with cores and the loop stays free.
+
+Matrices are updated in place: appends go into spare capacity, deletes blank the id,
+relevance changes are written straight into the shared array. A matrix that runs out of
+capacity, or is replaced, is retired and unlinked once no query is reading it.
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .memory_search import SearchStats, parse_timestamp
+from .quantization import normalize
+
+# Segments a worker keeps attached; older ones (usually retired matrices) are closed
+MAX_ATTACHED = 32
+_attached: "OrderedDict[str, Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]]" = OrderedDict()
+
+
+def _layout(capacity: int, dim: int) -> Tuple[List[Tuple[str, Any, tuple, int]], int]:
+    """(name, dtype, shape, byte offset) of each array in a segment, and the segment size."""
+    fields = [("epoch_s", np.float64, (capacity,)), ("ids", np.int64, (capacity,)),
+              ("relevance", np.float32, (capacity,)), ("vectors", np.float32, (capacity, dim))]
+    layout, offset = [], 0
+    for name, dtype, shape in fields:
+        layout.append((name, dtype, shape, offset))
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8  # keep 8-byte alignment
+    return layout, max(offset, 8)
+
+
+def _views(buf, capacity: int, dim: int) -> Dict[str, np.ndarray]:
+    layout, _ = _layout(capacity, dim)
+    return {name: np.ndarray(shape, dtype, buffer=buf, offset=offset) for name, dtype, shape, offset in layout}
+
+
+def _attach(name: str, capacity: int, dim: int) -> Dict[str, np.ndarray]:
+    entry = _attached.get(name)
+    if entry is not None:
+        _attached.move_to_end(name)
+        return entry[1]
+    shm = shared_memory.SharedMemory(name=name)
+    _attached[name] = (shm, _views(shm.buf, capacity, dim))
+    while len(_attached) > MAX_ATTACHED:
+        _, (old, arrays) = _attached.popitem(last=False)
+        arrays.clear()
+        old.close()
+    return _attached[name][1]
+
+
+def _shard_topk(name: str, capacity: int, dim: int, start: int, stop: int, query: np.ndarray, k: int,
+                decay_rate: float, now_s: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Worker: the best `k` live rows of [start, stop) as (row positions, scores), unordered."""
+    arrays = _attach(name, capacity, dim)
+    scores = (arrays["vectors"][start:stop] @ query).astype(np.float64)
+    scores *= arrays["relevance"][start:stop]
+    scores *= np.exp(-decay_rate * (now_s - arrays["epoch_s"][start:stop]) / 86400.0)
+    scores[arrays["ids"][start:stop] < 0] = -np.inf
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    top = top[np.isfinite(scores[top])]
+    return top + start, scores[top]
+
+
+class SharedMatrix:
+    """One user's memories as a shared-memory matrix plus the rows to return."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = max(1, capacity)
+        _, size = _layout(self.capacity, dim)
+        self.shm = shared_memory.SharedMemory(create=True, size=size, name=f"mem-{uuid.uuid4().hex[:20]}")
+        self.arrays = _views(self.shm.buf, self.capacity, dim)
+        self.rows: List[Optional[Dict[str, Any]]] = []  # by row position; None once removed
+        self.positions: Dict[int, int] = {}
+        self.built_at = time.monotonic()
+        self.inflight = 0
+        self.retired = False
+
+    @classmethod
+    def build(cls, memories: Sequence[Dict[str, Any]], headroom: float = 0.25) -> "SharedMatrix":
+        memories = [m for m in memories if m.get("vector_embedding") is not None and len(m["vector_embedding"])]
+        dim = len(memories[0]["vector_embedding"]) if memories else 0
+        matrix = cls(dim, int(len(memories) * (1 + headroom)) + 64)
+        if memories:
+            n = len(memories)
+            matrix.arrays["vectors"][:n] = normalize(np.stack([np.asarray(m["vector_embedding"]) for m in memories]))
+            matrix.arrays["relevance"][:n] = [m["relevance_score"] for m in memories]
+            matrix.arrays["epoch_s"][:n] = [parse_timestamp(m["timestamp"]).timestamp() for m in memories]
+            matrix.arrays["ids"][:n] = [m["id"] for m in memories]
+            matrix.rows = [{k: v for k, v in m.items() if k != "vector_embedding"} for m in memories]
+            matrix.positions = {m["id"]: i for i, m in enumerate(memories)}
+        return matrix
+
+    def __len__(self) -> int:
+        """Rows written so far, including removed ones; queries scan this many."""
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def add(self, memory: Dict[str, Any]) -> bool:
+        """Insert or replace one memory; False when it does not fit and the matrix must be rebuilt."""
+        self.remove(memory["id"])
+        vector = memory.get("vector_embedding")
+        if vector is None or not len(vector):
+            return True
+        if len(vector) != self.dim or len(self.rows) >= self.capacity:
+            return False
+        position = len(self.rows)
+        self.arrays["vectors"][position] = normalize(np.asarray(vector))
+        self.arrays["relevance"][position] = memory["relevance_score"]
+        self.arrays["epoch_s"][position] = parse_timestamp(memory["timestamp"]).timestamp()
+        self.arrays["ids"][position] = memory["id"]
+        self.rows.append({k: v for k, v in memory.items() if k != "vector_embedding"})
+        self.positions[memory["id"]] = position
+        return True
+
+    def remove(self, memory_id: int) -> None:
+        position = self.positions.pop(memory_id, None)
+        if position is not None:
+            self.arrays["ids"][position] = -1
+            self.rows[position] = None
+
+    def set_relevance(self, memory_id: int, relevance: float) -> None:
+        position = self.positions.get(memory_id)
+        if position is not None:
+            self.arrays["relevance"][position] = relevance
+            self.rows[position]["relevance_score"] = relevance
+
+    def retire(self) -> None:
+        """Unlink the segment now, or after the last in-flight query finishes."""
+        self.retired = True
+        if self.inflight == 0 and self.arrays:
+            self.arrays = {}
+            self.shm.close()
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class ShardPool:
+    """Worker processes that score row ranges of shared matrices."""
+
+    def __init__(self, workers: int = 0, min_shard_rows: int = 4096, start_method: str = "fork"):
+        self.num_workers = workers
+        self.min_shard_rows = min_shard_rows
+        self.start_method = start_method
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.queries = 0
+        self.shards = 0
+
+    @classmethod
+    def from_env(cls) -> "ShardPool":
+        return cls(
+            workers=int(os.getenv("MEMORY_SHARD_WORKERS", "0")),
+            min_shard_rows=int(os.getenv("MEMORY_SHARD_MIN_ROWS", "4096")),
+            start_method=os.getenv("MEMORY_SHARD_START_METHOD", "fork"),
+        )
+
+    @property
+    def started(self) -> bool:
+        return self.pool is not None
+
+    def start(self) -> None:
+        if self.started or self.num_workers < 1:
+            return
+        self.pool = ProcessPoolExecutor(max_workers=self.num_workers,
+                                        mp_context=multiprocessing.get_context(self.start_method))
+
+    def shutdown(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def bounds(self, rows: int) -> List[Tuple[int, int]]:
+        """Contiguous row ranges: one per worker, but none smaller than `min_shard_rows`."""
+        shards = max(1, min(self.num_workers, math.ceil(rows / self.min_shard_rows)))
+        edges = np.linspace(0, rows, shards + 1).astype(int)
+        return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    async def search(
+        self,
+        matrix: SharedMatrix,
+        query: np.ndarray,
+        k: int,
+        decay_rate: float,
+        now: Optional[datetime] = None
+    ) -> Tuple[List[Tuple[float, Dict[str, Any]]], SearchStats]:
+        """Top-k (score, memory) pairs; ties keep the earlier row, like a stable sort."""
+        if self.pool is None:
+            raise RuntimeError("Shard pool is not started")
+        rows = len(matrix)
+        if rows == 0 or k < 1:
+            return [], SearchStats()
+        query = normalize(np.asarray(query))
+        if len(query) != matrix.dim:
+            raise ValueError(f"Query has {len(query)} dimensions, memories have {matrix.dim}")
+        now_s = (now or datetime.now(timezone.utc)).timestamp()
+        bounds = self.bounds(rows)
+        matrix.inflight += 1
+        try:
+            partials = await asyncio.gather(*(
+                asyncio.wrap_future(self.pool.submit(
+                    _shard_topk, matrix.shm.name, matrix.capacity, matrix.dim, start, stop, query, k, decay_rate, now_s
+                ))
+                for start, stop in bounds
+            ))
+        finally:
+            matrix.inflight -= 1
+            if matrix.retired:
+                matrix.retire()
+        positions = np.concatenate([p for p, _ in partials])
+        scores = np.concatenate([s for _, s in partials])
+        ranked = [(float(scores[i]), matrix.rows[positions[i]]) for i in np.lexsort((positions, -scores))]
+        self.queries += 1
+        self.shards += len(bounds)
+        # Rows removed while the workers ran are skipped
+        return [pair for pair in ranked if pair[1] is not None][:k], SearchStats(scanned=rows, blocks=len(bounds))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.num_workers if self.started else 0, "queries": self.queries,
+                "mean_shards": round(self.shards / self.queries, 2) if self.queries else 0.0}
+
+
+shard_pool = ShardPool.from_env()
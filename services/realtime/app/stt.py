@@ -0,0 +1,363 @@
+"""Streaming speech-to-text.
+
+Audio for each session is appended to a ring buffer and segmented by an energy-based
+voice activity detector. While a segment is open the engine periodically re-decodes it
+(each decode overlaps the previous one) and emits a partial transcript whose `stable`
+prefix only ever grows: words are promoted once two consecutive hypotheses agree.
+When the speaker pauses, or the segment reaches its maximum length, the segment is
+finalized; forced cuts restart the next segment slightly earlier and de-duplicate the
+overlapping words.
+
+Models implement `transcribe(audio: float32 ndarray) -> str`. `FakeTranscriptionModel`
+stands in for Whisper so latency tests run without a GPU or network.
+"""
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_DTYPE, SAMPLE_RATE, AudioRingBuffer, PCMData, pcm_to_float
+from .inference import inference_executor
+from .providers import providers
+from .sessions import SessionManager
+
+
+class TranscriptionModel(Protocol):
+    def transcribe(self, audio: np.ndarray) -> str:
+        ...
+
+
+class WhisperTranscriptionModel:
+    """Local Whisper model loaded through the provider registry."""
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        result = providers.get("whisper").transcribe(audio, fp16=False)
+        return result["text"].strip()
+
+
+class FakeTranscriptionModel:
+    """Deterministic stand-in: emits one word per `1 / words_per_second` seconds of voiced audio."""
+
+    WORDS = ("remind", "me", "to", "stretch", "after", "lunch", "and", "then", "start", "focus")
+
+    def __init__(self, words_per_second: float = 2.5, latency_s: float = 0.0, threshold: float = 0.02):
+        self.words_per_second = words_per_second
+        self.latency_s = latency_s
+        self.threshold = threshold
+        self.calls = 0
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        voiced = int(np.count_nonzero(np.abs(audio) > self.threshold))
+        n_words = int(voiced / SAMPLE_RATE * self.words_per_second)
+        return " ".join(self.WORDS[i % len(self.WORDS)] for i in range(n_words))
+
+
+def create_transcription_model() -> TranscriptionModel:
+    if os.getenv("STT_MODEL", "whisper") == "fake":
+        return FakeTranscriptionModel()
+    return WhisperTranscriptionModel()
+
+
+providers.register("stt_model", create_transcription_model)
+
+
+class PooledTranscriptionModel:
+    """Runs the "stt_model" provider in the inference pool; called from transcriber threads."""
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        return inference_executor.call("stt_model", audio, method="transcribe")
+
+
+class EnergyVAD:
+    """Frame-energy voice activity detector with an adaptive noise floor and hangover."""
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        threshold_ratio: float = 3.0,
+        min_threshold: float = 300.0,
+        hangover_ms: int = 450
+    ):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.threshold_ratio = threshold_ratio
+        self.min_threshold = min_threshold
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.noise_floor = min_threshold / threshold_ratio
+        self.in_speech = False
+        self._silent_frames = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._pending_start = 0
+
+    def process(self, samples: np.ndarray, start_index: int) -> List[Tuple[str, int]]:
+        """Return ('start' | 'end', absolute sample index) transitions found in `samples`."""
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+            start_index = self._pending_start
+        n_frames = len(samples) // self.frame_len
+        usable = n_frames * self.frame_len
+        self._pending = samples[usable:].copy()
+        self._pending_start = start_index + usable
+        if not n_frames:
+            return []
+
+        frames = samples[:usable].reshape(n_frames, self.frame_len).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        events = []
+        for i, energy in enumerate(rms):
+            threshold = max(self.min_threshold, self.noise_floor * self.threshold_ratio)
+            voiced = energy > threshold
+            index = start_index + i * self.frame_len
+            if voiced:
+                self._silent_frames = 0
+                if not self.in_speech:
+                    self.in_speech = True
+                    events.append(("start", index))
+            else:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(energy)
+                if self.in_speech:
+                    self._silent_frames += 1
+                    if self._silent_frames >= self.hangover_frames:
+                        self.in_speech = False
+                        events.append(("end", index + self.frame_len))
+        return events
+
+
+def _common_prefix(a: List[str], b: List[str]) -> List[str]:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return a[:n]
+
+
+def _merge_overlap(previous: List[str], following: List[str], max_overlap: int = 8) -> List[str]:
+    """Drop leading words of `following` that repeat the tail of `previous`."""
+    for k in range(min(max_overlap, len(previous), len(following)), 0, -1):
+        if previous[-k:] == following[:k]:
+            return following[k:]
+    return following
+
+
+@dataclass
+class SegmentState:
+    index: int
+    start: int
+    last_decode_at: int
+    continues_previous: bool = False
+    previous_hypothesis: Tuple[str, ...] = ()
+    stable: Tuple[str, ...] = ()
+
+
+class StreamingTranscriber:
+    """Incremental transcription for one audio stream."""
+
+    def __init__(
+        self,
+        model: TranscriptionModel,
+        buffer: Optional[AudioRingBuffer] = None,
+        vad: Optional[EnergyVAD] = None,
+        sample_rate: int = SAMPLE_RATE,
+        partial_interval_s: float = 0.5,
+        max_segment_s: float = 15.0,
+        overlap_s: float = 1.0,
+        pre_roll_s: float = 0.2
+    ):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.buffer = buffer or AudioRingBuffer.for_seconds(max_segment_s + 5.0, sample_rate)
+        self.vad = vad or EnergyVAD(sample_rate)
+        self.partial_interval = int(partial_interval_s * sample_rate)
+        self.max_segment = int(max_segment_s * sample_rate)
+        self.overlap = int(overlap_s * sample_rate)
+        self.pre_roll = int(pre_roll_s * sample_rate)
+        self.segment: Optional[SegmentState] = None
+        self.finals: List[Dict[str, Any]] = []
+        self.model_seconds = 0.0
+        self._next_segment = 0
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(f["text"] for f in self.finals if f["text"])
+
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Compact resumable state: finals so far plus only the audio the open segment needs."""
+        end = self.buffer.total_written
+        keep_from = self.segment.start if self.segment else end - self.pre_roll
+        keep_from = max(keep_from, self.buffer.start)
+        return {
+            "finals": list(self.finals),
+            "model_seconds": self.model_seconds,
+            "next_segment": self._next_segment,
+            "segment": asdict(self.segment) if self.segment else None,
+            "vad": {
+                "noise_floor": self.vad.noise_floor,
+                "in_speech": self.vad.in_speech,
+                "silent_frames": self.vad._silent_frames,
+            },
+            "audio_start": keep_from,
+            "audio": self.buffer.read(keep_from, end).tobytes(),
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.finals = list(state["finals"])
+        self.model_seconds = state["model_seconds"]
+        self._next_segment = state["next_segment"]
+        self.segment = SegmentState(**state["segment"]) if state["segment"] else None
+        self.vad.noise_floor = state["vad"]["noise_floor"]
+        self.vad.in_speech = state["vad"]["in_speech"]
+        self.vad._silent_frames = state["vad"]["silent_frames"]
+        self.buffer.restore(state["audio_start"], state["audio"])
+
+    def _decode(self, start: int, end: int) -> Tuple[List[str], float]:
+        started = time.perf_counter()
+        text = self.model.transcribe(pcm_to_float(self.buffer.read(start, end)))
+        elapsed = time.perf_counter() - started
+        self.model_seconds += elapsed
+        return text.split(), elapsed
+
+    def _open_segment(self, start: int, continues_previous: bool = False) -> None:
+        self.segment = SegmentState(
+            index=self._next_segment,
+            start=max(self.buffer.start, start),
+            last_decode_at=start,
+            continues_previous=continues_previous,
+        )
+        self._next_segment += 1
+
+    def _partial(self, end: int) -> Dict[str, Any]:
+        segment = self.segment
+        words, elapsed = self._decode(segment.start, end)
+        agreed = _common_prefix(list(segment.previous_hypothesis), words)
+        if len(agreed) > len(segment.stable):
+            segment.stable = tuple(agreed)
+        segment.previous_hypothesis = tuple(words)
+        segment.last_decode_at = end
+        return {
+            "type": "partial",
+            "segment": segment.index,
+            "text": " ".join(words),
+            "stable": " ".join(segment.stable),
+            "latency_ms": round(elapsed * 1000, 2),
+        }
+
+    def _finalize(self, end: int) -> Dict[str, Any]:
+        segment = self.segment
+        words, elapsed = self._decode(segment.start, end)
+        if segment.continues_previous and self.finals:
+            words = _merge_overlap(self.finals[-1]["text"].split(), words)
+        final = {
+            "type": "final",
+            "segment": segment.index,
+            "text": " ".join(words),
+            "start_ms": segment.start * 1000 // self.sample_rate,
+            "end_ms": end * 1000 // self.sample_rate,
+            "latency_ms": round(elapsed * 1000, 2),
+        }
+        self.finals.append(final)
+        self.segment = None
+        return final
+
+    def push(self, pcm: PCMData) -> List[Dict[str, Any]]:
+        """Append audio and return any partial/final transcript events it produced."""
+        start = self.buffer.total_written
+        self.buffer.write(pcm)
+        end = self.buffer.total_written
+        events = []
+
+        for kind, index in self.vad.process(self.buffer.read(start, end), start):
+            if kind == "start" and self.segment is None:
+                self._open_segment(index - self.pre_roll)
+            elif kind == "end" and self.segment is not None:
+                events.append(self._finalize(index))
+
+        segment = self.segment
+        if segment is not None:
+            if end - segment.start >= self.max_segment:
+                events.append(self._finalize(end))
+                if self.vad.in_speech:
+                    self._open_segment(end - self.overlap, continues_previous=True)
+            elif end - segment.last_decode_at >= self.partial_interval:
+                events.append(self._partial(end))
+        return events
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Finalize any open segment at the end of the stream."""
+        segment = self.segment
+        if segment is None:
+            return []
+        if segment.continues_previous and self.buffer.total_written - segment.start <= self.overlap:
+            self.segment = None  # Nothing beyond the overlap already covered by the previous final
+            return []
+        return [self._finalize(self.buffer.total_written)]
+
+
+class StreamingSTTEngine:
+    """Per-session streaming transcribers held by a bounded SessionManager; model work runs off the event loop."""
+
+    def __init__(
+        self,
+        model: Optional[TranscriptionModel] = None,
+        sample_rate: int = SAMPLE_RATE,
+        sessions: Optional[SessionManager] = None,
+        **options
+    ):
+        self._model = model
+        self.sample_rate = sample_rate
+        self.options = options
+        if sessions is None:
+            sessions = SessionManager.from_env(self._new_transcriber)
+        sessions.factory = self._new_transcriber
+        self.sessions = sessions
+
+    @property
+    def model(self) -> TranscriptionModel:
+        if self._model is not None:
+            return self._model
+        if inference_executor.started and "stt_model" in inference_executor.models:
+            return PooledTranscriptionModel()
+        return providers.get("stt_model")
+
+    def _new_transcriber(self) -> StreamingTranscriber:
+        buffer = AudioRingBuffer(self.sessions.session_bytes // SAMPLE_DTYPE.itemsize, self.sample_rate)
+        return StreamingTranscriber(self.model, buffer=buffer, sample_rate=self.sample_rate, **self.options)
+
+    def session(self, session_id: str, owner: Optional[int] = None) -> StreamingTranscriber:
+        return self.sessions.get(session_id, owner).state
+
+    async def feed(self, session_id: str, pcm: PCMData, owner: Optional[int] = None) -> List[Dict[str, Any]]:
+        session = self.sessions.get(session_id, owner)
+        async with session.lock:
+            return await asyncio.to_thread(session.state.push, pcm)
+
+    def suspend(self, session_id: str) -> bool:
+        """Snapshot an interrupted session so a reconnect with the same id resumes it."""
+        return self.sessions.suspend(session_id)
+
+    async def finish(self, session_id: str, owner: Optional[int] = None) -> Dict[str, Any]:
+        """Finalize and release a session; returns the full transcript and its segments."""
+        session = self.sessions.get(session_id, owner)
+        async with session.lock:
+            events = await asyncio.to_thread(session.state.finish)
+        self.sessions.close(session_id)
+        transcriber = session.state
+        return {
+            "transcript": transcriber.transcript,
+            "segments": transcriber.finals,
+            "events": events,
+            "model_ms": round(transcriber.model_seconds * 1000, 2),
+        }
+
+
+stt_engine = StreamingSTTEngine()
@@ -0,0 +1,119 @@
+"""Rolling per-user conversation summaries.
+
+Older turns are folded into a chain of summary memories (role "system", context kind
+"summary") so a chat prompt can carry one short summary instead of dozens of raw messages.
+Each run takes the turns after the newest `keep_recent` and newer than the previous
+summary's watermark (`context["through"]`, the (timestamp, id) of the newest turn it
+covered). It folds up to `max_batch` of them, together with the previous summary text,
+into a new summary. Runs are skipped until `min_batch` turns are pending. On a user's
+first run, history older than the first batch is not summarized; retrieval still reaches it.
+
+Compaction runs in the background after chat turns, at most one run per user at a time.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .memory_search import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+Summarize = Callable[[Optional[str], List[str]], Awaitable[str]]
+
+
+def watermark(row: Dict[str, Any]) -> Tuple[Any, int]:
+    return parse_timestamp(row["timestamp"]), row["id"]
+
+
+class RollingSummarizer:
+    def __init__(self, memories, summarize: Summarize, keep_recent: int = 10, min_batch: int = 10,
+                 max_batch: int = 40, page_size: int = 50):
+        self.memories = memories  # MemoryService; its store may be swapped after construction
+        self.summarize = summarize
+        self.keep_recent = keep_recent
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.page_size = page_size
+        self.runs = 0
+        self.compacted = 0
+        self.failures = 0
+        self._inflight: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, memories, summarize: Summarize) -> "RollingSummarizer":
+        return cls(
+            memories,
+            summarize,
+            keep_recent=int(os.getenv("SUMMARY_KEEP_RECENT", "10")),
+            min_batch=int(os.getenv("SUMMARY_MIN_BATCH", "10")),
+            max_batch=int(os.getenv("SUMMARY_MAX_BATCH", "40")),
+        )
+
+    async def pending(self, user_id: int, summary: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Turns to fold into the next summary, oldest first."""
+        through = (summary or {}).get("context", {}).get("through")
+        mark = (parse_timestamp(through["timestamp"]), through["id"]) if through else None
+        store = self.memories.store
+        turns = 0
+        batch: List[Dict[str, Any]] = []
+        before = None
+        while len(batch) < self.max_batch:
+            block = await store.fetch_block(user_id, before, self.page_size)
+            for row in block:
+                if mark is not None and watermark(row) <= mark:
+                    return batch[::-1]
+                if row.get("role") == "system":
+                    continue
+                turns += 1
+                if turns > self.keep_recent:
+                    batch.append(row)
+                    if len(batch) == self.max_batch:
+                        break
+            if len(block) < self.page_size:
+                break
+            before = (block[-1]["timestamp"], block[-1]["id"])
+        return batch[::-1]
+
+    async def compact(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Write the next summary for a user if enough turns are pending; returns it."""
+        self.runs += 1
+        previous = await self.memories.store.latest_summary(user_id)
+        batch = await self.pending(user_id, previous)
+        if len(batch) < self.min_batch:
+            return None
+        lines = [f"{row.get('role', 'user')}: {row['message']}" for row in batch]
+        text = await self.summarize(previous["message"] if previous else None, lines)
+        newest = batch[-1]
+        context = {
+            "kind": "summary",
+            "through": {"timestamp": parse_timestamp(newest["timestamp"]).isoformat(), "id": newest["id"]},
+            "covers": len(batch) + ((previous or {}).get("context", {}).get("covers") or 0),
+            "previous": previous["id"] if previous else None,
+        }
+        embedding = await self.memories._generate_embedding(text)
+        summary = await self.memories.store.insert(user_id, text, "system", context, embedding.tolist())
+        self.compacted += len(batch)
+        return summary
+
+    def schedule(self, user_id: int) -> None:
+        if user_id in self._inflight:
+            return
+        self._inflight.add(user_id)
+        task = asyncio.create_task(self._run(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, user_id: int) -> None:
+        try:
+            await self.compact(user_id)
+        except Exception:
+            self.failures += 1
+            logger.exception("summarizing memories for user %s failed", user_id)
+        finally:
+            self._inflight.discard(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"runs": self.runs, "compacted": self.compacted, "failures": self.failures,
+                "in_flight": len(self._inflight)}
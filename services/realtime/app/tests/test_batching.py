@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.batching import MicroBatcher
+from app.providers import _sentiment_pipeline, providers
+from app.services import EmotionService
+
+
+def test_concurrent_requests_share_a_batch():
+    calls = []
+
+    async def double(items):
+        calls.append(list(items))
+        await asyncio.sleep(0.01)
+        return [i * 2 for i in items]
+
+    async def scenario():
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    assert results == [i * 2 for i in range(10)]
+    assert calls[0] == [0, 1, 2, 3]  # Full batch goes out without waiting for the timer
+    assert max(len(c) for c in calls) <= 4
+    assert batcher.stats()["items"] == 10 and batcher.stats()["batches"] == len(calls) < 10
+
+
+def test_single_request_waits_at_most_max_wait():
+    async def identity(items):
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher(identity, max_batch_size=16, max_wait_ms=10)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await batcher.submit("x")
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == "x"
+    assert elapsed < 0.1
+
+
+def test_batch_errors_reach_every_caller():
+    async def broken(items):
+        raise ValueError("model failed")
+
+    async def scenario():
+        batcher = MicroBatcher(broken, max_batch_size=2, max_wait_ms=5)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_emotion_service_batches_pipeline_calls():
+    batches = []
+
+    def pipeline(texts):
+        batches.append(texts)
+        return [{"label": "NEGATIVE" if "bad" in t else "POSITIVE", "score": 0.8} for t in texts]
+
+    providers.register("sentiment", lambda: pipeline)
+    try:
+        service = EmotionService(max_batch_size=8, max_wait_ms=20)
+
+        async def scenario():
+            return await asyncio.gather(
+                service.analyze_emotion("a good day"),
+                service.analyze_emotion("a bad day"),
+                service.analyze_emotion("fine", audio_features={"confidence": 0.4}),
+            )
+
+        good, bad, fused = asyncio.run(scenario())
+    finally:
+        providers.register("sentiment", _sentiment_pipeline)
+
+    assert batches == [["a good day", "a bad day", "fine"]]
+    assert good["mood"] == "happy" and bad["mood"] == "sad"
+    assert fused["confidence"] == pytest.approx(0.6)
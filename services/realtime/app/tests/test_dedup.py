@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.dedup import Deduplicator, hamming, simhash
+from app.services import MemoryService
+from app.tests.test_memory_search import ListStore
+
+
+def reference_simhash(text):
+    """Loop form used by the Django backend; the numpy version must agree bit for bit."""
+    words = text.lower().replace(",", " ").replace("!", " ").split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def test_simhash_matches_reference_and_separates_texts():
+    for text in ["Remind me to call the dentist", "ok, thanks!", "Pick up groceries after work"]:
+        assert simhash(text) == reference_simhash(text)
+    assert hamming(simhash("Remind me to call the dentist"), simhash("remind me to call the dentist!")) == 0
+    assert hamming(simhash("Remind me to call the dentist"), simhash("Pick up groceries after work")) > 10
+    assert simhash("") is None and simhash("🎉 !!") is None
+
+
+def test_non_latin_text_is_fingerprinted():
+    assert simhash("Привет, как дела?") != simhash("Мне нужно к врачу завтра")
+    assert simhash("こんにちは") != simhash("さようなら")
+    assert simhash("Мне нужно к врачу завтра") == simhash("мне нужно к врачу завтра!")
+    store = ListStore([{"id": 1, "message": "🎉🎉", "role": "user", "vector_embedding": None,
+                        "relevance_score": 0.5, "timestamp": datetime.now(timezone.utc).isoformat()}])
+    assert asyncio.run(Deduplicator().find(store, 1, "🎉🎉", "user", None)) is None
+
+
+class TouchStore(ListStore):
+    async def insert(self, user_id, message, role, context, embedding, relevance_score=1.0):
+        memory = {"id": len(self.memories) + 1, "message": message, "role": role, "context": context,
+                  "vector_embedding": np.asarray(embedding), "relevance_score": relevance_score,
+                  "timestamp": datetime.now(timezone.utc).isoformat()}
+        self.memories.insert(0, memory)
+        return memory
+
+    async def touch(self, user_id, memory_id, relevance_bump):
+        memory = next(m for m in self.memories if m["id"] == memory_id)
+        memory["relevance_score"] = min(1.0, memory["relevance_score"] + relevance_bump)
+        memory["timestamp"] = datetime.now(timezone.utc).isoformat()
+        return {"id": memory_id, "relevance_score": memory["relevance_score"], "timestamp": memory["timestamp"]}
+
+
+def test_store_memory_reinforces_near_duplicates():
+    earlier = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+    store = TouchStore([{"id": 1, "message": "Water the plants", "role": "user",
+                         "vector_embedding": np.array([1.0, 0.0]), "relevance_score": 0.5, "timestamp": earlier}])
+    service = MemoryService(store=store)
+    vectors = {"water the plants": np.array([0.99, 0.05]), "water the plants!": np.array([0.0, 1.0])}
+
+    async def embed(text):
+        return vectors.get(text.lower(), np.array([0.7, 0.7]))
+
+    service._generate_embedding = embed
+    merged = asyncio.run(service.store_memory(1, "Water the plants", "user", {}))
+    assert merged["id"] == 1 and merged["relevance_score"] == 0.6 and merged["timestamp"] > earlier
+    # Same text from the assistant, or a distant embedding, is a new memory
+    assert asyncio.run(service.store_memory(1, "Water the plants", "assistant", {}))["id"] == 2
+    assert asyncio.run(service.store_memory(1, "water the plants!", "user", {}))["id"] == 3
+    assert len(store.memories) == 3
+    assert service.stats()["dedup"] == {"checked": 3, "merged": 1, "percent": 33.3}
+
+
+def test_window_zero_disables_dedup():
+    assert asyncio.run(Deduplicator(window=0).find(None, 1, "hi", "user", None)) is None
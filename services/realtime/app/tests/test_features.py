@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.audio import SAMPLE_RATE, AudioRingBuffer
+from app.features import FeatureExtractor
+from app.services import EmotionService
+
+
+def voiced(seconds, pitch_hz=180.0, syllables_per_s=4.0, amplitude=8000):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * syllables_per_s * t))
+    return (amplitude * envelope * np.sin(2 * np.pi * pitch_hz * t)).astype(np.int16)
+
+
+def test_pitch_rate_and_energy_of_synthetic_speech():
+    features = FeatureExtractor().extract([voiced(3.0)])
+    assert features["pitch_hz"] == pytest.approx(180, abs=3)
+    assert 3.0 <= features["speaking_rate"] <= 5.5
+    assert 0 < features["energy"] < 0.25
+    assert 0 < features["confidence"] <= 1 and 0 < features["arousal"] <= 1
+
+
+def test_wrapped_ring_buffer_matches_contiguous_audio():
+    audio = voiced(2.0, pitch_hz=220)
+    buffer = AudioRingBuffer(int(2.5 * SAMPLE_RATE))
+    buffer.write(np.zeros(SAMPLE_RATE, dtype=np.int16))
+    buffer.write(audio)
+    start = buffer.total_written - len(audio)
+    assert len(buffer.views(start, buffer.total_written)) == 2
+
+    extractor = FeatureExtractor()
+    wrapped = extractor.from_buffer(buffer, start)
+    contiguous = extractor.extract([audio])
+    assert wrapped["energy"] == pytest.approx(contiguous["energy"], abs=1e-4)
+    assert wrapped["zcr"] == pytest.approx(contiguous["zcr"], abs=1e-4)
+    assert wrapped["pitch_hz"] == pytest.approx(contiguous["pitch_hz"], abs=1)
+
+
+def test_silence_and_short_input():
+    extractor = FeatureExtractor()
+    assert extractor.extract([np.zeros(100, dtype=np.int16)]) is None
+    assert extractor.extract([np.zeros(SAMPLE_RATE, dtype=np.int16)])["voiced_ratio"] == 0.0
+
+
+def test_fusion_uses_arousal_for_negative_text():
+    service = EmotionService()
+    negative = {"label": "NEGATIVE", "score": 0.9}
+    stressed = service._combine_emotion_signals(negative, {"arousal": 0.8, "confidence": 0.7})
+    tired = service._combine_emotion_signals(negative, {"arousal": 0.1, "confidence": 0.7})
+    assert stressed["mood"] == "stressed" and stressed["indicators"]["energy_level"] == 8
+    assert tired["mood"] == "tired"
+    assert stressed["confidence"] == pytest.approx(0.8)
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.inference import InferenceExecutor, InferenceSaturated, InferenceTimeout
+from app.providers import providers
+
+
+class SlowModel:
+    """CPU-bound stand-in: spins for `seconds` while holding the GIL."""
+
+    def __call__(self, seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+        return os.getpid()
+
+
+@pytest.fixture
+def executor():
+    providers.register("slow_model", SlowModel)
+    executor = InferenceExecutor(workers=2, models=["slow_model"], max_inflight=2, timeout=5)
+    executor.start()
+    yield executor
+    executor.shutdown()
+    providers.reset("slow_model")
+
+
+def test_inference_runs_off_the_event_loop(executor):
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        pids = await asyncio.gather(executor.run("slow_model", 0.3), executor.run("slow_model", 0.3))
+        task.cancel()
+        return ticks, pids
+
+    ticks, pids = asyncio.run(scenario())
+    assert ticks >= 10  # The loop kept ticking while both workers were busy
+    assert len(set(pids)) == 2 and os.getpid() not in pids
+
+
+def test_saturation_and_timeout(executor):
+    async def scenario():
+        first = asyncio.ensure_future(executor.run("slow_model", 0.5))
+        second = asyncio.ensure_future(executor.run("slow_model", 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceSaturated):
+            await executor.run("slow_model", 0.1)
+        await asyncio.gather(first, second)
+        with pytest.raises(InferenceTimeout):
+            await executor.run("slow_model", 1.0, timeout=0.1)
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["timeouts"] == 1
+
+
+def test_health_check_reports_each_worker(executor):
+    report = asyncio.run(executor.health_check())
+    assert [w["worker"] for w in report] == [0, 1]
+    assert all(w["healthy"] and w["pid"] for w in report)
+    # Preloaded in the parent, so workers inherit the loaded model over fork
+    assert all("slow_model" in w["loaded"] for w in report)
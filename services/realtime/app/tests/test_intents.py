@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+
+from app.intents import IntentRouter, actions_for
+from app.services import AIService
+from app.tests.test_prompting import stubbed_openai
+
+
+@pytest.fixture
+def router():
+    calls = []
+
+    async def llm(text, labels):
+        calls.append(text)
+        await asyncio.sleep(0.02)
+        return "query"
+
+    router = IntentRouter(llm=llm)
+    router.llm_calls = calls
+    return router
+
+
+@pytest.mark.parametrize("text,intent,slots", [
+    ("add a task to buy groceries", "add_task", {"title": "buy groceries"}),
+    ("remind me to call the dentist", "add_task", {"title": "call the dentist"}),
+    ("start a focus session for 45 minutes", "start_focus", {"minutes": 45}),
+    ("snooze for ten minutes", "snooze_reminder", {"minutes": 10}),
+    ("ok, please postpone that reminder for 5 minutes", "snooze_reminder", {"minutes": 5}),
+    ("remind me in 2 hours", "snooze_reminder", {"minutes": 120}),
+    ("log my mood as 7", "log_mood", {"level": 7}),
+    ("I'm feeling a bit anxious", "log_mood", {"feeling": "a bit anxious"}),
+    ("ok, start focus mode", "start_focus", {}),
+])
+def test_grammars_extract_slots(router, text, intent, slots):
+    result = router.classify_local(text)
+    assert (result.intent, result.source, result.slots) == (intent, "grammar", slots)
+
+
+@pytest.mark.parametrize("text", [
+    "I need to vent about work",
+    "we postponed the trip",
+    "we need to postpone the trip",
+    "I was going to add a task but forgot",
+    "how do I start focus mode?",
+    "is it time to focus yet",
+    "how often do I log my mood",
+    "what did I record my mood as yesterday",
+    "my mood log from last week",
+])
+def test_broad_or_mid_sentence_phrasings_are_not_grammar_hits(router, text):
+    result = router.classify_local(text)
+    assert result is None or result.source != "grammar"
+
+
+def test_broad_grammar_supplies_slots_once_the_llm_agrees():
+    async def llm(text, labels):
+        return "add_task" if "milk" in text else "query"
+
+    router = IntentRouter(llm=llm)
+    task = asyncio.run(router.classify("I need to buy milk"))
+    assert (task.intent, task.source, task.slots) == ("add_task", "llm", {"title": "buy milk"})
+    vent = asyncio.run(router.classify("I need to vent about work"))
+    assert (vent.intent, vent.slots) == ("query", {})
+
+
+def test_centroid_catches_paraphrases(router):
+    result = router.classify_local("block distractions, let's do a pomodoro")
+    assert result is not None and result.source == "centroid" and result.intent == "start_focus"
+
+
+def test_unsure_utterances_fall_back_to_llm_and_stats_count_hits(router):
+    texts = ["add a task to water plants", "start focus", "what's the capital of peru"]
+    results = [asyncio.run(router.classify(t)) for t in texts]
+    assert [r.source for r in results] == ["grammar", "grammar", "llm"]
+    assert router.llm_calls == ["what's the capital of peru"]
+
+    stats = router.stats()
+    assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-3)
+    assert stats["mean_llm_ms"] >= 20
+    assert stats["latency_saved_ms"] > 30  # Two LLM round trips avoided
+
+
+def test_llm_failures_are_recorded_as_fallbacks():
+    async def llm(text, labels):
+        raise RuntimeError("LLM unavailable")
+
+    router = IntentRouter(llm=llm)
+    result = asyncio.run(router.classify("what's the capital of peru"))
+    assert (result.intent, result.source) == ("query", "fallback")
+    stats = router.stats()
+    assert (stats["llm"], stats["fallback"], stats["hit_rate"]) == (0, 1, 0.0)
+
+
+def test_llm_fallback_goes_through_the_v1_client():
+    client, requests = stubbed_openai(" Start_Focus\n")
+    router = IntentRouter(llm=AIService(client).classify_intent)
+    result = asyncio.run(router.classify("what's the capital of peru"))
+    assert (result.intent, result.source) == ("start_focus", "llm")
+    assert [r.url.path for r in requests] == ["/v1/chat/completions"]
+
+
+def test_local_classification_is_sub_millisecond(router):
+    texts = ["add a task to buy milk", "i feel great today", "tell me a joke about databases"] * 100
+    started = time.perf_counter()
+    for text in texts:
+        router.classify_local(text)
+    assert (time.perf_counter() - started) / len(texts) < 1e-3
+
+
+def test_actions_for_intents():
+    assert actions_for("start_focus", {}) == [{"action": "start_focus", "minutes": 25}]
+    assert actions_for("add_task", {"title": "stretch"}) == [{"action": "create_task", "title": "stretch"}]
+    assert actions_for("query", {}) == []
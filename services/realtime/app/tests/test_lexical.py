@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.lexical import BM25Index, MemoryLexicon, looks_like_keywords, tokenize
+from app.services import MemoryService
+from app.tests.test_memory_search import ListStore
+
+MESSAGES = [
+    "Remind me to call the dentist on Friday",
+    "I finished the quarterly budget report",
+    "Feeling anxious about the budget meeting",
+    "Pick up groceries after work",
+    "Dentist appointment moved to Monday",
+    "Went for a run and felt great",
+]
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("Call THE dentist, it's Friday!") == ["call", "dentist", "it's", "friday"]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("dentist", True),
+    ("budget report", True),
+    ('"quarterly budget"', True),
+    ("what did I say about the dentist", False),
+    ("how am I feeling lately", False),
+    ("", False),
+])
+def test_keyword_detection(query, expected):
+    assert looks_like_keywords(query) is expected
+
+
+def test_non_ascii_memories_are_searchable():
+    assert tokenize("Straße zum Café, Встреча") == ["strasse", "zum", "café", "встреча"]
+    index = BM25Index().extend(enumerate([*MESSAGES, "Встреча с врачом в пятницу", "Rendez-vous au café"]))
+    assert index.search("встреча", 3)[0][1] == 6
+    assert index.search("CAFÉ", 3)[0][1] == 7
+
+
+def test_bm25_prefers_rarer_and_denser_terms():
+    index = BM25Index().extend(enumerate(MESSAGES))
+    ranked = [doc for _, doc in index.search("dentist friday", 3)]
+    assert ranked[0] == 0 and set(ranked[:2]) == {0, 4}
+    assert index.search("nonexistent", 3) == []
+
+
+def test_incremental_updates_match_a_fresh_build():
+    incremental = BM25Index().extend(enumerate(MESSAGES))
+    incremental.remove(2)
+    incremental.add(1, "Budget report sent to finance")
+    incremental.add(9, "Budget review with the team")
+    fresh = BM25Index().extend([
+        (0, MESSAGES[0]), (1, "Budget report sent to finance"), (3, MESSAGES[3]),
+        (4, MESSAGES[4]), (5, MESSAGES[5]), (9, "Budget review with the team"),
+    ])
+    assert incremental.scores("budget team") == pytest.approx(fresh.scores("budget team"))
+    assert incremental.total_length == fresh.total_length
+
+
+def memories_with_text():
+    now = datetime.now(timezone.utc)
+    rng = np.random.default_rng(1)
+    return [
+        {"id": i, "message": text, "vector_embedding": rng.normal(size=8), "relevance_score": 1.0,
+         "timestamp": (now - timedelta(days=i)).isoformat()}
+        for i, text in enumerate(MESSAGES)
+    ]
+
+
+def service_for(memories):
+    service = MemoryService(store=ListStore(memories))
+    calls = []
+
+    async def embed(text):
+        calls.append(text)
+        return np.asarray(memories[5]["vector_embedding"])  # vector-nearest memory is the run
+
+    service._generate_embedding = embed
+    return service, calls
+
+
+def test_lexical_mode_skips_embedding():
+    service, calls = service_for(memories_with_text())
+    results, stats = asyncio.run(service.search_memories(1, "dentist", 2, mode="lexical"))
+    assert [m["id"] for m in results] == [0, 4] and stats.scanned == 2
+    assert calls == []
+
+
+def test_auto_mode_routes_by_query_shape():
+    service, calls = service_for(memories_with_text())
+    results = asyncio.run(service.query_relevant_memories(1, "groceries", 1, mode="auto"))
+    assert [m["id"] for m in results] == [3] and calls == []
+    results = asyncio.run(service.query_relevant_memories(1, "how was my run last week", 1, mode="auto"))
+    assert [m["id"] for m in results] == [5] and len(calls) == 1
+    # Keyword-like but no keyword hits: falls back to vectors
+    asyncio.run(service.query_relevant_memories(1, "zebra", 1, mode="auto"))
+    assert len(calls) == 2
+    assert set(service.stats()["modes"]) == {"lexical", "early"}
+
+
+def test_hybrid_mode_surfaces_keyword_matches():
+    service, _ = service_for(memories_with_text())
+    results = asyncio.run(service.query_relevant_memories(1, "budget", 3, mode="hybrid"))
+    ids = [m["id"] for m in results]
+    assert 5 in ids and {1, 2} & set(ids)
+
+
+def test_store_memory_updates_a_built_lexicon():
+    memories = memories_with_text()
+    service, _ = service_for(memories)
+
+    async def insert(user_id, message, role, context, embedding, relevance_score=1.0):
+        return {"id": 99, "message": message, "vector_embedding": embedding, "relevance_score": 1.0,
+                "timestamp": datetime.now(timezone.utc).isoformat()}
+
+    service.store.insert = insert
+    asyncio.run(service.user_lexicon(1))
+    asyncio.run(service.store_memory(1, "Renew passport before June", "user", {}))
+    results = asyncio.run(service.query_relevant_memories(1, "passport", 1, mode="lexical"))
+    assert [m["id"] for m in results] == [99] and isinstance(service.lexicons[1], MemoryLexicon)
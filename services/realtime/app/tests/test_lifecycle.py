@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.lifecycle import ModelLifecycle
+from app.providers import providers
+
+
+class SlowModel:
+    def __init__(self):
+        time.sleep(0.05)
+
+
+def broken_model():
+    raise RuntimeError("weights missing")
+
+
+def test_models_load_in_background_and_gate_readiness():
+    providers.register("slow_a", SlowModel)
+    providers.register("slow_b", SlowModel)
+    lifecycle = ModelLifecycle(["slow_a", "slow_b"])
+
+    async def scenario():
+        task = lifecycle.start()
+        await asyncio.sleep(0)
+        before = lifecycle.report()
+        await task
+        return before, lifecycle.report()
+
+    before, after = asyncio.run(scenario())
+    assert not before["ready"]
+    assert after["ready"] and after["cold_start_ms"] is not None
+    assert {m["status"] for m in after["models"].values()} == {"ready"}
+    assert all(m["load_ms"] >= 50 for m in after["models"].values())
+
+
+def test_failed_required_model_keeps_replica_unready():
+    providers.register("broken", broken_model)
+    providers.register("slow_c", SlowModel)
+    lifecycle = ModelLifecycle(["slow_c", "broken"], required=["broken"])
+    asyncio.run(lifecycle._load_all())
+
+    report = lifecycle.report()
+    assert not report["ready"]
+    assert report["models"]["broken"]["status"] == "failed"
+    assert "weights missing" in report["models"]["broken"]["error"]
+    assert report["models"]["slow_c"]["status"] == "ready"
+
+
+def test_health_endpoints(monkeypatch):
+    providers.register("broken", broken_model)
+    monkeypatch.setattr(main, "model_lifecycle", ModelLifecycle(["broken"]))
+    with TestClient(main.app) as client:
+        assert client.get("/health/live").status_code == 200
+        for _ in range(50):
+            response = client.get("/health/ready")
+            if response.json()["models"]["broken"]["status"] == "failed":
+                break
+            time.sleep(0.01)
+        assert response.status_code == 503
+        assert response.json()["models"]["broken"]["status"] == "failed"
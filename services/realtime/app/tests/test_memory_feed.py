@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.memory_feed import ChangeFeedTailer
+from app.services import MemoryService
+from app.tests.test_lexical import memories_with_text
+from app.tests.test_memory_search import ListStore
+
+
+class JournalStore(ListStore):
+    """ListStore plus a MemoryChange-style journal whose entries can be made visible out of order."""
+
+    def __init__(self, memories):
+        super().__init__(memories)
+        self.journal = []
+        self.seq = 0
+        self.full_reads = 0
+
+    async def fetch_for_search(self, user_id):
+        self.full_reads += 1
+        return await super().fetch_for_search(user_id)
+
+    def record(self, memory_id, op, visible=True):
+        self.seq += 1
+        entry = {"seq": self.seq, "user_id": 1, "memory_id": memory_id, "op": op,
+                 "created_at": datetime.now(timezone.utc).isoformat(), "visible": visible}
+        self.journal.append(entry)
+        return entry
+
+    def write(self, memory, visible=True):
+        self.memories = [m for m in self.memories if m["id"] != memory["id"]]
+        self.memories.insert(0, memory)
+        return self.record(memory["id"], "upsert", visible)
+
+    def delete(self, memory_id):
+        self.memories = [m for m in self.memories if m["id"] != memory_id]
+        return self.record(memory_id, "delete")
+
+    async def fetch_changes(self, after, limit=500):
+        visible = [e for e in self.journal if e["visible"]]
+        latest = max((e["seq"] for e in visible), default=0)
+        if after is None:
+            return latest, []
+        return latest, [e for e in visible if e["seq"] > after][:limit]
+
+
+def memory(memory_id, message):
+    return {"id": memory_id, "message": message, "role": "user", "vector_embedding": np.ones(8),
+            "relevance_score": 1.0, "timestamp": datetime.now(timezone.utc).isoformat()}
+
+
+def setup():
+    store = JournalStore(memories_with_text())
+    store.record(0, "upsert")  # history before the tailer starts
+    service = MemoryService(store=store)
+    service.change_feed = tailer = ChangeFeedTailer(service, interval_s=0.01)
+    asyncio.run(service.user_lexicon(1))
+    asyncio.run(service.user_index(1))
+    asyncio.run(tailer.poll_once())
+    return store, service, tailer
+
+
+def lexical_ids(service, query):
+    return [m["id"] for m in asyncio.run(service.query_relevant_memories(1, query, 5, mode="lexical"))]
+
+
+def test_tailer_applies_inserts_updates_and_deletes():
+    store, service, tailer = setup()
+    assert tailer.cursor == 1
+    store.write(memory(10, "Renew passport before June"))
+    groceries = next(m for m in store.memories if m["id"] == 3)
+    store.write({**groceries, "message": "Pick up the passport photos"})
+    store.delete(0)
+    assert asyncio.run(tailer.poll_once()) == 3
+    assert sorted(lexical_ids(service, "passport")) == [3, 10]
+    assert lexical_ids(service, "groceries") == []
+    assert 0 not in service.indexes[1].ids and 10 in service.indexes[1].ids
+    assert tailer.cursor == 4 and tailer.stats()["lag_s"] is not None
+
+
+def test_healthy_feed_suppresses_ttl_rebuilds():
+    store, service, tailer = setup()
+    service.index_ttl_s = 0
+    asyncio.run(service.user_lexicon(1))
+    assert store.full_reads == 2  # one per index type at setup, none since
+    tailer.last_ok_at = None  # feed down: fall back to the TTL
+    asyncio.run(service.user_lexicon(1))
+    assert store.full_reads == 3
+
+
+def test_late_commits_behind_a_gap_are_not_skipped():
+    now = [0.0]
+    store, service, tailer = setup()
+    tailer.clock = lambda: now[0]
+    late = store.write(memory(20, "Book flights to Lisbon"), visible=False)
+    store.write(memory(21, "Lisbon hotel shortlist"))
+    asyncio.run(tailer.poll_once())
+    assert lexical_ids(service, "lisbon") == [21] and tailer.cursor == late["seq"] - 1
+
+    late["visible"] = True
+    asyncio.run(tailer.poll_once())
+    assert sorted(lexical_ids(service, "lisbon")) == [20, 21] and tailer.cursor == late["seq"] + 1
+
+    # A rolled-back transaction's seq never appears; the gap expires
+    store.write(memory(22, "Rolled back"), visible=False)
+    store.write(memory(23, "Committed"))
+    asyncio.run(tailer.poll_once())
+    now[0] += 11
+    asyncio.run(tailer.poll_once())
+    assert tailer.cursor == store.seq and not tailer.gaps
+
+
+def test_users_without_resident_indexes_are_skipped():
+    store, service, tailer = setup()
+    service.lexicons.clear()
+    service.indexes.clear()
+    reads = store.rows_read
+    store.write(memory(30, "Unindexed"))
+    asyncio.run(tailer.poll_once())
+    assert store.rows_read == reads and not service.lexicons
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.memory_search import exhaustive_search, search_time_decay
+from app.services import MemoryService
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+class ListStore:
+    """In-memory store with the keyset semantics of the Postgres/HTTP backends."""
+
+    def __init__(self, memories):
+        self.memories = sorted(memories, key=lambda m: (m["timestamp"], m["id"]), reverse=True)
+        self.rows_read = 0
+
+    async def fetch_for_search(self, user_id):
+        self.rows_read += len(self.memories)
+        return list(self.memories)
+
+    async def fetch_block(self, user_id, before, limit):
+        rows = self.memories
+        if before is not None:
+            rows = [m for m in rows if (m["timestamp"], m["id"]) < tuple(before)]
+        self.rows_read += len(rows[:limit])
+        return rows[:limit]
+
+    async def max_relevance(self, user_id):
+        return max(m["relevance_score"] for m in self.memories)
+
+    async def fetch_by_ids(self, user_id, ids):
+        wanted = set(ids)
+        rows = [m for m in self.memories if m["id"] in wanted]
+        self.rows_read += len(rows)
+        return rows
+
+
+def corpus(n=2000, dim=32, days=365, seed=7):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return [
+        {
+            "id": i,
+            "message": f"memory {i}",
+            "vector_embedding": vectors[i],
+            "relevance_score": float(rng.uniform(0.2, 1.0)),
+            "timestamp": (NOW - timedelta(days=float(rng.uniform(0, days)))).isoformat(),
+        }
+        for i in range(n)
+    ], rng.normal(size=dim)
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_early_termination_matches_exhaustive_scan(k):
+    memories, query = corpus()
+    store = ListStore(memories)
+    ranked, stats = asyncio.run(search_time_decay(store, 1, query, k, decay_rate=0.1, block_size=64, now=NOW))
+    expected = exhaustive_search(memories, query, k, decay_rate=0.1, now=NOW)
+    assert [m["id"] for _, m in ranked] == [m["id"] for _, m in expected]
+    assert [s for s, _ in ranked] == pytest.approx([s for s, _ in expected])
+    assert stats.terminated_early and stats.scanned < len(memories) // 4
+
+
+def test_walk_reads_everything_when_decay_is_off():
+    memories, query = corpus(n=300)
+    store = ListStore(memories)
+    ranked, stats = asyncio.run(search_time_decay(store, 1, query, 5, decay_rate=0.0, block_size=64, now=NOW))
+    assert not stats.terminated_early and stats.scanned == 300
+    assert [m["id"] for _, m in ranked] == [m["id"] for _, m in exhaustive_search(memories, query, 5, 0.0, NOW)]
+
+
+def test_service_modes_agree_and_skip_old_rows():
+    memories, query = corpus()
+    store = ListStore(memories)
+    service = MemoryService(store=store)
+
+    async def embed(text):
+        return query
+
+    service._generate_embedding = embed
+    # Corpus timestamps are relative to NOW, a fixed date; shift them to the real clock
+    shift = datetime.now(timezone.utc) - NOW
+    for m in store.memories:
+        m["timestamp"] = (datetime.fromisoformat(m["timestamp"]) + shift).isoformat()
+
+    exhaustive, exhaustive_stats = asyncio.run(service.search_memories(1, "q", 5, mode="exhaustive"))
+    early, early_stats = asyncio.run(service.search_memories(1, "q", 5, mode="early"))
+    assert [m["id"] for m in early] == [m["id"] for m in exhaustive]
+    assert early_stats.scanned < exhaustive_stats.scanned == len(memories)
+
+
+def test_search_endpoint_returns_memories_without_embeddings(monkeypatch):
+    from app.main import app
+    from app.services import memory_service
+
+    memories, query = corpus(n=200)
+    monkeypatch.setattr(memory_service, "store", ListStore(memories))
+
+    async def embed(text):
+        return query
+
+    monkeypatch.setattr(memory_service, "_generate_embedding", embed)
+    monkeypatch.setenv("MEMORY_FEED_TOKEN", "s3cret")
+    client = TestClient(app, headers={"X-Service-Token": "s3cret"})
+    response = client.post("/memory/search", json={"user_id": 1, "query": "walk", "limit": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body) == 3 and all("vector_embedding" not in m for m in body)
+    assert int(response.headers["X-Memory-Scanned"]) <= 200
+
+    response = client.post("/memory/search", json={"user_id": 1, "query": "walk", "mode": "fastest"})
+    assert response.status_code == 400
+
+
+def test_search_endpoint_requires_service_token(monkeypatch):
+    from app.main import app
+
+    client = TestClient(app)
+    monkeypatch.delenv("MEMORY_FEED_TOKEN", raising=False)
+    assert client.post("/memory/search", json={"user_id": 1, "query": "walk"}).status_code == 401
+    monkeypatch.setenv("MEMORY_FEED_TOKEN", "s3cret")
+    assert client.post("/memory/search", json={"user_id": 1, "query": "walk"}).status_code == 401
+    response = client.post("/memory/search", json={"user_id": 1, "query": "walk"}, headers={"X-Service-Token": "guess"})
+    assert response.status_code == 401
@@ -47,11 +47,11 @@ def mock_httpx_client():
     """Mock httpx client for Django API calls."""
     with patch("httpx.AsyncClient") as mock:
         client = AsyncMock()
-        client.post = AsyncMock(return_value=AsyncMock(
+        client.post = AsyncMock(return_value=MagicMock(
             json=lambda: TEST_MEMORY,
             status_code=201
         ))
-        client.get = AsyncMock(return_value=AsyncMock(
+        client.get = AsyncMock(return_value=MagicMock(
             json=lambda: [TEST_MEMORY],
             status_code=200
         ))
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import uuid
+
+import httpx
+import numpy as np
+import pytest
+
+from app import memory_store
+from app.memory_store import HttpMemoryStore, PostgresMemoryStore, create_memory_store, parse_vector
+from app.services import MemoryService
+
+
+def test_backend_selection(monkeypatch):
+    assert isinstance(create_memory_store("http://django"), HttpMemoryStore)
+    monkeypatch.setenv("MEMORY_BACKEND", "postgres")
+    monkeypatch.setenv("MEMORY_DATABASE_URL", "postgresql://u:p@db:5432/chaos")
+    store = create_memory_store("http://django")
+    assert isinstance(store, PostgresMemoryStore) and store.dsn.endswith("/chaos")
+    with pytest.raises(ValueError):
+        create_memory_store("http://django", backend="sqlite")
+
+
+def stub_django(monkeypatch, handler):
+    """Route HttpMemoryStore's requests to `handler` instead of the network."""
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(memory_store.httpx, "AsyncClient",
+                        lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+
+
+def test_http_touch_authenticates_and_raises_on_errors(monkeypatch):
+    monkeypatch.setenv("MEMORY_FEED_TOKEN", "s3cret")
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if request.url.path.startswith("/api/v1/memories/404/"):
+            return httpx.Response(404, json={"detail": "Not found."})
+        return httpx.Response(200, json={"id": 7, "relevance_score": 0.6, "timestamp": "2026-01-01T00:00:00Z"})
+
+    stub_django(monkeypatch, handler)
+    store = HttpMemoryStore("http://django")
+    touched = asyncio.run(store.touch(3, 7, 0.1))
+    assert touched["relevance_score"] == 0.6
+    assert seen[0].headers["X-Service-Token"] == "s3cret"
+    assert json.loads(seen[0].content) == {"bump": 0.1, "user": 3}
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(store.touch(3, 404, 0.1))
+
+
+def test_parse_vector_reads_jsonb_text():
+    vector = parse_vector("[0.5, -1.25, 3e-2]")
+    assert vector.dtype == np.float32
+    assert vector.tolist() == pytest.approx([0.5, -1.25, 0.03])
+    assert parse_vector(None) is None and parse_vector("null") is None
+
+
+def test_query_scores_array_embeddings_from_store():
+    class ArrayStore:
+        async def fetch_for_search(self, user_id):
+            return [
+                {"id": 1, "vector_embedding": np.array([1, 0], dtype=np.float32), "relevance_score": 1.0,
+                 "timestamp": "2026-01-01T00:00:00+00:00"},
+                {"id": 2, "vector_embedding": None, "relevance_score": 1.0,
+                 "timestamp": "2026-01-01T00:00:00+00:00"},
+            ]
+
+    service = MemoryService(store=ArrayStore())
+
+    async def embed(text):
+        return np.array([1.0, 0.0])
+
+    service._generate_embedding = embed
+    results = asyncio.run(service.query_relevant_memories(1, "hello"))
+    assert [m["id"] for m in results] == [1]
+
+
+@pytest.mark.skipif(not os.getenv("MEMORY_DATABASE_URL"), reason="needs a Postgres database with the api schema")
+def test_postgres_store_round_trip():
+    pytest.importorskip("asyncpg")
+    store = PostgresMemoryStore(os.environ["MEMORY_DATABASE_URL"])
+    user_id = int(os.getenv("MEMORY_TEST_USER_ID", "1"))
+    message = f"store test {uuid.uuid4().hex}"
+
+    async def scenario():
+        try:
+            inserted = await store.insert(user_id, message, "user", {"source": "test"}, [0.1, 0.2])
+            rows = await store.fetch_for_search(user_id)
+            return inserted, rows
+        finally:
+            await store.close()
+
+    inserted, rows = asyncio.run(scenario())
+    row = next(r for r in rows if r["id"] == inserted["id"])
+    assert row["message"] == message
+    assert row["vector_embedding"].tolist() == pytest.approx([0.1, 0.2])
+    assert "context" not in row  # Search reads only the columns it scores on
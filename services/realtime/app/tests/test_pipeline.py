@@ -0,0 +1,118 @@
+import asyncio
+import base64
+import time
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.completion import completion_graph, intent_router
+from app.main import app, verify_token
+from app.pipeline import PipelineError, Stage, StageGraph
+from app.providers import _sentiment_pipeline, providers
+from app.stt import FakeTranscriptionModel, stt_engine
+from app.tests.test_stt import silence, speech
+
+
+def sleeper(seconds, value):
+    async def fn(ctx):
+        await asyncio.sleep(seconds)
+        return value
+    return fn
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph([
+        Stage("transcript", sleeper(0.10, "hello")),
+        Stage("features", sleeper(0.10, {"pitch": 0.4})),
+        Stage("emotion", sleeper(0.05, "calm"), deps=("transcript", "features")),
+        Stage("intent", sleeper(0.05, "query"), deps=("transcript",)),
+        Stage("memories", sleeper(0.05, []), deps=("transcript",)),
+        Stage("actions", sleeper(0.05, []), deps=("intent",)),
+    ])
+    finished = []
+
+    async def on_result(result):
+        finished.append(result.name)
+
+    started = time.perf_counter()
+    run = asyncio.run(graph.run(on_result=on_result))
+    elapsed = time.perf_counter() - started
+
+    # Critical path is 0.10 + 0.05 + 0.05; the sequential sum would be 0.40
+    assert elapsed < 0.3
+    assert finished[-1] == "actions" and set(finished[:2]) == {"transcript", "features"}
+    assert graph.critical_path(run)[0] in ("transcript", "features")
+    assert graph.critical_path(run)[-1] == "actions"
+
+
+def test_suggested_actions_do_not_wait_for_the_memory_lookup():
+    stubs = {
+        "transcript": sleeper(0, {"transcript": "add a task to stretch"}),
+        "features": sleeper(0, None),
+        "emotion": sleeper(0, None),
+        "intent": sleeper(0, {"intent": "add_task", "slots": {"title": "stretch"}}),
+        "memories": sleeper(0.3, []),
+    }
+    graph = StageGraph([replace(stage, fn=stubs.get(name, stage.fn)) for name, stage in completion_graph.stages.items()])
+    run = asyncio.run(graph.run())
+    assert run.value("actions") == [{"action": "create_task", "title": "stretch"}]
+    assert run.results["actions"].finished_ms < run.results["memories"].finished_ms - 200
+
+
+def test_stage_deadline_falls_back_to_default():
+    graph = StageGraph([
+        Stage("transcript", sleeper(0, "hi"), required=True),
+        Stage("memories", sleeper(1.0, ["slow"]), deps=("transcript",), timeout=0.05, default=[]),
+    ])
+    run = asyncio.run(graph.run())
+    assert run.results["memories"].status == "timeout"
+    assert run.value("memories") == []
+    assert run.total_ms < 500
+
+
+def test_required_stage_failure_skips_dependents_and_raises():
+    async def boom(ctx):
+        raise ValueError("no audio")
+
+    graph = StageGraph([
+        Stage("transcript", boom, required=True),
+        Stage("intent", sleeper(0, "query"), deps=("transcript",)),
+    ])
+    with pytest.raises(PipelineError):
+        asyncio.run(graph.run())
+
+
+def test_graph_rejects_cycles():
+    with pytest.raises(PipelineError):
+        StageGraph([Stage("a", sleeper(0, 1), deps=("b",)), Stage("b", sleeper(0, 1), deps=("a",))])
+
+
+def test_complete_endpoint_reports_stage_timings(monkeypatch):
+    monkeypatch.setattr(stt_engine, "_model", FakeTranscriptionModel())
+
+    async def llm(text, labels):
+        return "query"
+
+    monkeypatch.setattr(intent_router, "llm", llm)
+    app.dependency_overrides[verify_token] = lambda: {}
+    providers.register("sentiment", lambda: lambda texts: [{"label": "POSITIVE", "score": 0.9} for _ in texts])
+    try:
+        client = TestClient(app)
+        audio = np.concatenate([silence(0.2), speech(1.0)]).tobytes()
+        response = client.post("/voice/complete/", json={
+            "session_id": "pipeline",
+            "final_chunk": base64.b64encode(audio).decode(),
+        })
+    finally:
+        app.dependency_overrides.pop(verify_token, None)
+        providers.register("sentiment", _sentiment_pipeline)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["transcript"].startswith("remind me")
+    assert set(body["timings"]) == {"transcript", "features", "emotion", "intent", "memories", "actions"}
+    assert body["memories"] == []  # No user id, so the lookup is skipped
+    assert body["emotion"]["mood"] == "happy" and body["emotion"]["indicators"]["pitch_hz"] > 0
+    assert all(t["status"] == "ok" for t in body["timings"].values())
@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.memory_search import exhaustive_search
+from app.projection import ProjectedStore, Projection, ProjectionRegistry, Reprojector
+from app.services import MemoryService
+from app.tests.test_memory_search import ListStore
+
+
+class ProjectingStore(ListStore):
+    """ListStore that accepts projection reads and backfills like the real backends."""
+
+    async def fetch_block(self, user_id, before, limit, projection_version=None):
+        return await super().fetch_block(user_id, before, limit)
+
+    async def fetch_unprojected(self, version, after_id, limit):
+        rows = sorted((m for m in self.memories if m["id"] > after_id and m.get("projection_version") != version),
+                      key=lambda m: m["id"])
+        return [{"id": m["id"], "vector_embedding": m["vector_embedding"]} for m in rows[:limit]]
+
+    async def set_reduced(self, version, rows):
+        by_id = {m["id"]: m for m in self.memories}
+        for memory_id, reduced in rows:
+            by_id[memory_id].update(reduced_embedding=reduced, projection_version=version)
+        return len(rows)
+
+
+def low_rank_corpus(n=1500, dim=64, rank=12, seed=3):
+    """Embeddings near a low-rank subspace, like real sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(rank, dim))
+    vectors = (rng.normal(size=(n, rank)) @ basis + 0.05 * rng.normal(size=(n, dim))).astype(np.float32)
+    now = datetime.now(timezone.utc)
+    memories = [
+        {"id": i + 1, "message": f"memory {i}", "vector_embedding": vectors[i],
+         "relevance_score": float(rng.uniform(0.3, 1.0)),
+         "timestamp": (now - timedelta(days=float(rng.uniform(0, 120)))).isoformat()}
+        for i in range(n)
+    ]
+    queries = rng.normal(size=(10, rank)) @ basis
+    return memories, vectors, queries
+
+
+def service_with(memories, projection):
+    service = MemoryService(store=ProjectingStore(memories))
+    service.projection = projection
+    service.search_block_size = 128
+    return service
+
+
+def test_pca_keeps_inner_products_and_round_trips(tmp_path):
+    _, vectors, _ = low_rank_corpus()
+    projection = Projection.fit_pca("pca16-v1", vectors, 16)
+    assert projection.retained > 0.99
+    full = vectors[:50] / np.linalg.norm(vectors[:50], axis=1, keepdims=True)
+    reduced = projection.apply(vectors[:50])
+    assert np.abs(reduced @ reduced.T - full @ full.T).max() < 0.05
+
+    registry = ProjectionRegistry(str(tmp_path))
+    registry.save(projection)
+    with pytest.raises(FileExistsError):
+        registry.save(projection)
+    loaded = registry.load("pca16-v1")
+    assert registry.versions() == ["pca16-v1"]
+    assert np.allclose(loaded.apply(vectors[:5]), reduced[:5])
+
+    truncated = Projection.truncate("t8", 64, 8).apply(vectors[0])
+    assert truncated.shape == (8,) and np.isclose(np.linalg.norm(truncated), 1.0)
+    with pytest.raises(ValueError):
+        projection.apply(np.ones(32))
+
+
+def test_projected_store_prefers_current_stored_vectors():
+    projection = Projection.truncate("t2", 4, 2)
+    rows = [
+        {"id": 1, "vector_embedding": np.array([3.0, 4.0, 9.0, 9.0]), "timestamp": "2026-01-03T00:00:00+00:00"},
+        {"id": 2, "vector_embedding": None, "reduced_embedding": [0.0, 1.0], "projection_version": "t2",
+         "timestamp": "2026-01-02T00:00:00+00:00"},
+        {"id": 3, "vector_embedding": None, "timestamp": "2026-01-01T00:00:00+00:00"},
+    ]
+    reduced = ProjectedStore(None, projection).reduce(rows)
+    assert [row["id"] for row in reduced] == [1, 2, 3]
+    assert np.allclose(reduced[0]["vector_embedding"], [0.6, 0.8])
+    assert np.allclose(reduced[1]["vector_embedding"], [0.0, 1.0])
+
+
+def test_precision_trades_recall_for_dimensions():
+    memories, vectors, queries = low_rank_corpus()
+    service = service_with(memories, Projection.fit_pca("pca8-v1", vectors, 8))
+
+    async def recall(precision, query):
+        async def embed(text):
+            return query
+
+        service._generate_embedding = embed
+        results, _ = await service.search_memories(1, "q", 10, mode="early", precision=precision)
+        truth = {m["id"] for _, m in exhaustive_search(memories, query, 10, service.memory_decay_rate)}
+        return len(truth & {m["id"] for m in results}) / 10
+
+    reduced = np.mean([asyncio.run(recall("reduced", q)) for q in queries])
+    reranked = np.mean([asyncio.run(recall("rerank", q)) for q in queries])
+    assert reranked >= reduced and reranked >= 0.95 and reduced >= 0.6
+    assert {"early:reduced", "early:rerank"} <= set(service.stats()["modes"])
+
+
+def test_precision_requires_a_projection():
+    memories, _, _ = low_rank_corpus(n=10)
+    service = service_with(memories, None)
+    for precision in ("reduced", "bogus"):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(service.search_memories(1, "q", 3, mode="early", precision=precision))
+        assert exc.value.status_code == 400
+
+
+def test_reprojection_backfills_and_ingest_projects():
+    memories, vectors, _ = low_rank_corpus(n=1200)
+    projection = Projection.fit_pca("pca8-v1", vectors, 8)
+    service = service_with(memories, projection)
+    job = Reprojector(service.store, projection, batch_size=500)
+    assert [asyncio.run(job.run_once()) for _ in range(4)] == [500, 500, 200, 0]
+    assert all(m["projection_version"] == "pca8-v1" and len(m["reduced_embedding"]) == 8 for m in memories)
+
+    assert job.projected == 1200
+    inserted = {}
+
+    async def insert(user_id, message, role, context, embedding, relevance_score=1.0, **projected):
+        inserted.update(projected)
+        return {"id": 9999, "message": message, "vector_embedding": embedding, "relevance_score": 1.0,
+                "timestamp": datetime.now(timezone.utc).isoformat()}
+
+    async def embed(text):
+        return vectors[0] * 1.5 + 1.0
+
+    service.store.insert = insert
+    service._generate_embedding = embed
+    service.deduplicator.window = 0
+    asyncio.run(service.store_memory(1, "New memory", "user", {}))
+    assert inserted["projection_version"] == "pca8-v1" and len(inserted["reduced_embedding"]) == 8
+
+
+def test_reprojection_skips_unusable_batches():
+    memories, vectors, _ = low_rank_corpus(n=9)
+    for memory in memories[:3]:
+        memory["vector_embedding"] = np.ones(32) if memory["id"] < 3 else None
+    projection = Projection.fit_pca("pca8-v1", vectors, 8)
+    job = Reprojector(ProjectingStore(memories), projection, batch_size=3)
+
+    async def drain():
+        batches = []
+        while read := await job.run_once():
+            batches.append(read)
+        return batches
+
+    assert asyncio.run(drain()) == [3, 3, 3]
+    assert job.projected == 6
+    assert [m.get("projection_version") for m in memories] == [None] * 3 + ["pca8-v1"] * 6
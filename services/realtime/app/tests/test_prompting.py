@@ -0,0 +1,155 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import numpy as np
+import openai
+from fastapi.testclient import TestClient
+
+from app import chat
+from app.main import app, verify_token
+from app.prompting import PromptPacker, TokenCounter
+from app.services import AIService, MemoryService
+from app.summaries import RollingSummarizer
+from app.tests.test_dedup import TouchStore
+
+
+class SummaryStore(TouchStore):
+    async def latest_summary(self, user_id):
+        summaries = [m for m in self.memories if m["role"] == "system" and m["context"].get("kind") == "summary"]
+        return max(summaries, key=lambda m: m["id"], default=None)
+
+
+def conversation(turns=60):
+    start = datetime.now(timezone.utc) - timedelta(hours=turns)
+    return [
+        {"id": i, "message": f"turn {i} about topic {i % 7} with some extra words to pad it out",
+         "role": "user" if i % 2 else "assistant", "context": {}, "vector_embedding": np.ones(4),
+         "relevance_score": 1.0, "timestamp": (start + timedelta(hours=i)).isoformat()}
+        for i in range(turns, 0, -1)
+    ]
+
+
+def summarizing_service(turns=60):
+    service = MemoryService(store=SummaryStore(conversation(turns)))
+    folded = []
+
+    async def summarize(previous, lines):
+        folded.append(lines)
+        return f"{previous or ''} covered {len(lines)} turns ending '{lines[-1]}'"
+
+    async def embed(text):
+        return np.ones(4)
+
+    service._generate_embedding = embed
+    return service, RollingSummarizer(service, summarize, keep_recent=10, min_batch=10, max_batch=20), folded
+
+
+def test_token_counts_are_cached():
+    counter = TokenCounter(cache_size=16)
+    assert counter.count("remind me to call the dentist") == counter.count("remind me to call the dentist") > 0
+    assert counter.count.cache_info().hits == 1
+
+
+def test_packer_respects_budget_and_priority():
+    packer = PromptPacker(budget=120)
+    recent = [("user" if i % 2 else "assistant", f"recent message number {i} " * 3) for i in range(20)]
+    packed = packer.pack("system", "what next?", summary="short summary",
+                         memories=["the dentist is on friday", "budget report due"], recent=recent)
+    assert packed.tokens <= 120 < packed.candidate_tokens
+    assert packed.included["summary"] == 1 and packed.included["memories"] == 2
+    assert 0 < packed.included["recent"] < 20 and packed.dropped["recent"] == 20 - packed.included["recent"]
+    # The newest turns survive and keep chronological order, right before the user's message
+    kept = [m["content"] for m in packed.messages[3:-1]]
+    assert kept == [text for _, text in recent[-len(kept):]]
+    assert packed.messages[-1] == {"role": "user", "content": "what next?"}
+
+
+def test_summaries_chain_over_older_turns():
+    service, summarizer, folded = summarizing_service()
+    first = asyncio.run(summarizer.compact(1))
+    # The newest 10 turns stay raw; the next 20 older ones are folded, oldest first
+    assert [line.split()[2] for line in folded[0]] == [str(i) for i in range(31, 51)]
+    assert first["context"]["through"]["id"] == 50 and first["context"]["covers"] == 20
+
+    for i in range(100, 120):  # clear of the summary's id
+        service.store.memories.insert(0, {**conversation(1)[0], "id": i, "message": f"turn {i}",
+                                          "timestamp": datetime.now(timezone.utc).isoformat()})
+    second = asyncio.run(summarizer.compact(1))
+    assert [line.split()[2] for line in folded[1]] == [str(i) for i in [*range(51, 61), *range(100, 110)]]
+    assert second["context"]["previous"] == first["id"] and second["context"]["covers"] == 40
+    assert second["message"].startswith(first["message"])
+    # Not enough new turns: no run
+    assert asyncio.run(summarizer.compact(1)) is None and len(folded) == 2
+
+
+def test_prompt_uses_summary_and_turns_since_it(monkeypatch):
+    service, summarizer, _ = summarizing_service()
+    monkeypatch.setattr(chat, "memory_service", service)
+
+    async def no_memories(user_id, text, limit, mode=None):
+        return []
+
+    service.query_relevant_memories = no_memories
+    unbounded = asyncio.run(chat.build_prompt(1, "what should I do today?", context_window=50))
+    asyncio.run(summarizer.compact(1))
+    packed = asyncio.run(chat.build_prompt(1, "what should I do today?", context_window=50))
+    assert packed.included == {"summary": 1, "memories": 0, "recent": 10}
+    assert packed.tokens < unbounded.tokens / 2
+    assert "covered 20 turns" in packed.messages[1]["content"]
+
+
+def test_respond_takes_identity_from_token_only(monkeypatch):
+    seen, remembered = [], []
+
+    async def respond(user_id, text, context=None):
+        seen.append(user_id)
+        return {"response": "ok"}
+
+    async def remember_turn(user_id, text, reply, context=None):
+        remembered.append(user_id)
+
+    monkeypatch.setattr(chat, "respond", respond)
+    monkeypatch.setattr(chat, "remember_turn", remember_turn)
+    client = TestClient(app)
+    try:
+        for user_data in ({}, {"user_id": 7}):
+            app.dependency_overrides[verify_token] = lambda: user_data
+            response = client.post("/ai/respond/", json={"text": "hi", "user_id": "42"})
+            assert response.status_code == 200
+    finally:
+        app.dependency_overrides.pop(verify_token, None)
+    # The body's user_id is never used; a token without one gets no memory access
+    assert seen == [None, 7] and remembered == [7]
+
+
+def stubbed_openai(reply):
+    """A real AsyncOpenAI client whose HTTP transport answers every request with `reply`."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-3.5-turbo",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+        })
+
+    client = openai.AsyncOpenAI(api_key="test", base_url="http://openai.test/v1",
+                                http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return client, requests
+
+
+def test_ai_service_uses_the_v1_chat_completions_client():
+    client, requests = stubbed_openai(" all set ")
+    service = AIService(client)
+    reply = asyncio.run(service.respond([{"role": "user", "content": "hi"}], max_tokens=20))
+    summary = asyncio.run(service.summarize("earlier", ["user: hi"]))
+
+    assert reply["text"] == " all set " and summary == "all set"
+    assert reply["usage"]["prompt_tokens"] == 12 and reply["usage"]["completion_tokens"] == 3
+    assert [r.url.path for r in requests] == ["/v1/chat/completions"] * 2
+    assert requests[0].headers["authorization"] == "Bearer test"
+    assert json.loads(requests[0].content)["max_tokens"] == 20
@@ -0,0 +1,90 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.memory_search import exhaustive_search
+from app.quantization import Int8Codec, PQCodec, QuantizedIndex, make_codec, normalize
+from app.services import MemoryService
+from app.tests.test_memory_search import NOW, ListStore, corpus
+
+
+def clustered(n=3000, dim=64, clusters=20, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.4 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def test_int8_inner_products_are_close_and_4x_smaller():
+    vectors = normalize(clustered(n=500))
+    codec = Int8Codec()
+    codes = codec.encode(vectors)
+    query = vectors[0]
+    assert codec.inner(query, codes) == pytest.approx(vectors @ query, abs=0.02)
+    assert vectors.nbytes / codec.nbytes(codes) > 3.5
+
+
+def test_pq_candidates_recall_true_neighbours():
+    vectors = normalize(clustered())
+    codec = PQCodec(m=32, ks=256, iters=10).fit(vectors)
+    codes = codec.encode(vectors)
+    assert codes.dtype == np.uint8 and vectors.nbytes / codes.nbytes == 8
+    hits = []
+    for query in vectors[:20]:
+        exact = np.argsort(-(vectors @ query))[:10]
+        approx = np.argsort(-codec.inner(query, codes))[:40]
+        hits.append(recall(approx, exact))
+    assert np.mean(hits) > 0.9
+
+
+@pytest.mark.parametrize("codec", [Int8Codec(), PQCodec(m=8, ks=64, iters=10)])
+def test_reranked_search_matches_exact_scores(codec):
+    memories, query = corpus(n=1500)
+    store = ListStore(memories)
+    index = QuantizedIndex.build(memories, codec)
+    ranked, _ = asyncio.run(index.search(store, 1, query, 10, decay_rate=0.1, rerank=40, now=NOW))
+    expected = exhaustive_search(memories, query, 10, decay_rate=0.1, now=NOW)
+    assert recall([m["id"] for _, m in ranked], [m["id"] for _, m in expected]) >= 0.8
+    # Returned scores are exact, not approximations
+    exact = dict((m["id"], s) for s, m in exhaustive_search(memories, query, len(memories), 0.1, NOW))
+    assert [s for s, _ in ranked] == pytest.approx([exact[m["id"]] for _, m in ranked])
+    assert store.rows_read == 40
+
+
+def test_index_add_and_remove():
+    memories, query = corpus(n=300)
+    index = QuantizedIndex.build(memories[:-1], Int8Codec())
+    index.add(memories[-1])
+    index.add(memories[-1])  # replace, not duplicate
+    assert len(index) == 300
+    index.remove(memories[0]["id"])
+    assert len(index) == 299 and memories[0]["id"] not in index.ids
+
+
+def test_make_codec_from_env(monkeypatch):
+    assert isinstance(make_codec(), Int8Codec)
+    monkeypatch.setenv("MEMORY_CODEC", "pq")
+    assert isinstance(make_codec(), PQCodec)
+    with pytest.raises(ValueError):
+        make_codec("fp4")
+
+
+def test_service_quantized_mode_caches_index():
+    memories, query = corpus(n=800)
+    store = ListStore(memories)
+    service = MemoryService(store=store)
+
+    async def embed(text):
+        return query
+
+    service._generate_embedding = embed
+    first, _ = asyncio.run(service.search_memories(1, "q", 5, mode="quantized"))
+    exhaustive, _ = asyncio.run(service.search_memories(1, "q", 5, mode="exhaustive"))
+    assert recall([m["id"] for m in first], [m["id"] for m in exhaustive]) >= 0.8
+    store.rows_read = 0
+    asyncio.run(service.search_memories(1, "q", 5, mode="quantized"))
+    assert store.rows_read == 20  # cached index; only re-rank candidates were read
@@ -0,0 +1,131 @@
+import asyncio
+import math
+
+import numpy as np
+import pytest
+
+from app.reinforcement import ReinforcementBuffer
+from app.services import MemoryService
+from app.tests.test_memory_search import ListStore, corpus
+
+DAY = 86400.0
+
+
+class ReinforcingStore(ListStore):
+    """ListStore applying reinforcement batches the way api.reinforcement does."""
+
+    def __init__(self, memories, clock):
+        super().__init__(memories)
+        self.clock = clock
+        self.batches = []
+        self.fail = False
+
+    async def reinforce_many(self, rows, half_life_days):
+        if self.fail:
+            raise RuntimeError("backend down")
+        self.batches.append(rows)
+        by_id = {m["id"]: m for m in self.memories}
+        updated = []
+        for row in rows:
+            memory = by_id[row["id"]]
+            stored = memory.get("reinforcement", 0.0)
+            base = memory["relevance_score"] - stored
+            elapsed = self.clock() - memory.get("reinforced_at", self.clock())
+            decayed = stored * math.exp(-math.log(2) * elapsed / DAY / half_life_days)
+            memory["relevance_score"] = min(1.0, max(0.0, base + decayed + row["delta"]))
+            memory["reinforcement"] = memory["relevance_score"] - base
+            memory["reinforced_at"] = self.clock()
+            memory["access_count"] = memory.get("access_count", 0) + row["count"]
+            updated.append({"id": memory["id"], "user_id": 1, "relevance_score": memory["relevance_score"]})
+        return updated
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def setup(n=50):
+    clock = Clock()
+    memories, query = corpus(n=n)
+    for memory in memories:
+        memory["relevance_score"] = 0.5
+    service = MemoryService(store=ReinforcingStore(memories, clock))
+    service.reinforcement = ReinforcementBuffer(service, bump=0.1, half_life_days=7, clock=clock)
+    return service, clock, {m["id"]: m for m in memories}, query
+
+
+def test_accesses_are_rank_weighted_and_batched():
+    service, _, by_id, _ = setup()
+    buffer = service.reinforcement
+    buffer.record(1, [by_id[3], by_id[4]])
+    buffer.record(1, [by_id[4]])
+    assert buffer.stats()["pending"] == 2 and not service.store.batches
+
+    assert asyncio.run(buffer.flush()) == 2
+    assert len(service.store.batches) == 1
+    assert by_id[3]["relevance_score"] == pytest.approx(0.6)
+    assert by_id[4]["relevance_score"] == pytest.approx(0.65) and by_id[4]["access_count"] == 2
+    assert asyncio.run(buffer.flush()) == 0 and buffer.stats()["flushes"] == 1
+
+
+def test_flush_timing_does_not_change_scores():
+    scores = []
+    for flush_each_access in (True, False):
+        service, clock, by_id, _ = setup()
+        buffer = service.reinforcement
+        buffer.record(1, [by_id[1]])
+        if flush_each_access:
+            asyncio.run(buffer.flush())
+        clock.now += 7 * DAY  # one half-life
+        buffer.record(1, [by_id[1]])
+        asyncio.run(buffer.flush())
+        scores.append(by_id[1]["relevance_score"])
+    assert scores[0] == pytest.approx(scores[1]) == pytest.approx(0.5 + 0.1 / 2 + 0.1)
+
+
+def test_scores_stay_within_bounds():
+    service, _, by_id, _ = setup()
+    for _ in range(20):
+        service.reinforcement.record(1, [by_id[2]])
+    asyncio.run(service.reinforcement.flush())
+    assert by_id[2]["relevance_score"] == 1.0 and by_id[2]["reinforcement"] == pytest.approx(0.5)
+
+
+def test_failed_flush_keeps_accesses():
+    service, _, by_id, _ = setup()
+    buffer = service.reinforcement
+    buffer.record(1, [by_id[5]])
+    service.store.fail = True
+    with pytest.raises(RuntimeError):
+        asyncio.run(buffer.flush())
+    buffer.record(1, [by_id[5]])
+    assert buffer.stats() == {"pending": 1, "recorded": 2, "flushed": 0, "flushes": 0, "failures": 1}
+
+    service.store.fail = False
+    asyncio.run(buffer.flush())
+    assert by_id[5]["relevance_score"] == pytest.approx(0.7) and by_id[5]["access_count"] == 2
+
+
+def test_search_results_reinforce_resident_indexes():
+    service, _, by_id, query = setup(n=200)
+
+    async def embed(text):
+        return query
+
+    service._generate_embedding = embed
+
+    async def scenario():
+        results, _ = await service.search_memories(1, "q", 5, mode="quantized")
+        await service.reinforcement.flush()
+        return results
+
+    results = asyncio.run(scenario())
+    top = results[0]["id"]
+    index = service.indexes[1]
+    assert index.relevance[index.ids == top][0] == pytest.approx(0.6)
+    assert service.stats()["reinforcement"]["flushed"] == 5
+    assert np.isclose(by_id[top]["relevance_score"], 0.6)
@@ -0,0 +1,153 @@
+import asyncio
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.audio import SAMPLE_RATE
+from app.main import app, verify_token, verify_websocket_token
+from app.sessions import SessionLimitError, SessionManager, SessionOwnerError
+from app.stt import FakeTranscriptionModel, StreamingSTTEngine, stt_engine
+from app.tests.test_stt import chunks, silence, speech
+from app.voice_protocol import FLAG_END_OF_STREAM, encode_frame
+
+SESSION_BYTES = 2 * SAMPLE_RATE * 20  # 20 s of PCM16
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_engine(process_sessions=2, clock=None, **options):
+    manager = SessionManager(
+        factory=None,
+        session_bytes=SESSION_BYTES,
+        process_bytes=SESSION_BYTES * process_sessions,
+        idle_ttl_s=30,
+        snapshot_ttl_s=120,
+        clock=clock or Clock(),
+    )
+    return StreamingSTTEngine(model=FakeTranscriptionModel(), sessions=manager, **options)
+
+
+@contextmanager
+def signed_in(user_id):
+    for dependency in (verify_token, verify_websocket_token):
+        app.dependency_overrides[dependency] = lambda: {"user_id": user_id}
+    try:
+        yield
+    finally:
+        for dependency in (verify_token, verify_websocket_token):
+            app.dependency_overrides.pop(dependency, None)
+
+
+async def stream(engine, session_id, audio, owner=None):
+    for chunk in chunks(audio):
+        await engine.feed(session_id, chunk, owner)
+
+
+def test_lru_eviction_keeps_process_budget_and_resumes():
+    engine = make_engine(process_sessions=2)
+    audio = np.concatenate([speech(1.0), silence(0.6), speech(1.2)])
+
+    async def scenario():
+        await stream(engine, "a", audio[:int(2.0 * SAMPLE_RATE)])
+        await stream(engine, "b", speech(0.5))
+        await stream(engine, "c", speech(0.5))  # Evicts "a", the least recently used
+        assert "a" not in engine.sessions and engine.sessions.has_snapshot("a")
+        assert engine.sessions.bytes_held <= engine.sessions.process_bytes
+
+        await stream(engine, "a", audio[int(2.0 * SAMPLE_RATE):])
+        return await engine.finish("a")
+
+    result = asyncio.run(scenario())
+
+    reference = make_engine()
+
+    async def uninterrupted():
+        await stream(reference, "a", audio)
+        return await reference.finish("a")
+
+    assert result["transcript"] == asyncio.run(uninterrupted())["transcript"]
+    metrics = engine.sessions.metrics()
+    assert metrics["evicted_lru"] == 2 and metrics["resumed"] == 1
+    assert metrics["live_sessions"] == 1  # Resuming "a" evicted "b"; "a" is closed, leaving "c"
+
+
+def test_idle_sessions_are_swept_and_snapshots_expire():
+    clock = Clock()
+    engine = make_engine(process_sessions=4, clock=clock)
+    asyncio.run(stream(engine, "idle", speech(0.3)))
+
+    clock.now = 31
+    assert engine.sessions.sweep() == 1
+    assert "idle" not in engine.sessions and engine.sessions.has_snapshot("idle")
+    snapshot_bytes = engine.sessions.metrics()["snapshot_bytes"]
+    assert 0 < snapshot_bytes < SESSION_BYTES  # Only the open segment's audio is kept
+
+    clock.now = 200
+    engine.sessions.sweep()
+    assert not engine.sessions.has_snapshot("idle")
+
+
+def test_busy_sessions_are_not_evicted():
+    engine = make_engine(process_sessions=1)
+
+    async def scenario():
+        session = engine.sessions.get("busy")
+        async with session.lock:
+            with pytest.raises(SessionLimitError):
+                engine.sessions.get("other")
+
+    asyncio.run(scenario())
+    assert engine.sessions.metrics()["rejected"] == 1
+
+
+def test_sessions_belong_to_their_owner():
+    engine = make_engine()
+    audio = np.concatenate([speech(1.0), silence(0.6)])
+    asyncio.run(stream(engine, "mine", audio, owner=1))
+    with pytest.raises(SessionOwnerError):
+        engine.sessions.get("mine", owner=2)
+    with pytest.raises(SessionOwnerError):
+        engine.sessions.get("mine")  # No verified user is not the owner either
+    engine.suspend("mine")
+    with pytest.raises(SessionOwnerError):
+        asyncio.run(engine.finish("mine", owner=2))
+    assert engine.sessions.has_snapshot("mine") and "mine" not in engine.sessions
+    assert asyncio.run(engine.finish("mine", owner=1))["transcript"]
+
+
+def test_websocket_reconnect_resumes_session(monkeypatch):
+    monkeypatch.setattr(stt_engine, "_model", FakeTranscriptionModel())
+    pcm = np.concatenate([speech(1.0), silence(0.6), speech(0.4)]).tobytes()
+    half = len(pcm) // 2 // 2 * 2
+    client = TestClient(app)
+
+    with signed_in(1), client.websocket_connect("/ws/voice/resume-me") as ws:
+        ws.send_bytes(encode_frame(0, 0, pcm[:half]))
+        ws.receive_json()  # Processed before the connection drops
+    assert stt_engine.sessions.has_snapshot("resume-me")
+
+    with signed_in(2), client.websocket_connect("/ws/voice/resume-me") as ws:
+        assert ws.receive_json()["type"] == "error"  # Someone else's session: no transcript
+    with signed_in(2):
+        assert client.post("/voice/complete/", json={"session_id": "resume-me"}).status_code == 403
+    assert stt_engine.sessions.has_snapshot("resume-me")
+
+    with signed_in(1), client.websocket_connect("/ws/voice/resume-me") as ws:
+        resumed = ws.receive_json()
+        assert resumed["type"] == "resumed"
+        ws.send_bytes(encode_frame(1, 0, pcm[half:], flags=FLAG_END_OF_STREAM))
+        messages = []
+        while not messages or messages[-1]["type"] != "stats":
+            messages.append(ws.receive_json())
+
+    transcript = next(m for m in messages if m["type"] == "transcript")
+    assert transcript["text"].startswith("remind me")
+    assert "resume-me" not in stt_engine.sessions and not stt_engine.sessions.has_snapshot("resume-me")
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.memory_search import SearchStats, exhaustive_search
+from app.services import MemoryService
+from app.sharded import SharedMatrix, ShardPool
+from app.tests.test_memory_search import NOW, ListStore, corpus
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ShardPool(workers=3, min_shard_rows=200)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def service_with(memories, pool, query):
+    service = MemoryService(store=ListStore(memories))
+    service.shard_pool = pool
+    service.index_ttl_s = float("inf")
+
+    async def embed(text):
+        return query
+
+    service._generate_embedding = embed
+    return service
+
+
+def ids(ranked):
+    return [memory["id"] for _, memory in ranked]
+
+
+def test_shards_match_exhaustive_ranking(pool):
+    memories, query = corpus(n=2000)
+    memories[7]["vector_embedding"] = None
+    matrix = SharedMatrix.build(memories)
+    try:
+        assert pool.bounds(len(matrix)) == [(0, 666), (666, 1332), (1332, 1999)]
+        ranked, stats = asyncio.run(pool.search(matrix, query, 10, 0.01, now=NOW))
+        expected = exhaustive_search(memories, query, 10, 0.01, now=NOW)
+        assert ids(ranked) == ids(expected)
+        assert np.allclose([s for s, _ in ranked], [s for s, _ in expected], atol=1e-5)
+        assert stats.scanned == 1999 and stats.blocks == 3
+        assert "vector_embedding" not in ranked[0][1]
+    finally:
+        matrix.retire()
+
+
+def test_small_matrices_use_one_shard(pool):
+    memories, query = corpus(n=150)
+    matrix, empty = SharedMatrix.build(memories), SharedMatrix.build([])
+    try:
+        ranked, stats = asyncio.run(pool.search(matrix, query, 200, 0.01, now=NOW))
+        assert stats.blocks == 1 and len(ranked) == 150
+        assert asyncio.run(pool.search(empty, query, 5, 0.01)) == ([], SearchStats())
+    finally:
+        matrix.retire()
+        empty.retire()
+
+
+def test_updates_are_visible_to_workers(pool):
+    memories, query = corpus(n=600)
+    matrix = SharedMatrix.build(memories)
+    try:
+        best = ids(asyncio.run(pool.search(matrix, query, 3, 0.01, now=NOW))[0])
+        matrix.remove(best[0])
+        matrix.set_relevance(best[2], 0.0)
+        matrix.add({"id": 9001, "vector_embedding": query * 3, "relevance_score": 1.0,
+                    "timestamp": NOW.isoformat(), "message": "new"})
+        ranked, _ = asyncio.run(pool.search(matrix, query, 3, 0.01, now=NOW))
+        assert ids(ranked)[:2] == [9001, best[1]] and best[0] not in ids(ranked) and best[2] not in ids(ranked)
+    finally:
+        matrix.retire()
+
+
+def test_service_sharded_mode_and_lifecycle(pool):
+    memories, query = corpus(n=300)
+    service = service_with(memories, pool, query)
+    results, stats = asyncio.run(service.search_memories(1, "q", 5, mode="sharded"))
+    assert [m["id"] for m in results] == ids(exhaustive_search(memories, query, 5, service.memory_decay_rate))
+    assert service.stats()["sharded"]["users"] == 1
+
+    matrix = service.matrices[1]
+    for i in range(matrix.capacity - len(matrix)):
+        service.apply_change(1, 10_000 + i, {**memories[0], "id": 10_000 + i,
+                                             "timestamp": (NOW - timedelta(days=400)).isoformat()})
+    assert service.matrices[1] is matrix
+    service.apply_change(1, 20_000, {**memories[0], "id": 20_000})
+    assert 1 not in service.matrices
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=matrix.shm.name)
+
+    asyncio.run(service.search_memories(1, "q", 5, mode="sharded"))
+    name = service.matrices[1].shm.name
+    service.release_matrices()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_sharded_mode_requires_workers():
+    memories, query = corpus(n=10)
+    service = service_with(memories, ShardPool(workers=0), query)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(service.search_memories(1, "q", 3, mode="sharded"))
+    assert exc.value.status_code == 400
+
+
+class SlowStore(ListStore):
+    """Yields during the fetch so concurrent cache misses overlap."""
+
+    def __init__(self, memories):
+        super().__init__(memories)
+        self.fetches = 0
+
+    async def fetch_for_search(self, user_id):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return await super().fetch_for_search(user_id)
+
+
+def test_concurrent_misses_share_one_build(pool):
+    memories, query = corpus(n=100)
+    service = service_with(memories, pool, query)
+    service.store = SlowStore(memories)
+
+    async def burst():
+        return await asyncio.gather(*(build(1) for build in
+                                      [service.user_matrix, service.user_index, service.user_lexicon] * 3))
+
+    results = asyncio.run(burst())
+    assert service.store.fetches == 3
+    assert all(results[i] is results[i % 3] for i in range(9))
+    name = service.matrices[1].shm.name
+    service.release_matrices()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+    # A rebuild retires the matrix it replaces
+    first = asyncio.run(service.user_matrix(1))
+    service.index_ttl_s = -1
+    second = asyncio.run(service.user_matrix(1))
+    assert second is not first and service.matrices[1] is second
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=first.shm.name)
+    service.release_matrices()
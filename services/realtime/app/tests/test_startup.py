@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.providers import ProviderRegistry
+
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+
+# Import-time budget for `app.main` + `app.services`, measured with `python -X importtime`
+STARTUP_BUDGET_MS = 2500
+LAZY_MODULES = ("transformers", "torch", "whisper")
+
+
+def _import_profile(statement):
+    """Return ({top-level module: cumulative microseconds}, {imported root packages})."""
+    env = {**os.environ, "WARM_PROVIDERS": ""}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SERVICE_ROOT, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    top_level, imported = {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.add(name.strip().split(".")[0])
+        if not name.startswith("  "):  # Nested imports are already included in cumulative
+            top_level[name.strip()] = int(cumulative)
+    return top_level, imported
+
+
+def test_realtime_startup_import_budget():
+    """Test that the realtime process starts without loading models or ML frameworks."""
+    top_level, imported = _import_profile("import app.main, app.services")
+    for module in LAZY_MODULES:
+        assert module not in imported, f"{module} should be imported on first use, not at startup"
+    assert sum(top_level.values()) / 1000 < STARTUP_BUDGET_MS
+
+
+def test_provider_built_once_on_first_use():
+    """Test that providers are constructed lazily and cached."""
+    calls = []
+    registry = ProviderRegistry()
+    registry.register("model", lambda: calls.append(1) or object())
+    assert not registry.is_loaded("model")
+
+    first = registry.get("model")
+    assert registry.get("model") is first
+    assert len(calls) == 1
+
+
+def test_warm_up_collects_errors():
+    """Test that warm-up reports failing providers without raising."""
+    registry = ProviderRegistry()
+    registry.register("ok", object)
+    registry.register("broken", lambda: 1 / 0)
+    errors = registry.warm_up()
+    assert registry.is_loaded("ok")
+    assert isinstance(errors["broken"], ZeroDivisionError)
+    with pytest.raises(KeyError):
+        registry.get("missing")
@@ -0,0 +1,130 @@
+import base64
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.audio import SAMPLE_RATE, AudioRingBuffer
+from app.main import app, verify_token
+from app.stt import (
+    EnergyVAD, FakeTranscriptionModel, StreamingSTTEngine, StreamingTranscriber, _merge_overlap, stt_engine
+)
+
+
+def speech(seconds, amplitude=8000, freq=220.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+
+
+def chunks(samples, ms=100):
+    step = SAMPLE_RATE * ms // 1000
+    for i in range(0, len(samples), step):
+        yield samples[i:i + step].tobytes()
+
+
+def test_ring_buffer_wraps_without_losing_order():
+    buffer = AudioRingBuffer(capacity_samples=8)
+    buffer.write(np.arange(6, dtype=np.int16))
+    buffer.write(np.arange(6, 11, dtype=np.int16).tobytes())
+
+    assert buffer.start == 3
+    assert buffer.read(3, 11).tolist() == list(range(3, 11))
+    assert len(buffer.views(3, 11)) == 2
+    assert np.shares_memory(buffer.read(4, 7), buffer._data)
+
+
+def test_ring_buffer_carries_split_samples():
+    buffer = AudioRingBuffer(capacity_samples=4)
+    data = np.array([1, 2], dtype=np.int16).tobytes()
+    buffer.write(data[:3])
+    buffer.write(data[3:])
+    assert buffer.read(0, 2).tolist() == [1, 2]
+
+
+def test_vad_finds_speech_boundaries():
+    vad = EnergyVAD()
+    audio = np.concatenate([silence(0.5), speech(1.0), silence(1.0)])
+    events = vad.process(audio, 0)
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["start", "end"]
+    start, end = events[0][1], events[1][1]
+    assert abs(start - int(0.5 * SAMPLE_RATE)) < SAMPLE_RATE * 0.05
+    assert end > int(1.5 * SAMPLE_RATE)
+
+
+def test_partials_are_stable_and_segments_finalize():
+    """Test that the stable prefix only grows and a pause finalizes the segment."""
+    model = FakeTranscriptionModel()
+    transcriber = StreamingTranscriber(model, partial_interval_s=0.3)
+    events = []
+    for chunk in chunks(np.concatenate([silence(0.3), speech(2.5), silence(1.0)])):
+        events.extend(transcriber.push(chunk))
+
+    partials = [e for e in events if e["type"] == "partial"]
+    finals = [e for e in events if e["type"] == "final"]
+    assert len(partials) >= 3
+    stable_lengths = [len(p["stable"].split()) for p in partials]
+    assert stable_lengths == sorted(stable_lengths)
+    assert all(p["text"].startswith(p["stable"]) for p in partials)
+    assert len(finals) == 1
+    assert finals[0]["text"].startswith("remind me to stretch")
+    assert transcriber.transcript == finals[0]["text"]
+
+
+def test_long_segments_are_cut_with_overlap():
+    transcriber = StreamingTranscriber(FakeTranscriptionModel(), max_segment_s=2.0, overlap_s=0.5)
+    for chunk in chunks(speech(5.0)):
+        transcriber.push(chunk)
+    transcriber.finish()
+    bounds = [(f["start_ms"], f["end_ms"]) for f in transcriber.finals]
+    assert bounds == [(0, 2000), (1500, 3500), (3000, 5000)]
+
+
+def test_merge_overlap_removes_repeated_words():
+    assert _merge_overlap(["start", "focus", "now"], ["focus", "now", "please"]) == ["please"]
+    assert _merge_overlap(["a", "b"], ["c"]) == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_engine_latency_with_fake_model():
+    """Test that each 100 ms chunk is handled well under real time with a fixed model latency."""
+    engine = StreamingSTTEngine(model=FakeTranscriptionModel(latency_s=0.005), partial_interval_s=0.5)
+    started = time.perf_counter()
+    for chunk in chunks(np.concatenate([speech(2.0), silence(0.6)])):
+        await engine.feed("latency", chunk)
+    elapsed = time.perf_counter() - started
+    result = await engine.finish("latency")
+
+    assert result["transcript"]
+    assert elapsed < 2.6  # Faster than the audio itself
+    assert "latency" not in engine.sessions
+
+
+@pytest.fixture
+def fake_stt(monkeypatch):
+    monkeypatch.setattr(stt_engine, "_model", FakeTranscriptionModel())
+    app.dependency_overrides[verify_token] = lambda: {"user_id": 1}
+    yield
+    app.dependency_overrides.pop(verify_token, None)
+
+
+def test_stream_and_complete_endpoints(fake_stt):
+    client = TestClient(app)
+    audio = np.concatenate([speech(1.5), silence(0.2)])
+    session_id = None
+    for chunk in chunks(audio, ms=500):
+        response = client.post("/voice/stream/", json={
+            "audio_chunk": base64.b64encode(chunk).decode(),
+            "session_id": session_id,
+        })
+        assert response.status_code == 200
+        session_id = response.json()["session_id"]
+
+    response = client.post("/voice/complete/", json={"session_id": session_id})
+    assert response.status_code == 200
+    assert response.json()["transcript"].startswith("remind me")
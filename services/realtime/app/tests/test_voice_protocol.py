@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from app.main import app, verify_websocket_token
+from app.voice_protocol import (
+    FLAG_END_OF_STREAM, HEADER, FrameQueue, ProtocolError, encode_frame, parse_frame
+)
+
+PCM_CHUNK = b"\x01\x00" * 160  # 10 ms of 16 kHz mono PCM16
+
+
+@pytest.fixture
+def authenticated():
+    app.dependency_overrides[verify_websocket_token] = lambda: {"user_id": 1}
+    yield
+    app.dependency_overrides.pop(verify_websocket_token, None)
+
+
+def test_frame_round_trip():
+    """Test that the header survives encoding and the payload is not copied."""
+    data = encode_frame(seq=7, timestamp_ms=1234, payload=PCM_CHUNK, flags=FLAG_END_OF_STREAM)
+    assert len(data) == HEADER.size + len(PCM_CHUNK)
+
+    frame = parse_frame(data)
+    assert (frame.seq, frame.timestamp_ms, frame.end_of_stream) == (7, 1234, True)
+    assert frame.payload.obj is data
+    assert bytes(frame.payload) == PCM_CHUNK
+
+
+def test_malformed_frames_rejected():
+    with pytest.raises(ProtocolError):
+        parse_frame(b"\x01\x00")
+    with pytest.raises(ProtocolError):
+        parse_frame(b"\x09" + encode_frame(0, 0, b"")[1:])
+
+
+@pytest.mark.asyncio
+async def test_queue_pauses_drops_and_resumes():
+    """Test flow-control signals and drop-oldest behaviour when the consumer lags."""
+    queue = FrameQueue(maxsize=4, high_water=3, low_water=1)
+    for seq in range(6):
+        queue.offer(parse_frame(encode_frame(seq, seq * 10, PCM_CHUNK)))
+
+    signals = queue.pending_signals()
+    assert signals[0] == {"type": "flow", "action": "pause", "queued": 3}
+    assert [s["count"] for s in signals if s["type"] == "drop"] == [1, 1]
+    assert queue.stats.dropped == 2
+    assert len(queue) == 4
+
+    seqs = [(await queue.get()).seq for _ in range(3)]
+    assert seqs == [2, 3, 4]
+    assert queue.pending_signals() == [{"type": "flow", "action": "resume", "credit": 3}]
+
+    queue.close()
+    assert (await queue.get()).seq == 5
+    assert await asyncio.wait_for(queue.get(), timeout=1) is None
+
+
+def test_websocket_requires_a_token():
+    client = TestClient(app)
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws/voice/test-session"):
+            pass
+    assert exc.value.code == 1008
+
+
+def test_websocket_accepts_binary_frames(authenticated):
+    """Test that binary frames are acknowledged and stats are reported at end of stream."""
+    client = TestClient(app)
+    with client.websocket_connect("/ws/voice/test-session") as ws:
+        for seq in range(3):
+            flags = FLAG_END_OF_STREAM if seq == 2 else 0
+            ws.send_bytes(encode_frame(seq, seq * 10, PCM_CHUNK, flags=flags))
+        messages = []
+        while True:
+            message = ws.receive_json()
+            messages.append(message)
+            if message["type"] == "stats":
+                break
+
+    stats = messages[-1]
+    assert stats["frames_in"] == 3
+    assert stats["bytes_in"] == 3 * len(PCM_CHUNK)
+    assert stats["dropped"] == 0
+
+
+def test_websocket_rejects_bad_frames(authenticated):
+    client = TestClient(app)
+    with client.websocket_connect("/ws/voice/test-session") as ws:
+        ws.send_bytes(b"\x00")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_text('{"type": "end"}')
+        types = []
+        while not types or types[-1] != "stats":
+            types.append(ws.receive_json()["type"])
+        # The transcript goes out first, then each remaining completion stage as it finishes
+        assert types[0] == "transcript" and types[-1] == "stats"
+        assert types[1:-1] == ["stage"] * 5
@@ -0,0 +1,161 @@
+"""Binary framing and flow control for the voice WebSocket.
+
+Clients send raw PCM16 or Opus audio as binary WebSocket messages, each prefixed with a
+fixed 16-byte header instead of base64 inside JSON:
+
+    version:u8 | codec:u8 | flags:u16 | seq:u32 | timestamp_ms:u64   (network byte order)
+
+Frames land in a bounded per-session queue. When the consumer falls behind, the queue
+asks the client to pause at the high-water mark, resume below the low-water mark, and
+drops the oldest frames (reporting how many) rather than growing without bound.
+Control messages are small JSON text frames.
+"""
+import asyncio
+import struct
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("!BBHIQ")
+
+CODEC_PCM16 = 0
+CODEC_OPUS = 1
+CODECS = (CODEC_PCM16, CODEC_OPUS)
+
+FLAG_END_OF_STREAM = 0x0001
+
+
+class ProtocolError(ValueError):
+    """Raised for malformed voice frames."""
+
+
+@dataclass(frozen=True)
+class VoiceFrame:
+    seq: int
+    timestamp_ms: int
+    payload: memoryview
+    codec: int = CODEC_PCM16
+    flags: int = 0
+
+    @property
+    def end_of_stream(self) -> bool:
+        return bool(self.flags & FLAG_END_OF_STREAM)
+
+
+def encode_frame(
+    seq: int,
+    timestamp_ms: int,
+    payload: bytes,
+    codec: int = CODEC_PCM16,
+    flags: int = 0
+) -> bytes:
+    return HEADER.pack(PROTOCOL_VERSION, codec, flags, seq, timestamp_ms) + payload
+
+
+def parse_frame(data: bytes) -> VoiceFrame:
+    """Parse a binary message; the payload is a zero-copy view into `data`."""
+    if len(data) < HEADER.size:
+        raise ProtocolError(f"Frame shorter than {HEADER.size}-byte header")
+    version, codec, flags, seq, timestamp_ms = HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    if codec not in CODECS:
+        raise ProtocolError(f"Unknown codec {codec}")
+    return VoiceFrame(
+        seq=seq,
+        timestamp_ms=timestamp_ms,
+        payload=memoryview(data)[HEADER.size:],
+        codec=codec,
+        flags=flags,
+    )
+
+
+@dataclass
+class QueueStats:
+    frames_in: int = 0
+    frames_out: int = 0
+    bytes_in: int = 0
+    dropped: int = 0
+    sequence_gaps: int = 0
+    max_depth: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class FrameQueue:
+    """Bounded per-session receive queue with pause/resume signalling and drop-oldest overflow."""
+
+    def __init__(
+        self,
+        maxsize: int = 64,
+        high_water: Optional[int] = None,
+        low_water: Optional[int] = None
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.high_water = high_water if high_water is not None else max(1, maxsize * 3 // 4)
+        self.low_water = low_water if low_water is not None else maxsize // 4
+        self.stats = QueueStats()
+        self.paused = False
+        self.closed = False
+        self._frames: Deque[VoiceFrame] = deque()
+        self._signals: Deque[Dict] = deque()
+        self._ready = asyncio.Event()
+        self._last_seq: Optional[int] = None
+        self._pending_drops = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def offer(self, frame: VoiceFrame) -> None:
+        """Enqueue without blocking; drops the oldest frame when full."""
+        if self.closed:
+            return
+        stats = self.stats
+        stats.frames_in += 1
+        stats.bytes_in += len(frame.payload)
+        if self._last_seq is not None and frame.seq != self._last_seq + 1:
+            stats.sequence_gaps += 1
+        self._last_seq = frame.seq
+
+        if len(self._frames) >= self.maxsize:
+            self._frames.popleft()
+            stats.dropped += 1
+            self._pending_drops += 1
+        self._frames.append(frame)
+        stats.max_depth = max(stats.max_depth, len(self._frames))
+
+        if self._pending_drops:
+            self._signals.append({"type": "drop", "count": self._pending_drops, "last_seq": frame.seq})
+            self._pending_drops = 0
+        if not self.paused and len(self._frames) >= self.high_water:
+            self.paused = True
+            self._signals.append({"type": "flow", "action": "pause", "queued": len(self._frames)})
+        self._ready.set()
+
+    async def get(self) -> Optional[VoiceFrame]:
+        """Next frame, or None once the queue is closed and drained."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame = self._frames.popleft()
+        self.stats.frames_out += 1
+        if self.paused and len(self._frames) <= self.low_water:
+            self.paused = False
+            self._signals.append({"type": "flow", "action": "resume", "credit": self.maxsize - len(self._frames)})
+        return frame
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    def pending_signals(self) -> List[Dict]:
+        """Control messages to send to the client, oldest first."""
+        signals = list(self._signals)
+        self._signals.clear()
+        return signals
@@ -0,0 +1,126 @@
+"""Latency and recall of each memory retrieval mode on keyword-style queries.
+
+Generates one synthetic user whose messages mix filler chat with named tasks
+("renew passport", "call plumber", ...). Embeddings come from a deterministic bag-of-words
+embedder that sleeps `--embed-ms` to stand in for the OpenAI round-trip. Each query
+asks for a task by name; its relevant set is the memories mentioning that task. Reports
+mean latency and recall@k per mode.
+
+    python -m bench.memory_modes --memories 5000 --embed-ms 150
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.lexical import tokenize
+from app.services import MemoryService
+
+TASKS = ["renew passport", "call plumber", "dentist appointment", "tax return", "birthday gift",
+         "oil change", "library books", "gym membership", "vet checkup", "budget review"]
+FILLER = ("feeling okay today", "had a long day at work", "need more sleep", "thanks that helps",
+          "remind me later", "sounds good", "not sure about this", "went for a walk")
+
+
+def word_vector(word: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).normal(size=dim)
+
+
+class FakeEmbedder:
+    def __init__(self, dim: int, delay_ms: float):
+        self.dim = dim
+        self.delay_ms = delay_ms
+
+    def vector(self, text: str) -> np.ndarray:
+        words = tokenize(text) or ["empty"]
+        return np.sum([word_vector(w, self.dim) for w in words], axis=0)
+
+    async def __call__(self, text: str) -> np.ndarray:
+        await asyncio.sleep(self.delay_ms / 1000)
+        return self.vector(text)
+
+
+class ArrayStore:
+    def __init__(self, memories):
+        self.memories = sorted(memories, key=lambda m: (m["timestamp"], m["id"]), reverse=True)
+        self.by_id = {m["id"]: m for m in memories}
+
+    async def fetch_for_search(self, user_id):
+        return list(self.memories)
+
+    async def fetch_block(self, user_id, before, limit):
+        rows = self.memories if before is None else [
+            m for m in self.memories if (m["timestamp"], m["id"]) < tuple(before)]
+        return rows[:limit]
+
+    async def max_relevance(self, user_id):
+        return 1.0
+
+    async def fetch_by_ids(self, user_id, ids):
+        return [self.by_id[i] for i in ids]
+
+
+def synthetic_user(n: int, embedder: FakeEmbedder, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    memories, relevant = [], {task: set() for task in TASKS}
+    for i in range(n):
+        text = FILLER[rng.integers(len(FILLER))]
+        if rng.random() < 0.05:
+            task = TASKS[rng.integers(len(TASKS))]
+            text = f"{text}, also {task}"
+            relevant[task].add(i)
+        memories.append({"id": i, "message": text, "vector_embedding": embedder.vector(text),
+                         "relevance_score": float(rng.uniform(0.5, 1.0)),
+                         "timestamp": now - timedelta(days=float(rng.exponential(30)))})
+    return memories, relevant
+
+
+async def run(args) -> dict:
+    embedder = FakeEmbedder(args.dim, args.embed_ms)
+    memories, relevant = synthetic_user(args.memories, embedder)
+    service = MemoryService(store=ArrayStore(memories))
+    service._generate_embedding = embedder
+    await service.user_lexicon(1)
+    await service.user_index(1)
+
+    report = {}
+    for mode in args.modes:
+        latencies, recalls = [], []
+        for task in TASKS:
+            began = time.perf_counter()
+            results = await service.query_relevant_memories(1, task, args.k, mode=mode)
+            latencies.append((time.perf_counter() - began) * 1000)
+            wanted = min(args.k, len(relevant[task])) or 1
+            recalls.append(len({m["id"] for m in results} & relevant[task]) / wanted)
+        report[mode] = {"mean_ms": round(float(np.mean(latencies)), 2),
+                        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+                        f"recall_at_{args.k}": round(float(np.mean(recalls)), 3)}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memories", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embed-ms", type=float, default=150.0, help="simulated embedding API latency")
+    parser.add_argument("--modes", nargs="+", default=["exhaustive", "early", "quantized", "hybrid", "lexical", "auto"])
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for mode, row in report.items():
+        print(f"{mode:>10}  " + "  ".join(f"{key}={value}" for key, value in row.items()))
+
+
+if __name__ == "__main__":
+    main()
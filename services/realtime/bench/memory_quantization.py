@@ -0,0 +1,101 @@
+"""Recall and footprint of compressed memory indexes against exact search.
+
+Builds a synthetic user whose 1536-dim embeddings cluster by topic, with timestamps
+spread over a year. Each codec's QuantizedIndex is then compared with exhaustive_search
+for random queries. Reports bytes per vector, compression versus float32, and mean
+recall@k after exact re-ranking of `rerank_factor x k` candidates. It also reports
+candidate-pass latency.
+
+    python -m bench.memory_quantization --memories 20000 --k 10
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.memory_search import exhaustive_search
+from app.quantization import Int8Codec, PQCodec, QuantizedIndex
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class ArrayStore:
+    def __init__(self, memories):
+        self.by_id = {m["id"]: m for m in memories}
+
+    async def fetch_by_ids(self, user_id, ids):
+        return [self.by_id[i] for i in ids]
+
+
+def synthetic_user(n: int, dim: int, topics: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim))
+    vectors = (centers[rng.integers(topics, size=n)] + 0.6 * rng.normal(size=(n, dim))).astype(np.float32)
+    ages = rng.exponential(60, size=n)
+    memories = [
+        {"id": i, "vector_embedding": vectors[i], "relevance_score": float(rng.uniform(0.3, 1.0)),
+         "timestamp": NOW - timedelta(days=float(ages[i]))}
+        for i in range(n)
+    ]
+    queries = centers[rng.integers(topics, size=64)] + 0.6 * rng.normal(size=(64, dim))
+    return memories, queries
+
+
+def evaluate(name, codec, memories, queries, k, rerank_factors, decay_rate):
+    started = time.perf_counter()
+    index = QuantizedIndex.build(memories, codec)
+    build_s = time.perf_counter() - started
+    store = ArrayStore(memories)
+    dim = index.dim
+    result = {
+        "codec": name,
+        "bytes_per_vector": round(index.codec.nbytes(index.codes) / len(index), 1),
+        "compression_vs_float32": round(4 * dim * len(index) / index.codec.nbytes(index.codes), 1),
+        "build_s": round(build_s, 2),
+        "recall": {},
+    }
+    expected = [{m["id"] for _, m in exhaustive_search(memories, q, k, decay_rate, NOW)} for q in queries]
+    for factor in rerank_factors:
+        hits, elapsed = [], 0.0
+        for query, truth in zip(queries, expected):
+            began = time.perf_counter()
+            ranked, _ = asyncio.run(index.search(store, 1, query, k, decay_rate, rerank=factor * k, now=NOW))
+            elapsed += time.perf_counter() - began
+            hits.append(len(truth & {m["id"] for _, m in ranked}) / k)
+        result["recall"][f"rerank_{factor}x"] = {
+            "recall_at_k": round(float(np.mean(hits)), 4),
+            "mean_ms": round(elapsed / len(queries) * 1000, 2),
+        }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memories", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 4, 10], help="candidate multiples of k")
+    parser.add_argument("--pq-subspaces", type=int, nargs="+", default=[96, 192])
+    parser.add_argument("--decay", type=float, default=0.1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    memories, queries = synthetic_user(args.memories, args.dim, args.topics)
+    codecs = [("int8", Int8Codec())] + [(f"pq{m}", PQCodec(m=m)) for m in args.pq_subspaces]
+    results = [
+        evaluate(name, codec, memories, queries, args.k, args.rerank, args.decay) for name, codec in codecs
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        recalls = "  ".join(f"{key}: {v['recall_at_k']:.3f} ({v['mean_ms']} ms)" for key, v in r["recall"].items())
+        print(f"{r['codec']:>6}  {r['bytes_per_vector']:>7} B/vec  {r['compression_vs_float32']:>5}x  {recalls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Memory search latency, footprint and recall across corpus sizes, comparable across commits.
+
+For each size (1k to 1M memories) a synthetic user is generated:
+- Embeddings cluster around topics of Zipf-distributed popularity, and each chat session
+  sticks mostly to one topic.
+- Timestamps come in sessions: session starts are recent-heavy over two years, hours
+  follow a morning/evening daily cycle, and messages are spaced seconds to minutes apart.
+
+Queries are embedded by a deterministic fake embedder: the text names a topic and its hash
+seeds the noise. Every strategy then runs through MemoryService, as production does:
+
+    loop            legacy per-memory Python loop ("exhaustive" mode)
+    vectorized      numpy scan of the whole corpus (memory_search.exhaustive_search, the ground truth)
+    indexed         keyset walk with early termination ("early" mode; the store bisects a sorted
+                    (timestamp, id) array, like the btree does)
+    quantized-int8  resident int8 index plus exact re-rank ("quantized" mode)
+    quantized-pq    resident product-quantized index plus exact re-rank
+    sharded         resident shared-memory matrix scored by --shard-workers processes ("sharded" mode)
+
+Reported per (size, strategy): p50/p99/mean latency, recall@k against the exact ranking,
+resident index bytes, peak bytes allocated during one query (tracemalloc), mean rows
+scanned and index build time. Results are written as JSON and CSV. Pass --baseline to
+diff against an earlier report.
+
+    python -m bench.memory_search --sizes 1000 10000 100000 --out reports/memory_search
+    python -m bench.memory_search --sizes 1000000 --strategies indexed quantized-int8 --queries 50
+    python -m bench.memory_search --sizes 1000000 --strategies vectorized sharded --shard-workers 8
+    python -m bench.memory_search --baseline reports/memory_search.json
+"""
+import argparse
+import asyncio
+import bisect
+import csv
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.memory_search import exhaustive_search
+from app.quantization import Int8Codec, PQCodec, QuantizedIndex
+from app.services import MemoryService
+from app.sharded import SharedMatrix, ShardPool
+
+STRATEGIES = {
+    "loop": ("exhaustive", None),
+    "vectorized": (None, None),
+    "indexed": ("early", None),
+    "quantized-int8": ("quantized", "int8"),
+    "quantized-pq": ("quantized", "pq"),
+    "sharded": ("sharded", None),
+}
+FIELDS = ["size", "strategy", "p50_ms", "p99_ms", "mean_ms", "recall_at_k", "resident_bytes",
+          "peak_query_bytes", "mean_scanned", "build_s"]
+
+
+class SyntheticCorpus:
+    def __init__(self, n: int, dim: int, topics: int, seed: int = 0, now: Optional[datetime] = None):
+        rng = np.random.default_rng(seed)
+        self.now = now or datetime.now(timezone.utc)
+        self.centers = rng.normal(size=(topics, dim)).astype(np.float32)
+        popularity = 1.0 / np.arange(1, topics + 1)
+        popularity /= popularity.sum()
+
+        # Sessions of ~Geometric(1/12) messages, mostly on one topic
+        sizes = rng.geometric(1 / 12, size=n // 6 + 1)
+        sizes = sizes[:np.searchsorted(np.cumsum(sizes), n) + 1]
+        sizes[-1] -= sizes.sum() - n
+        session_topic = rng.choice(topics, size=len(sizes), p=popularity)
+        topic = np.repeat(session_topic, sizes)
+        stray = rng.random(n) < 0.2
+        topic[stray] = rng.choice(topics, size=int(stray.sum()), p=popularity)
+
+        days_ago = np.minimum(rng.exponential(90, size=len(sizes)), 730).astype(int)
+        hour = rng.choice(24, size=len(sizes), p=self._diurnal())
+        start_s = days_ago * 86400.0 - hour * 3600.0 - rng.uniform(0, 3600, size=len(sizes))
+        gaps = rng.exponential(40, size=n)
+        session_start = np.repeat(start_s, sizes)
+        offset = np.cumsum(gaps) - np.repeat(np.cumsum(gaps)[np.cumsum(sizes) - sizes], sizes)
+        age_s = np.maximum(session_start - offset, 0.0)
+
+        vectors = self.centers[topic] + 0.7 * rng.normal(size=(n, dim)).astype(np.float32)
+        relevance = np.clip(rng.beta(5, 2, size=n), 0.05, 1.0)
+        self.topic = topic
+        self.memories = [
+            {"id": i, "role": "user" if i % 2 else "assistant", "vector_embedding": vectors[i],
+             "relevance_score": float(relevance[i]), "timestamp": self.now - timedelta(seconds=float(age_s[i]))}
+            for i in range(n)
+        ]
+
+    @staticmethod
+    def _diurnal() -> np.ndarray:
+        hours = np.arange(24)
+        weight = 0.2 + np.exp(-((hours - 8) ** 2) / 6) + 1.3 * np.exp(-((hours - 20) ** 2) / 8)
+        return weight / weight.sum()
+
+
+class FakeEmbedder:
+    """Query text "topic <t> <anything>" maps to a vector near topic t; the same text gives the same vector."""
+
+    def __init__(self, centers: np.ndarray, noise: float = 0.7):
+        self.centers = centers
+        self.noise = noise
+
+    def vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        topic = int(text.split()[1]) % len(self.centers)
+        rng = np.random.default_rng(seed)
+        return self.centers[topic] + self.noise * rng.normal(size=self.centers.shape[1]).astype(np.float32)
+
+    async def __call__(self, text: str) -> np.ndarray:
+        return self.vector(text)
+
+
+class SortedStore:
+    """In-process store; keyset pages bisect a (timestamp, id) array instead of filtering a list."""
+
+    def __init__(self, memories: List[Dict[str, Any]]):
+        self.memories = sorted(memories, key=lambda m: (m["timestamp"], m["id"]), reverse=True)
+        self.keys = [(-m["timestamp"].timestamp(), -m["id"]) for m in self.memories]
+        self.by_id = {m["id"]: m for m in memories}
+
+    async def fetch_for_search(self, user_id):
+        return list(self.memories)
+
+    async def fetch_block(self, user_id, before, limit):
+        start = 0 if before is None else bisect.bisect_right(self.keys, (-before[0].timestamp(), -before[1]))
+        return self.memories[start:start + limit]
+
+    async def max_relevance(self, user_id):
+        return max(m["relevance_score"] for m in self.memories)
+
+    async def fetch_by_ids(self, user_id, ids):
+        return [self.by_id[i] for i in ids]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_codec(kind: str, dim: int, pq_subspaces: Optional[int]):
+    if kind == "int8":
+        return Int8Codec()
+    return PQCodec(m=pq_subspaces or max(1, dim // 16))  # 96 for 1536-dim, the service default
+
+
+async def measure(service: MemoryService, corpus: SyntheticCorpus, embedder: FakeEmbedder, strategy: str,
+                  queries: List[str], truth: List[set], k: int, pq_subspaces: Optional[int] = None) -> Dict[str, Any]:
+    mode, codec = STRATEGIES[strategy]
+    build_s, resident = 0.0, 0
+    if codec is not None:
+        began = time.perf_counter()
+        index = QuantizedIndex.build(corpus.memories, make_codec(codec, corpus.centers.shape[1], pq_subspaces))
+        build_s = time.perf_counter() - began
+        service.indexes[1] = index
+        resident = index.nbytes
+    if mode == "sharded":
+        began = time.perf_counter()
+        service.matrices[1] = SharedMatrix.build(corpus.memories)
+        build_s = time.perf_counter() - began
+        resident = service.matrices[1].nbytes
+
+    async def run_query(text: str):
+        if mode is None:
+            return [m for _, m in exhaustive_search(corpus.memories, embedder.vector(text), k,
+                                                      service.memory_decay_rate)], len(corpus.memories)
+        memories, stats = await service.search_memories(1, text, k, mode)
+        return memories, stats.scanned
+
+    await run_query(queries[0])  # warm caches and lazy imports
+    latencies, recalls, scanned = [], [], []
+    for text, expected in zip(queries, truth):
+        began = time.perf_counter()
+        memories, rows = await run_query(text)
+        latencies.append((time.perf_counter() - began) * 1000)
+        recalls.append(len({m["id"] for m in memories} & expected) / max(len(expected), 1))
+        scanned.append(rows)
+
+    tracemalloc.start()
+    await run_query(queries[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    service.indexes.pop(1, None)
+    service.release_matrices()
+    return {
+        "size": len(corpus.memories),
+        "strategy": strategy,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "resident_bytes": int(resident),
+        "peak_query_bytes": int(peak),
+        "mean_scanned": round(float(np.mean(scanned)), 1),
+        "build_s": round(build_s, 3),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    results = []
+    shards = ShardPool(workers=args.shard_workers, min_shard_rows=args.shard_min_rows)
+    if "sharded" in args.strategies:
+        shards.start()
+    for size in args.sizes:
+        corpus = SyntheticCorpus(size, args.dim, args.topics, seed=args.seed)
+        embedder = FakeEmbedder(corpus.centers)
+        service = MemoryService(store=SortedStore(corpus.memories))
+        service._generate_embedding = embedder
+        service.index_ttl_s = float("inf")
+        service.rerank_factor = args.rerank_factor
+        service.shard_pool = shards
+        rng = np.random.default_rng(args.seed + 1)
+        queries = [f"topic {int(rng.choice(corpus.topic))} query {j}" for j in range(args.queries)]
+        truth = [{m["id"] for _, m in exhaustive_search(corpus.memories, embedder.vector(text), args.k,
+                                                         service.memory_decay_rate)} for text in queries]
+        for strategy in args.strategies:
+            if strategy == "loop" and size > args.loop_max:
+                continue  # minutes per query; not informative
+            row = await measure(service, corpus, embedder, strategy, queries, truth, args.k, args.pq_subspaces)
+            results.append(row)
+            if not args.quiet:
+                print(format_row(row), flush=True)
+    shards.shutdown()
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("out", "baseline", "quiet")},
+        },
+        "results": results,
+    }
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    return (f"{row['size']:>8} {row['strategy']:>15}  p50={row['p50_ms']:>9.3f}ms  p99={row['p99_ms']:>9.3f}ms  "
+            f"recall@k={row['recall_at_k']:.3f}  resident={row['resident_bytes'] / 1e6:.1f}MB  "
+            f"peak={row['peak_query_bytes'] / 1e6:.1f}MB  scanned={row['mean_scanned']:.0f}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    before = {(r["size"], r["strategy"]): r for r in baseline["results"]}
+    lines = [f"vs {baseline['meta'].get('commit')} ({baseline['meta'].get('created_at')})"]
+    for row in report["results"]:
+        old = before.get((row["size"], row["strategy"]))
+        if old is None:
+            continue
+        change = {key: (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0 for key in ("p50_ms", "p99_ms")}
+        lines.append(f"{row['size']:>8} {row['strategy']:>15}  p50 {change['p50_ms']:+6.1f}%  "
+                     f"p99 {change['p99_ms']:+6.1f}%  recall {row['recall_at_k'] - old['recall_at_k']:+.4f}")
+    return lines
+
+
+def write(report: Dict[str, Any], out: str) -> None:
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(f"{out}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    with open(f"{out}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["commit"] + FIELDS)
+        writer.writeheader()
+        for row in report["results"]:
+            writer.writerow({"commit": report["meta"]["commit"], **row})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--strategies", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument("--dim", type=int, default=256, help="1536 matches ada-002 but needs ~6 GB at 1M")
+    parser.add_argument("--topics", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-subspaces", type=int, help="default dim / 16")
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--shard-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-min-rows", type=int, default=4096)
+    parser.add_argument("--loop-max", type=int, default=100000, help="skip the legacy loop above this size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write <out>.json and <out>.csv")
+    parser.add_argument("--baseline", help="earlier JSON report to diff against")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.out:
+        write(report, args.out)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\n".join(compare(report, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Load test for sentiment micro-batching.
+
+Drives EmotionService.analyze_emotion with an open-loop Poisson load against a synthetic
+pipeline that costs a fixed overhead per forward pass plus a per-item cost, serialized like
+a single model instance. Reports throughput and p50/p99 latency for each batching setting.
+
+    python -m bench.sentiment_batching --rate 400 --duration 5 --configs 1:0 8:2 16:5 32:10
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.providers import providers
+from app.services import EmotionService
+
+
+class SyntheticPipeline:
+    """Sentiment pipeline stand-in: `overhead_ms + per_item_ms * len(batch)` per call."""
+
+    def __init__(self, overhead_ms: float, per_item_ms: float):
+        self.overhead = overhead_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        batch = texts if isinstance(texts, list) else [texts]
+        with self._lock:
+            time.sleep(self.overhead + self.per_item * len(batch))
+        return [{"label": "POSITIVE", "score": 0.9} for _ in batch]
+
+
+async def run_load(service: EmotionService, rate: float, duration: float, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    tasks = []
+
+    async def one(i: int) -> None:
+        started = time.perf_counter()
+        await service.analyze_emotion(f"synthetic utterance {i}")
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    i = 0
+    while time.perf_counter() - started < duration:
+        tasks.append(asyncio.create_task(one(i)))
+        i += 1
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_batch_size": service.batcher.stats()["mean_batch_size"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=300.0, help="offered load, requests per second")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds of load per configuration")
+    parser.add_argument("--overhead-ms", type=float, default=8.0, help="fixed cost per forward pass")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="marginal cost per batched item")
+    parser.add_argument("--configs", nargs="+", default=["1:0", "8:2", "16:5", "32:10"],
+                        help="max_batch_size:max_wait_ms pairs to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    providers.register("sentiment", lambda: SyntheticPipeline(args.overhead_ms, args.per_item_ms))
+    results = []
+    for config in args.configs:
+        size, wait = config.split(":")
+        service = EmotionService(max_batch_size=int(size), max_wait_ms=float(wait))
+        result = asyncio.run(run_load(service, args.rate, args.duration, args.seed))
+        results.append({"max_batch_size": int(size), "max_wait_ms": float(wait), **result})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'batch':>6} {'wait_ms':>8} {'req':>7} {'rps':>8} {'p50_ms':>9} {'p99_ms':>9} {'mean_batch':>11}")
+    for r in results:
+        print(f"{r['max_batch_size']:>6} {r['max_wait_ms']:>8} {r['requests']:>7} {r['throughput_rps']:>8} "
+              f"{r['p50_ms']:>9} {r['p99_ms']:>9} {r['mean_batch_size']:>11}")
+
+
+if __name__ == "__main__":
+    main()